@@ -1,18 +1,46 @@
-import sqlite3
-import aiosqlite
+import atexit
+import asyncio
+import logging
 from core import settings
+from core.utils.metric_tools import tool_metrics, start_metrics_server
+from core.utils.stream_tools import TokenCoalescer
+from core.utils.condense_tools import strip_ansi
+from core.utils.memory_tools import (
+    TokenBudgetMemory,
+    create_conversation_memory,
+    current_context_memory,
+    _get_encoding,
+)
+from core.utils.checkpoint_tools import CheckpointStore
+from core.utils.router_tools import current_route_stats
 from devops_agents.docker.agents.docker_agent import DockerAgentFactory
+from devops_agents.docker.utils.pulls import current_pull_progress
+from devops_agents.docker.utils.cmd_tools import current_output_stream
+from database_agents.manager.cursors import current_query_cursors, query_cursors, fetch_query_page
 
-from langchain_core.messages import HumanMessage
-from langchain.memory import ConversationBufferMemory
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk
 from langchain.schema.runnable.config import RunnableConfig
-from langchain.schema.runnable import Runnable, RunnableLambda
+from langchain.schema.runnable import Runnable
 
 from chainlit.types import ThreadDict
 import chainlit as cl
 
-from operator import itemgetter
+
+logger = logging.getLogger("opsagent.app")
+logger.setLevel(settings.LOG_LEVEL)
+if not logger.handlers:
+    logger.addHandler(logging.StreamHandler())
+
+if settings.TOOL_METRICS_PORT:
+    start_metrics_server(settings.TOOL_METRICS_PORT)
+if settings.TOOL_METRICS_DUMP_PATH:
+    atexit.register(tool_metrics.dump, settings.TOOL_METRICS_DUMP_PATH)
+
+
+@cl.on_app_startup
+async def on_app_startup():
+    # tiktoken reads (or downloads) its BPE file on first use, not on the loop of a session
+    await asyncio.to_thread(_get_encoding)
 
 
 @cl.password_auth_callback
@@ -33,87 +61,185 @@ def auth_callback(username: str, password: str):
 
 @cl.on_chat_start
 async def on_chat_start():
-    cl.user_session.set(
-        "memory",
-        ConversationBufferMemory(return_messages=True)
-    )
-    setup_runnable()
+    cl.user_session.set("thread_id", cl.context.session.thread_id)
+    cl.user_session.set("memory", create_conversation_memory())
+    await setup_runnable()
 
 
-def setup_runnable():
-    memory = cl.user_session.get("memory")  # type: ConversationBufferMemory
-    conn = aiosqlite.connect(settings.DOCKER_AGENT_CHAT_DB, check_same_thread=False)
-    docker_agent_factory = DockerAgentFactory()
-    docker_agent = docker_agent_factory.create_agent(
-        api_key=settings.OPENAI_API_KEY,
-        connection=conn,
-        memory_saver=AsyncSqliteSaver,
-    )
-    docker_agent.graph.assign(
-        history=RunnableLambda(memory.load_memory_variables) | itemgetter("history")
+def get_checkpoint_store() -> CheckpointStore:
+    return CheckpointStore.for_path(
+        settings.DOCKER_AGENT_CHAT_DB,
+        keep_last=settings.CHECKPOINT_KEEP_LAST,
+        compaction_interval=settings.CHECKPOINT_COMPACTION_INTERVAL,
     )
-    cl.user_session.set("runnable", docker_agent.graph)
 
 
-    
+_docker_graph = None
+
+
+async def get_docker_graph():
+    """
+    The compiled graph is shared by all sessions: state lives in the checkpointer
+    per thread_id and the session memory is bound through current_context_memory.
+    """
+    global _docker_graph
+    if _docker_graph is None:
+        docker_agent = DockerAgentFactory().create_agent(
+            api_key=settings.OPENAI_API_KEY,
+            checkpointer=await get_checkpoint_store().saver(),
+        )
+        _docker_graph = docker_agent.graph
+    return _docker_graph
+
+
+async def setup_runnable():
+    cl.user_session.set("runnable", await get_docker_graph())
+
+
 @cl.on_chat_resume
 async def on_chat_resume(thread: ThreadDict):
-    memory = ConversationBufferMemory(return_messages=True)
-    root_messages = [m for m in thread["steps"] if m["parentId"] == None]
-    for message in root_messages:
-        if message["type"] == "user_message":
-            memory.chat_memory.add_user_message(message["output"])
+    """
+    Attaches to the thread checkpoint instead of replaying every step: the model context
+    is read from the checkpoint and trimmed by the memory's pre_model_hook on every call.
+    """
+    cl.user_session.set("thread_id", thread["id"])
+    memory = create_conversation_memory()
+    cl.user_session.set("memory", memory)
+    await setup_runnable()
+
+    runnable = cl.user_session.get("runnable")  # type: Runnable
+    config = {"configurable": {"thread_id": thread["id"]}}
+    snapshot = await runnable.aget_state(config)
+    if snapshot and snapshot.values.get("messages"):
+        return
+
+    # thread without checkpoint: seed it with the last root steps only
+    window = []
+    for step in reversed(thread["steps"]):
+        if step["parentId"] is not None:
+            continue
+        if step["type"] == "user_message":
+            window.append(HumanMessage(content=step["output"]))
         else:
-            memory.chat_memory.add_ai_message(message["output"])
+            window.append(AIMessage(content=step["output"]))
+        if len(window) >= settings.MEMORY_WINDOW_TURNS * 2:
+            break
+    window.reverse()
+    if window:
+        await runnable.aupdate_state(config, {"messages": window}, as_node="agent")
+
+
+class ProgressMessage:
+    """Message updated in place with progress reported from worker threads (e.g. image pulls)."""
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.lock = asyncio.Lock()
+        self.message = None
+
+    def __call__(self, text: str):
+        asyncio.run_coroutine_threadsafe(self.show(text), self.loop)
+
+    async def show(self, text: str):
+        async with self.lock:
+            if self.message is None:
+                self.message = cl.Message(content=text)
+                await self.message.send()
+            else:
+                self.message.content = text
+                await self.message.update()
+
+
+class StreamedOutputMessage:
+    """
+    Message of its own a streamed shell command is written into as it runs (see current_output_stream),
+    in frames like the answer. Waiting on a slow client holds back the command (backpressure).
+    """
+    def __init__(self, title: str):
+        self.title = title
+        self.message = cl.Message(content="")
+        self.coalescer = TokenCoalescer(
+            self.message.stream_token,
+            max_chars=settings.STREAM_FRAME_MAX_CHARS,
+            max_interval=settings.STREAM_FRAME_MAX_INTERVAL,
+        )
 
-    cl.user_session.set("memory", memory)
+    async def __aenter__(self):
+        await self.coalescer.push(f"`{self.title}`\n```\n")
+        return self
+
+    async def push(self, text: str):
+        await self.coalescer.push(strip_ansi(text))
+
+    async def __aexit__(self, *exc_info):
+        await self.coalescer.push("```")
+        await self.coalescer.close()
+        await self.message.send()
+
+
+def next_page_action(cursor_id: str) -> cl.Action:
+    return cl.Action(name="next_query_page", payload={"cursor_id": cursor_id}, label="Next rows")
+
+
+@cl.action_callback("next_query_page")
+async def on_next_query_page(action: cl.Action):
+    cursor_id = action.payload["cursor_id"]
+    page = await cl.make_async(fetch_query_page)(cursor_id)
+    actions = [next_page_action(cursor_id)] if query_cursors.get(cursor_id) else []
+    await cl.Message(content=page.output if page.success else page.error, actions=actions).send()
 
-    setup_runnable()
-    
 
 @cl.on_message
 async def on_message(msg: cl.Message):
-    config = {"configurable": {"thread_id": cl.context.session.id}}
-    memory = cl.user_session.get("memory")  # type: ConversationBufferMemory
+    config = {"configurable": {"thread_id": cl.user_session.get("thread_id")}}
+    memory = cl.user_session.get("memory")  # type: TokenBudgetMemory
     runnable = cl.user_session.get("runnable")  # type: Runnable
+    current_context_memory.set(memory)
+    route_stats = []
+    current_route_stats.set(route_stats)
+    opened_cursors = []
+    current_query_cursors.set(opened_cursors)
+    current_pull_progress.set(ProgressMessage())
+    current_output_stream.set(StreamedOutputMessage)
 
     res = cl.Message(content="")
 
     stream = runnable.astream(
         {"messages": [HumanMessage(content=msg.content)]},
         stream_mode="messages",
+        # the react agent runs as a subgraph, its model tokens are only streamed with subgraphs
+        subgraphs=True,
         config=RunnableConfig(
             # callbacks=[cb], # just for tracing langsmith
-            memory=memory,
             **config
         )
     )
-    async for msg, metadata in stream:
-        print(f'{"<*>"*50} \n {str(msg)=} \n {">*<"*50}')
-        print(f'{".*."*50} \n {str(metadata)=} \n {".*."*50}')
-        
-        if (
-            msg.content
-            and hasattr(msg, "response_metadata")
-            and getattr(msg, "response_metadata").get("finish_reason") == "stop"
-            # and not isinstance(msg, HumanMessage)
-            # and (
-            #         (
-            #             not metadata.get("langgraph_node", None)
-            #             or metadata["langgraph_node"] == "final"
-            #         )
-            #     or (
-            #             not getattr(getattr(msg, "response_metadata", None), "finish_reason", None)
-            #             or getattr(msg, "response_metadata")["finish_reason"] == "stop"
-            #         )
-            # )
-        ):
-            
-            await res.stream_token(msg.content)
-
+    coalescer = TokenCoalescer(
+        res.stream_token,
+        max_chars=settings.STREAM_FRAME_MAX_CHARS,
+        max_interval=settings.STREAM_FRAME_MAX_INTERVAL,
+    )
+    async with coalescer:
+        async for _namespace, (chunk, metadata) in stream:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("stream chunk: %r metadata: %r", chunk, metadata)
+
+            # tokens of the agent's model, not tool messages or models called inside tools
+            if (
+                isinstance(chunk, AIMessageChunk)
+                and metadata.get("langgraph_node") == "agent"
+                and isinstance(chunk.content, str)
+            ):
+                await coalescer.push(chunk.content)
+
+    # query results still open after the turn can be paged from the UI
+    res.actions = [next_page_action(cursor_id) for cursor_id in opened_cursors if query_cursors.get(cursor_id)]
     await res.send()
-
-    memory.chat_memory.add_user_message(msg.content)
-    memory.chat_memory.add_ai_message(res.content)
-
-    
\ No newline at end of file
+    logger.info("streamed message stats: %s", coalescer.stats.as_dict())
+    if memory.last_stats:
+        logger.info("context token stats: %s", memory.last_stats)
+    if route_stats:
+        logger.info(
+            "tool routing: %s model calls, %s schema tokens saved",
+            len(route_stats),
+            sum(stats["saved_schema_tokens"] for stats in route_stats)
+        )
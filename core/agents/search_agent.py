@@ -1,14 +1,16 @@
-from langchain_community.document_loaders import WebBaseLoader, BSHTMLLoader
+from bs4 import BeautifulSoup
+from requests.compat import chardet
+from langchain_community.document_loaders import WebBaseLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langgraph.graph import StateGraph, END
 from core.settings import OPENAI_API_KEY, FAISS_INDEX_PATH
 from langgraph.graph import MessagesState
-from typing import Optional, Any
+from typing import Optional, Any, Union
 from core.utils.log_tools import log_wrapper
 from core.utils.web_driver import access_chrome_driver_manager
-import tempfile
+from core.utils.process_tools import SharedRef, offload, received_text, shared_or_bytes, write_shared
 
 
 class SearchAgentState(MessagesState):
@@ -23,19 +25,47 @@ class SearchAgentState(MessagesState):
     answer: Optional[str]
 
 
+# --- Process pool tasks ---
+# parsing and splitting hold the GIL for seconds on large pages, they run through offload
+# (core/utils/process_tools.py) with the page handed over in shared memory
+def parse_html_text(html: Union[SharedRef, bytes, str], parser: str = "html.parser", encoding: Optional[str] = None):
+    """
+    Text of an html page, as WebBaseLoader and BSHTMLLoader extract it.
+    Bytes are decoded with `encoding`, or the one detected like requests' apparent_encoding.
+    """
+    page = shared_or_bytes(html)
+    if isinstance(page, bytes):
+        encoding = encoding or chardet.detect(page)["encoding"] or "utf-8"
+        page = page.decode(encoding, errors="replace")
+    text = BeautifulSoup(page, parser).get_text().strip()
+    return write_shared(text) if isinstance(html, SharedRef) else text
+
+
+def split_text_offsets(text: Union[SharedRef, str], chunk_size: int, chunk_overlap: int):
+    """
+    Chunks of RecursiveCharacterTextSplitter as (start, length) in `text`, so the caller slices
+    its own copy instead of receiving every chunk. Falls back to the chunks themselves.
+    """
+    text = shared_or_bytes(text)
+    if isinstance(text, bytes):
+        text = text.decode("utf-8", errors="surrogatepass")
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = splitter.split_text(text)
+    offsets, start = [], 0
+    for chunk in chunks:
+        # chunks overlap by at most chunk_overlap
+        index = text.find(chunk, max(0, start - chunk_overlap))
+        if index < 0:
+            return chunks
+        offsets.append((index, len(chunk)))
+        start = index + len(chunk)
+    return offsets
+
+
 def powerful_web_loader(state):
     driver = access_chrome_driver_manager().get_driver()
     driver.get(state["url"])
-    with tempfile.NamedTemporaryFile(
-        delete=False,
-        suffix=".html",
-        mode="w",
-        encoding="utf-8") as f:
-        f.write(driver.page_source)
-        temp_path = f.name
-    loader = BSHTMLLoader(temp_path, open_encoding="utf-8")
-    docs = loader.load()
-    text = " ".join(doc.page_content.strip() for doc in docs)
+    text = received_text(offload(parse_html_text, driver.page_source, "lxml", "utf-8"))
     return {"raw_text": text}
 
 
@@ -43,8 +73,9 @@ def powerful_web_loader(state):
 def load_web_content(state):    
     url = state["url"]
     loader = WebBaseLoader(url)
-    docs = loader.load()
-    text = " ".join(doc.page_content.strip() for doc in docs)
+    # only the download stays on this thread
+    response = loader.session.get(url, **loader.requests_kwargs)
+    text = received_text(offload(parse_html_text, response.content, loader.default_parser, loader.encoding))
     return {"raw_text": text}
 
 
@@ -60,11 +91,9 @@ def decide_processing(state):
         return "long_text"
 
 def split_docs(state):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=100
-    )
-    chunks = splitter.split_text(state["raw_text"])
+    text = state["raw_text"]
+    offsets = offload(split_text_offsets, text, 1000, 100)
+    chunks = [offset if isinstance(offset, str) else text[offset[0]:offset[0] + offset[1]] for offset in offsets]
     return {"chunks": chunks}
 
 
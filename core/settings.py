@@ -12,4 +12,46 @@ TAVILY_API_KEY = os.environ.get("TAVILY_API_KEY")
 GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
 GOOGLE_SEARCH_ENGINE_ID = os.environ.get("GOOGLE_SEARCH_ENGINE_ID")
 FAISS_INDEX_PATH = BASE_DIR / "data/faiss_index"
-DOCKER_AGENT_CHAT_DB = BASE_DIR / "data/docker_agent_chats.sqlite3"
\ No newline at end of file
+DOCKER_AGENT_CHAT_DB = BASE_DIR / "data/docker_agent_chats.sqlite3"
+CHROMEDRIVER_PATH = os.environ.get("CHROMEDRIVER_PATH")
+CHROMEDRIVER_OFFLINE = os.environ.get("CHROMEDRIVER_OFFLINE", "false").lower() in ("1", "true", "yes")
+CHROMEDRIVER_PATH_CACHE = BASE_DIR / "data/chromedriver_path"
+DOCKER_TOOLS_CACHE_TTL = float(os.environ.get("DOCKER_TOOLS_CACHE_TTL", 10))
+DOCKER_LIST_PAGE_SIZE = int(os.environ.get("DOCKER_LIST_PAGE_SIZE", 50))
+DOCKER_READINESS_TIMEOUT = float(os.environ.get("DOCKER_READINESS_TIMEOUT", 60))
+DOCKER_READINESS_MAX_DELAY = float(os.environ.get("DOCKER_READINESS_MAX_DELAY", 2))
+DOCKER_PULL_MAX_PARALLEL = int(os.environ.get("DOCKER_PULL_MAX_PARALLEL", 4))
+DOCKER_PULL_PROGRESS_INTERVAL = float(os.environ.get("DOCKER_PULL_PROGRESS_INTERVAL", 0.5))
+DOCKER_STATS_MODE = os.environ.get("DOCKER_STATS_MODE", "stream")
+DOCKER_STATS_INTERVAL = float(os.environ.get("DOCKER_STATS_INTERVAL", 1))
+DOCKER_STATS_WINDOW = int(os.environ.get("DOCKER_STATS_WINDOW", 300))
+DOCKER_STATS_WARMUP = float(os.environ.get("DOCKER_STATS_WARMUP", 3))
+DOCKER_LOG_INDEX_DB = os.environ.get("DOCKER_LOG_INDEX_DB", BASE_DIR / "data/container_logs.sqlite3")
+DOCKER_LOG_RETENTION_SECONDS = float(os.environ.get("DOCKER_LOG_RETENTION_SECONDS", 24 * 3600))
+DOCKER_LOG_MAX_LINES_PER_CONTAINER = int(os.environ.get("DOCKER_LOG_MAX_LINES_PER_CONTAINER", 200_000))
+TOOL_METRICS_PORT = int(os.environ["TOOL_METRICS_PORT"]) if os.environ.get("TOOL_METRICS_PORT") else None
+TOOL_METRICS_DUMP_PATH = os.environ.get("TOOL_METRICS_DUMP_PATH")
+TOOL_LOG_MAX_CHARS = int(os.environ.get("TOOL_LOG_MAX_CHARS", 2000))
+TOOL_LOG_SAMPLE_RATE = float(os.environ.get("TOOL_LOG_SAMPLE_RATE", 1.0))
+TOOL_LOG_BACKGROUND = os.environ.get("TOOL_LOG_BACKGROUND", "true").lower() in ("1", "true", "yes")
+TOOL_OUTPUT_MAX_TOKENS = int(os.environ.get("TOOL_OUTPUT_MAX_TOKENS", 2000))
+TOOL_OUTPUT_STORE_MAX_CHARS = int(os.environ.get("TOOL_OUTPUT_STORE_MAX_CHARS", 50_000_000))
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+STREAM_FRAME_MAX_CHARS = int(os.environ.get("STREAM_FRAME_MAX_CHARS", 256))
+STREAM_FRAME_MAX_INTERVAL = float(os.environ.get("STREAM_FRAME_MAX_INTERVAL", 0.05))
+MEMORY_MODE = os.environ.get("MEMORY_MODE", "budget")
+MEMORY_TOKEN_BUDGET = int(os.environ.get("MEMORY_TOKEN_BUDGET", 8000))
+MEMORY_WINDOW_TURNS = int(os.environ.get("MEMORY_WINDOW_TURNS", 6))
+MEMORY_TOOL_OUTPUT_TOKENS = int(os.environ.get("MEMORY_TOOL_OUTPUT_TOKENS", 500))
+CHECKPOINT_KEEP_LAST = int(os.environ.get("CHECKPOINT_KEEP_LAST", 20))
+CHECKPOINT_COMPACTION_INTERVAL = float(os.environ.get("CHECKPOINT_COMPACTION_INTERVAL", 600))
+DATABASE_SESSION_POOL_SIZE = int(os.environ.get("DATABASE_SESSION_POOL_SIZE", 4))
+DATABASE_SESSION_IDLE_TIMEOUT = float(os.environ.get("DATABASE_SESSION_IDLE_TIMEOUT", 300))
+DATABASE_STATEMENT_TIMEOUT = float(os.environ.get("DATABASE_STATEMENT_TIMEOUT", 60))
+DATABASE_CURSOR_PAGE_SIZE = int(os.environ.get("DATABASE_CURSOR_PAGE_SIZE", 100))
+DATABASE_CURSOR_TTL = float(os.environ.get("DATABASE_CURSOR_TTL", 600))
+DATABASE_CURSOR_MAX_OPEN = int(os.environ.get("DATABASE_CURSOR_MAX_OPEN", 8))
+PROCESS_POOL_WORKERS = int(os.environ.get("PROCESS_POOL_WORKERS", min(4, os.cpu_count() or 1)))
+PROCESS_POOL_TIMEOUT = float(os.environ.get("PROCESS_POOL_TIMEOUT", 60))
+PROCESS_OFFLOAD_MIN_BYTES = int(os.environ.get("PROCESS_OFFLOAD_MIN_BYTES", 128 * 1024))
+SHELL_STREAM_MAX_CHUNKS = int(os.environ.get("SHELL_STREAM_MAX_CHUNKS", 256))
@@ -0,0 +1,13 @@
+import re
+
+
+# kept out of core.utils, whose import builds the tools: the shell pipes use it too
+ANSI_ESCAPE = re.compile(r"\x1b(?:\[[0-?]*[ -/]*[@-~]|\][^\x07\x1b]*(?:\x07|\x1b\\)|[@-Z\\-_])")
+
+
+def strip_ansi(text: str) -> str:
+    """Drops colour/cursor escape codes and keeps only what a terminal would show after `\\r` rewrites."""
+    text = ANSI_ESCAPE.sub("", text).replace("\r\n", "\n")
+    if "\r" in text:
+        text = "\n".join(line.rstrip("\r").rsplit("\r", 1)[-1] for line in text.split("\n"))
+    return text
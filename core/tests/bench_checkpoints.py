@@ -0,0 +1,82 @@
+"""
+Benchmark of checkpoint pruning (core/utils/checkpoint_tools.py) on the docker agent graph.
+
+Turns run through DockerAgent with a ScriptedChatModel, so every turn writes the root
+checkpoints and a new `agent:<task id>` subgraph namespace, as in the app. Compaction
+must keep the number of rows flat however many turns the thread has.
+
+The file name keeps it out of the default test collection, run it explicitly:
+    pip install pytest pytest-benchmark
+    pytest core/tests/bench_checkpoints.py --benchmark-json=bench_checkpoints.json
+"""
+import os
+import uuid
+import sqlite3
+import asyncio
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+# the search tools build their API wrappers at import time, none of them is called here
+for key in ("OPENAI_API_KEY", "TAVILY_API_KEY", "GOOGLE_API_KEY", "GOOGLE_SEARCH_ENGINE_ID"):
+    os.environ.setdefault(key, "bench")
+
+from langchain_core.messages import HumanMessage
+from core.tests.fake_models import ScriptedChatModel
+from core.utils.checkpoint_tools import CheckpointStore
+from devops_agents.docker.agents.docker_agent import DockerAgent
+
+KEEP_LAST = 6
+
+
+def count_rows(path) -> dict:
+    with sqlite3.connect(path) as connection:
+        return {
+            "root_checkpoints": connection.execute(
+                "SELECT count(*) FROM checkpoints WHERE checkpoint_ns = ''"
+            ).fetchone()[0],
+            "subgraph_checkpoints": connection.execute(
+                "SELECT count(*) FROM checkpoints WHERE checkpoint_ns != ''"
+            ).fetchone()[0],
+            "writes": connection.execute("SELECT count(*) FROM writes").fetchone()[0],
+        }
+
+
+@pytest.mark.parametrize("turns", [20])
+def test_compaction_keeps_rows_flat(benchmark, tmp_path, turns):
+    path = tmp_path / "checkpoints.sqlite3"
+    rows_per_turn = []
+    compaction_seconds = []
+
+    async def run():
+        store = CheckpointStore(path, keep_last=KEEP_LAST, compaction_interval=0)
+        agent = DockerAgent(
+            api_key="bench",
+            client=ScriptedChatModel,
+            client_config={"tool_name": None, "answer_tokens": 5},
+            checkpointer=await store.saver(),
+            route_tools=False,
+        )
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        loop = asyncio.get_running_loop()
+        try:
+            for turn in range(turns):
+                await agent.graph.ainvoke({"messages": [HumanMessage(content=f"turn {turn}")]}, config)
+                start = loop.time()
+                await store.compact()
+                compaction_seconds.append(loop.time() - start)
+                rows_per_turn.append(count_rows(path))
+            # the thread still resumes from its last checkpoint
+            state = await agent.graph.aget_state(config)
+            assert len(state.values["messages"]) == 2 * turns
+        finally:
+            await store.close()
+
+    benchmark.pedantic(lambda: asyncio.run(run()), rounds=1, iterations=1)
+
+    # once the kept root checkpoints are full, every turn adds as many rows as compaction removes
+    settled = rows_per_turn[KEEP_LAST:]
+    assert all(rows == settled[0] for rows in settled), rows_per_turn
+    assert settled[0]["root_checkpoints"] == KEEP_LAST
+    benchmark.extra_info["rows_per_turn"] = rows_per_turn
+    benchmark.extra_info["compaction_seconds_max"] = max(compaction_seconds)
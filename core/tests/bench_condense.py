@@ -0,0 +1,60 @@
+"""
+Benchmark for the condensation of tool outputs (core/utils/condense_tools.py) on generated
+`docker logs` style outputs from 10 KB to 10 MB, with colour codes, repeated lines and a few errors.
+
+The file name keeps it out of the default test collection, run it explicitly:
+    pip install pytest pytest-benchmark
+    pytest core/tests/bench_condense.py --benchmark-json=bench_condense.json
+"""
+import os
+import random
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+for key in ("OPENAI_API_KEY", "TAVILY_API_KEY", "GOOGLE_API_KEY", "GOOGLE_SEARCH_ENGINE_ID"):
+    os.environ.setdefault(key, "bench")
+
+from core.utils.condense_tools import OutputStore, condense_text, strip_ansi
+from core.utils.memory_tools import count_tokens
+
+OUTPUT_SIZES = {
+    "10KB": 10 * 1024,
+    "100KB": 100 * 1024,
+    "1MB": 1024 ** 2,
+    "10MB": 10 * 1024 ** 2,
+}
+ERRORS = [
+    "\x1b[31mERROR\x1b[0m connection to db:5432 refused",
+    "Traceback (most recent call last):",
+    "ValueError: invalid literal for int() with base 10: 'abc'",
+]
+
+
+def generate_output(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines, length = [], 0
+    while length < size:
+        if rng.random() < 0.01:
+            line = "\x1b[33mWARN\x1b[0m retrying health check"
+            lines += [line] * rng.randint(5, 50)
+        else:
+            line = f"\x1b[36mINFO\x1b[0m GET /api/items/{rng.randint(1, 9999)} 200 {rng.randint(1, 90)}ms"
+            lines.append(line)
+        length += len(line) + 1
+    for i, error in enumerate(ERRORS):
+        lines.insert(len(lines) * (i + 1) // 4, error)
+    return "\n".join(lines)
+
+
+@pytest.mark.parametrize("size", list(OUTPUT_SIZES))
+def test_condense_output(benchmark, size):
+    text = generate_output(OUTPUT_SIZES[size])
+    store = OutputStore()
+    condensed = benchmark(condense_text, text, 2000, store)
+
+    assert count_tokens(condensed) <= 2000
+    if count_tokens(strip_ansi(text)) > 2000:
+        assert all(strip_ansi(error) in condensed for error in ERRORS)
+    benchmark.extra_info["input_tokens"] = count_tokens(strip_ansi(text))
+    benchmark.extra_info["output_tokens"] = count_tokens(condensed)
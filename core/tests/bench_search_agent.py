@@ -0,0 +1,184 @@
+"""
+Offline benchmark for the search agent pipeline (core/agents/search_agent.py).
+
+Pages are served from a local HTTP server, embeddings come from DeterministicFakeEmbedding
+and answers from ScriptedChatModel, so only load, split, embed, retrieve and summarize
+themselves are measured. Generated pages from 1 KB to 10 MB are used by default,
+point SEARCH_BENCH_CORPUS to a directory of saved .html pages to benchmark those instead.
+
+The file name keeps it out of the default test collection, run it explicitly:
+    pip install pytest pytest-benchmark faiss-cpu
+    pytest core/tests/bench_search_agent.py --benchmark-json=bench_search_agent.json
+
+Compare two runs with:
+    pytest-benchmark compare bench_search_agent_old.json bench_search_agent.json
+"""
+import os
+import time
+import random
+import functools
+import importlib
+import threading
+import tracemalloc
+from pathlib import Path
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("faiss")
+
+# the search tools build their API wrappers at import time, none of them is called here
+for key in ("OPENAI_API_KEY", "TAVILY_API_KEY", "GOOGLE_API_KEY", "GOOGLE_SEARCH_ENGINE_ID"):
+    os.environ.setdefault(key, "bench")
+os.environ.setdefault("USER_AGENT", "opsagent-bench")
+
+import core.utils  # resolves the core.utils <-> core.agents import cycle in the usual order
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from core.tests.fake_models import ScriptedChatModel
+
+search_agent_module = importlib.import_module("core.agents.search_agent")
+
+PAGE_SIZES = {
+    "1KB": 1024,
+    "10KB": 10 * 1024,
+    "100KB": 100 * 1024,
+    "1MB": 1024 ** 2,
+    "10MB": 10 * 1024 ** 2,
+}
+QUERY = "How is the container restarted after a failed health check?"
+WORDS = (
+    "container image volume network restart health check port daemon registry layer "
+    "compose service replica deploy logs metrics cpu memory limit build cache tag"
+).split()
+
+
+def generate_page(size: int, seed: int = 0) -> str:
+    """HTML page of about `size` bytes made of paragraphs of pseudo-random words."""
+    rng = random.Random(seed)
+    paragraphs, length = [], 0
+    while length < size:
+        paragraph = "<p>" + " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))) + ".</p>\n"
+        paragraphs.append(paragraph)
+        length += len(paragraph)
+    return "<html><head><title>bench</title></head><body>\n" + "".join(paragraphs) + "</body></html>\n"
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory) -> dict[str, Path]:
+    if saved := os.environ.get("SEARCH_BENCH_CORPUS"):
+        return {path.stem: path for path in sorted(Path(saved).glob("*.html"))}
+    directory = tmp_path_factory.mktemp("corpus")
+    pages = {}
+    for name, size in PAGE_SIZES.items():
+        pages[name] = directory / f"{name}.html"
+        pages[name].write_text(generate_page(size), encoding="utf-8")
+    return pages
+
+
+@pytest.fixture(scope="module")
+def page_server(corpus):
+    directory = next(iter(corpus.values())).parent
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=str(directory))
+    handler.log_message = lambda *args: None
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def offline_models(monkeypatch):
+    llm = ScriptedChatModel(tool_name=None, answer_tokens=50)
+    monkeypatch.setattr(search_agent_module, "ChatOpenAI", lambda **kwargs: llm)
+    monkeypatch.setattr(search_agent_module, "OpenAIEmbeddings", lambda **kwargs: DeterministicFakeEmbedding(size=1536))
+    # run_pipeline points the index at a temporary path, restored on teardown
+    monkeypatch.setattr(search_agent_module, "FAISS_INDEX_PATH", search_agent_module.FAISS_INDEX_PATH)
+
+
+def run_pipeline(url: str, index_path: Path) -> tuple[dict, dict]:
+    """Runs the graph once, returns the final state and the seconds spent in every node."""
+    # embed_and_store reuses whatever index exists at the path, give every run a fresh one
+    search_agent_module.FAISS_INDEX_PATH = index_path
+    state = {"url": url, "query": QUERY}
+    node_seconds = {}
+    start = time.perf_counter()
+    for update in search_agent_module.search_agent.stream(state, stream_mode="updates"):
+        now = time.perf_counter()
+        for node, values in update.items():
+            node_seconds[node] = now - start
+            state.update(values or {})
+        start = now
+    return state, node_seconds
+
+
+class ThreadLag:
+    """Worst lateness of a thread waking up every 5 ms, i.e. how long the pipeline holds the GIL at once."""
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.worst = 0.0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            start = time.perf_counter()
+            time.sleep(self.interval)
+            self.worst = max(self.worst, time.perf_counter() - start - self.interval)
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+
+def directory_size(path: Path) -> int:
+    return sum(file.stat().st_size for file in path.rglob("*") if file.is_file()) if path.exists() else 0
+
+
+def test_search_pipeline(benchmark, corpus, page_server, offline_models, tmp_path, page):
+    url = f"{page_server}/{corpus[page].name}"
+    runs = iter(range(1000))
+    node_totals: dict[str, float] = {}
+    results = []
+
+    def setup():
+        return (url, tmp_path / f"index-{next(runs)}"), {}
+
+    def timed_run(url, index_path):
+        state, node_seconds = run_pipeline(url, index_path)
+        for node, seconds in node_seconds.items():
+            node_totals[node] = node_totals.get(node, 0.0) + seconds
+        results.append((state, index_path))
+        return state
+
+    rounds = 1 if corpus[page].stat().st_size > 1024 ** 2 else 3
+    state = benchmark.pedantic(timed_run, setup=setup, rounds=rounds, iterations=1)
+
+    # so is the responsiveness of other threads
+    with ThreadLag() as lag:
+        run_pipeline(url, tmp_path / "index-lag")
+
+    # memory is measured on a separate run, tracemalloc slows everything down
+    tracemalloc.start()
+    run_pipeline(url, tmp_path / "index-memory")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    benchmark.extra_info["page_bytes"] = corpus[page].stat().st_size
+    benchmark.extra_info["text_chars"] = len(state.get("raw_text") or "")
+    benchmark.extra_info["chunks"] = len(state.get("chunks") or [])
+    benchmark.extra_info["index_bytes"] = directory_size(results[-1][1])
+    benchmark.extra_info["peak_traced_bytes"] = peak
+    benchmark.extra_info["worst_thread_lag_ms"] = lag.worst * 1000
+    benchmark.extra_info["node_seconds"] = {node: total / rounds for node, total in node_totals.items()}
+
+
+def pytest_generate_tests(metafunc):
+    if "page" in metafunc.fixturenames:
+        saved = os.environ.get("SEARCH_BENCH_CORPUS")
+        pages = [path.stem for path in sorted(Path(saved).glob("*.html"))] if saved else list(PAGE_SIZES)
+        metafunc.parametrize("page", pages)
@@ -0,0 +1,76 @@
+"""
+Deterministic stand-ins for model providers, for benchmarks and load tests that must run offline.
+"""
+import time
+import uuid
+import asyncio
+from typing import Any, Iterator, AsyncIterator, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Chat model replaying a fixed script: every human turn is answered with one
+    call to `tool_name` (when that tool is bound), then with `answer_tokens`
+    streamed tokens. Chunks look like OpenAI's, the last one carries the finish_reason.
+
+    Accepts the `api_key` and `streaming` arguments agents pass to their client.
+
+    Example usage:
+        agent = DockerAgent(api_key="fake", client=ScriptedChatModel, client_config={"answer_tokens": 20})
+    """
+    api_key: Optional[str] = None
+    streaming: bool = True
+    tool_name: Optional[str] = "list_available_containers"
+    answer_tokens: int = 50
+    first_token_delay: float = 0.0
+    token_delay: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _tool_call(self, messages: list[BaseMessage], tools: Optional[list[dict]]) -> Optional[dict]:
+        bound = {tool["function"]["name"] for tool in tools or []}
+        if self.tool_name in bound and isinstance(messages[-1], HumanMessage):
+            return {"name": self.tool_name, "args": "{}", "id": f"call_{uuid.uuid4().hex[:24]}", "index": 0}
+        return None
+
+    def _script(self, messages: list[BaseMessage], tools: Optional[list[dict]]) -> Iterator[ChatGenerationChunk]:
+        if tool_call := self._tool_call(messages, tools):
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(content="", tool_call_chunks=[tool_call]),
+                generation_info={"finish_reason": "tool_calls"},
+            )
+            return
+        for i in range(self.answer_tokens):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=f"token{i} "))
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(content=""),
+            generation_info={"finish_reason": "stop"},
+        )
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_delay)
+        for chunk in self._script(messages, kwargs.get("tools")):
+            yield chunk
+            time.sleep(self.token_delay)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_delay)
+        for chunk in self._script(messages, kwargs.get("tools")):
+            yield chunk
+            await asyncio.sleep(self.token_delay)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        message = None
+        for chunk in self._stream(messages, stop, run_manager, **kwargs):
+            message = chunk.message if message is None else message + chunk.message
+        return ChatResult(generations=[ChatGeneration(message=message)])
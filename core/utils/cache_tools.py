@@ -0,0 +1,125 @@
+import json
+import time
+import inspect
+import functools
+import threading
+from contextvars import ContextVar
+from typing import Any, Callable, Iterable, Optional, Tuple
+
+
+class ToolResultCache:
+    """
+    TTL cache for results of read-only tools.
+
+    Entries are grouped (e.g. "docker") so that a mutating tool can drop every
+    cached read of the resources it touches with a single invalidate call.
+    """
+    def __init__(self):
+        self._groups: dict[str, dict[str, Tuple[float, Any]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(tool_name: str, func: Callable, args: tuple, kwargs: dict) -> str:
+        """Builds a key from the tool name and its arguments normalized against the signature."""
+        try:
+            bound = inspect.signature(func).bind(*args, **kwargs)
+            bound.apply_defaults()
+            normalized = bound.arguments
+        except (TypeError, ValueError):
+            normalized = {"args": args, "kwargs": kwargs}
+        return f"{tool_name}:{json.dumps(normalized, sort_keys=True, default=str)}"
+
+    def get(self, group: str, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._groups.get(group, {}).get(key)
+            if not entry:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._groups[group].pop(key, None)
+                return False, None
+            return True, value
+
+    def set(self, group: str, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._groups.setdefault(group, {})[key] = (time.monotonic() + ttl, value)
+
+    def invalidate(self, *groups: str):
+        with self._lock:
+            for group in groups:
+                self._groups.pop(group, None)
+
+    def clear(self):
+        with self._lock:
+            self._groups.clear()
+
+
+tool_result_cache = ToolResultCache()
+# set by cache_wrapper when it answers from cache, so metrics_wrapper around it can tell hits apart
+served_from_cache: ContextVar[bool] = ContextVar("served_from_cache", default=False)
+
+
+def _is_failed_result(result) -> bool:
+    # TaskOutput(success=False) and the like must not be served again from cache
+    return getattr(result, "success", True) is False
+
+
+def cache_wrapper(func,
+                name: str,
+                ttl: float,
+                group: str = "default",
+                cache: Optional[ToolResultCache] = None):
+    """Serves repeated calls with the same normalized args from cache for `ttl` seconds."""
+    cache = cache or tool_result_cache
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            key = cache.make_key(name, func, args, kwargs)
+            hit, value = cache.get(group, key)
+            if hit:
+                served_from_cache.set(True)
+                return value
+            result = await func(*args, **kwargs)
+            if not _is_failed_result(result):
+                cache.set(group, key, result, ttl)
+            return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = cache.make_key(name, func, args, kwargs)
+        hit, value = cache.get(group, key)
+        if hit:
+            served_from_cache.set(True)
+            return value
+        result = func(*args, **kwargs)
+        if not _is_failed_result(result):
+            cache.set(group, key, result, ttl)
+        return result
+    return wrapper
+
+
+def invalidate_wrapper(func,
+                    groups: Iterable[str],
+                    cache: Optional[ToolResultCache] = None):
+    """Drops cached results of `groups` after every call of a mutating tool."""
+    cache = cache or tool_result_cache
+    groups = tuple(groups)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                cache.invalidate(*groups)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            cache.invalidate(*groups)
+    return wrapper
@@ -0,0 +1,185 @@
+import time
+import asyncio
+import logging
+import aiosqlite
+from pathlib import Path
+from typing import Optional
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from core.utils.metric_tools import Histogram, LATENCY_BUCKETS
+
+
+logger = logging.getLogger(__name__)
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=134217728",
+    "PRAGMA busy_timeout=5000",
+    # only takes effect on a new database, older files get a full VACUUM instead
+    "PRAGMA auto_vacuum=INCREMENTAL",
+)
+
+
+class TunedAsyncSqliteSaver(AsyncSqliteSaver):
+    """AsyncSqliteSaver that reports write latency and written threads to its CheckpointStore."""
+    store: Optional["CheckpointStore"] = None
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        start = time.perf_counter()
+        result = await super().aput(config, checkpoint, metadata, new_versions)
+        if self.store:
+            self.store.record_write(config, time.perf_counter() - start)
+        return result
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        start = time.perf_counter()
+        result = await super().aput_writes(config, writes, task_id, task_path)
+        if self.store:
+            self.store.record_write(config, time.perf_counter() - start)
+        return result
+
+
+class CheckpointStore:
+    """
+    Checkpoint storage shared by every chat session of the process.
+
+    - one aiosqlite connection and saver per database file, tuned with SQLITE_PRAGMAS
+    - keeps only the last `keep_last` root checkpoints of every written thread, and the
+      subgraph checkpoints (e.g. the react agent's `agent:<task id>` namespaces) under them
+    - background compaction: pruning, WAL truncation and (incremental) VACUUM
+
+    Example usage:
+        store = CheckpointStore.for_path(settings.DOCKER_AGENT_CHAT_DB)
+        checkpointer = await store.saver()
+        await store.stats()
+    """
+    _stores: dict[Path, "CheckpointStore"] = {}
+
+    def __init__(self, path, keep_last: int = 20, compaction_interval: float = 600):
+        self.path = Path(path)
+        self.keep_last = keep_last
+        self.compaction_interval = compaction_interval
+        self.write_latency = Histogram(LATENCY_BUCKETS)
+        self.pruned_checkpoints = 0
+        self.last_compaction: Optional[float] = None
+        self._saver: Optional[TunedAsyncSqliteSaver] = None
+        self._lock = asyncio.Lock()
+        self._dirty_threads: set[str] = set()
+        self._compaction_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def for_path(cls, path, **kwargs) -> "CheckpointStore":
+        key = Path(path).resolve()
+        if store := cls._stores.get(key):
+            return store
+        store = cls._stores[key] = cls(path, **kwargs)
+        return store
+
+    async def saver(self) -> TunedAsyncSqliteSaver:
+        if self._saver:
+            return self._saver
+        async with self._lock:
+            if not self._saver:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                conn = await aiosqlite.connect(self.path, check_same_thread=False)
+                for pragma in SQLITE_PRAGMAS:
+                    await conn.execute(pragma)
+                saver = TunedAsyncSqliteSaver(conn)
+                saver.store = self
+                await saver.setup()
+                self._saver = saver
+                if self.compaction_interval:
+                    self._compaction_task = asyncio.create_task(self._compaction_loop())
+        return self._saver
+
+    def record_write(self, config, duration: float):
+        self.write_latency.observe(duration)
+        if thread_id := config.get("configurable", {}).get("thread_id"):
+            self._dirty_threads.add(str(thread_id))
+
+    async def prune_thread(self, thread_id: str) -> int:
+        """
+        Deletes all but the last `keep_last` root checkpoints of a thread, the subgraph
+        namespaces started from the deleted ones and the writes of everything deleted.
+        Subgraph checkpoints name their root checkpoint in metadata["parents"][""].
+        """
+        saver = await self.saver()
+        keep_subquery = (
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' "
+            "ORDER BY checkpoint_id DESC LIMIT ?"
+        )
+        async with saver.lock:
+            root = await saver.conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' "
+                f"AND checkpoint_id NOT IN ({keep_subquery})",
+                (thread_id, thread_id, self.keep_last),
+            )
+            subgraphs = await saver.conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns != '' "
+                "AND json_extract(CAST(metadata AS TEXT), '$.parents.\"\"') NOT IN "
+                "(SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '')",
+                (thread_id, thread_id),
+            )
+            await saver.conn.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND NOT EXISTS ("
+                "SELECT 1 FROM checkpoints c WHERE c.thread_id = writes.thread_id "
+                "AND c.checkpoint_ns = writes.checkpoint_ns AND c.checkpoint_id = writes.checkpoint_id)",
+                (thread_id,),
+            )
+            await saver.conn.commit()
+        pruned = root.rowcount + subgraphs.rowcount
+        self.pruned_checkpoints += pruned
+        return pruned
+
+    async def compact(self):
+        """Prunes threads written since the last run, then returns free pages to the filesystem."""
+        saver = await self.saver()
+        dirty_threads, self._dirty_threads = self._dirty_threads, set()
+        for thread_id in dirty_threads:
+            await self.prune_thread(thread_id)
+
+        async with saver.lock:
+            async with saver.conn.execute("PRAGMA auto_vacuum") as cursor:
+                auto_vacuum = (await cursor.fetchone())[0]
+            async with saver.conn.execute("PRAGMA freelist_count") as cursor:
+                free_pages = (await cursor.fetchone())[0]
+            if free_pages:
+                # 2 == INCREMENTAL, anything else needs a full VACUUM to reclaim space;
+                # incremental_vacuum frees pages as its rows are read, it must run to the end
+                async with saver.conn.execute("PRAGMA incremental_vacuum" if auto_vacuum == 2 else "VACUUM") as cursor:
+                    await cursor.fetchall()
+            await saver.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.last_compaction = time.time()
+
+    async def _compaction_loop(self):
+        while True:
+            await asyncio.sleep(self.compaction_interval)
+            try:
+                await self.compact()
+                logger.info("checkpoint store compacted: %s", await self.stats())
+            except Exception as e:
+                logger.warning("checkpoint store compaction failed: %s", e)
+
+    async def stats(self) -> dict:
+        size = sum(
+            path.stat().st_size
+            for path in (self.path, Path(f"{self.path}-wal"), Path(f"{self.path}-shm"))
+            if path.exists()
+        )
+        return {
+            "db_size_bytes": size,
+            "writes": self.write_latency.count,
+            "write_latency_p50": self.write_latency.quantile(0.5),
+            "write_latency_p99": self.write_latency.quantile(0.99),
+            "pruned_checkpoints": self.pruned_checkpoints,
+            "last_compaction": self.last_compaction,
+        }
+
+    async def close(self):
+        if self._compaction_task:
+            self._compaction_task.cancel()
+        if self._saver:
+            await self._saver.conn.close()
+            self._saver = None
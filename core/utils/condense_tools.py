@@ -0,0 +1,228 @@
+import re
+import uuid
+import inspect
+import functools
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from core import settings
+from core.terminal import strip_ansi
+from core.utils.memory_tools import count_tokens
+
+
+ERROR_LINE = re.compile(
+    r"\b(\w*error|\w*exception|errors|traceback|fatal|panic|failed|failure|critical|denied|refused|"
+    r"timed? ?out|cannot|unable|segmentation fault|killed|oom)\b",
+    re.IGNORECASE
+)
+# cheap literal scan of the lowercased line, ERROR_LINE only confirms the candidates
+ERROR_HINT = re.compile(r"error|exception|traceback|fatal|panic|fail|critical|denied|refused|tim|cannot|unable|segmentation|killed|oom")
+DIGITS = re.compile(r"\d+")
+MAX_LINE_CHARS = 500
+SAMPLE_CHARS = 200_000
+
+
+def cap_line(line: str) -> str:
+    if len(line) <= MAX_LINE_CHARS:
+        return line
+    return f"{line[:MAX_LINE_CHARS]} … [{len(line) - MAX_LINE_CHARS} chars]"
+
+
+def collapse_repeats(lines: list[str]) -> list[Tuple[int, str]]:
+    """
+    (line number, text) pairs with runs of repeated lines folded: identical lines become one
+    line with a count, lines differing only in numbers (progress, counters) keep the first and last.
+    """
+    collapsed = []
+    shapes = [DIGITS.sub("#", line) for line in lines]
+    i = 0
+    while i < len(lines):
+        j = i + 1
+        while j < len(lines) and lines[j] == lines[i]:
+            j += 1
+        if j - i > 1:
+            collapsed.append((i + 1, f"{lines[i]}  [×{j - i}]"))
+            i = j
+            continue
+        while j < len(lines) and shapes[j] == shapes[i]:
+            j += 1
+        if j - i > 3:
+            collapsed.append((i + 1, lines[i]))
+            collapsed.append((None, f"  [… {j - i - 2} similar lines …]"))
+            collapsed.append((j, lines[j - 1]))
+        else:
+            collapsed.extend((n + 1, lines[n]) for n in range(i, j))
+        i = j
+    return collapsed
+
+
+class OutputStore:
+    """
+    Full text of condensed tool outputs by handle, so the model can read any range later.
+    The least recently stored outputs are dropped beyond `max_entries` or `max_chars`.
+    """
+    def __init__(self, max_entries: int = 64, max_chars: int = settings.TOOL_OUTPUT_STORE_MAX_CHARS):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._outputs: OrderedDict[str, list[str]] = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    def put(self, lines: list[str]) -> str:
+        handle = f"out-{uuid.uuid4().hex[:8]}"
+        size = sum(len(line) + 1 for line in lines)
+        with self._lock:
+            self._outputs[handle] = lines
+            self._chars += size
+            while self._outputs and (len(self._outputs) > self.max_entries or self._chars > self.max_chars):
+                _, dropped = self._outputs.popitem(last=False)
+                self._chars -= sum(len(line) + 1 for line in dropped)
+        return handle
+
+    def get(self, handle: str) -> Optional[list[str]]:
+        with self._lock:
+            return self._outputs.get(handle)
+
+
+output_store = OutputStore()
+
+
+def condense_text(text: str,
+                max_tokens: int = settings.TOOL_OUTPUT_MAX_TOKENS,
+                store: Optional[OutputStore] = None) -> str:
+    """
+    Fits a tool output into about `max_tokens`: ANSI codes are stripped, repeated lines
+    collapsed, then the head and tail are kept along with every error-looking line in
+    between (as far as the budget goes). The full output stays in `store` behind a handle
+    given in the last line, readable with fetch_tool_output.
+    """
+    text = strip_ansi(text)
+    if len(text) > SAMPLE_CHARS:
+        # tokenizing megabytes costs more than the rest, the ratio of a sample is close enough
+        tokens = int(count_tokens(text[:SAMPLE_CHARS]) * len(text) / SAMPLE_CHARS)
+    else:
+        tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    store = store or output_store
+    lines = text.split("\n")
+    handle = store.put(lines)
+    # in chars, with room for the markers, the footer and lines denser in tokens than the average
+    budget = int(max_tokens * 0.95 * len(text) / tokens) - 200
+    footer = (
+        f"[condensed from {len(lines)} lines (~{tokens} tokens), "
+        f"full output: fetch_tool_output(handle=\"{handle}\", start_line=..., end_line=...)]"
+    )
+    collapsed = [(number, cap_line(line)) for number, line in collapse_repeats(lines)]
+    if sum(len(line) + 1 for _, line in collapsed) <= budget:
+        return "\n".join([*(line for _, line in collapsed), footer])
+
+    def take(entries, limit: int) -> Tuple[list, int]:
+        taken, used = [], 0
+        for entry in entries:
+            if used + len(entry[1]) + 1 > limit:
+                break
+            taken.append(entry)
+            used += len(entry[1]) + 1
+        return taken, used
+
+    # errors in between get what head and tail leave, the tail (where commands fail) is the larger part
+    head, head_size = take(collapsed, budget * 3 // 10)
+    tail, tail_size = take(reversed(collapsed[len(head):]), budget * 4 // 10)
+    middle = collapsed[len(head):len(collapsed) - len(tail)]
+    errors, errors_size, skipped_errors = [], 0, 0
+    error_budget = budget - head_size - tail_size
+    # the errors closest to the end win, they usually explain the failure
+    for number, line in reversed(middle):
+        if number is None or not ERROR_HINT.search(line.lower()) or not ERROR_LINE.search(line):
+            continue
+        line = f"L{number}: {line}"
+        if errors_size + len(line) + 1 > error_budget:
+            skipped_errors += 1
+            continue
+        errors.append((number, line))
+        errors_size += len(line) + 1
+    errors.reverse()
+    # whatever the errors left extends the tail
+    more_tail, _ = take(reversed(middle), budget - head_size - tail_size - errors_size)
+    tail = list(reversed(tail + more_tail))
+    middle = middle[:len(middle) - len(more_tail)]
+    omitted = [number for number, _ in middle if number is not None]
+    errors = [entry for entry in errors if omitted and entry[0] <= omitted[-1]]
+
+    parts = [line for _, line in head]
+    if omitted:
+        note = f"… [lines {omitted[0]}-{omitted[-1]} omitted"
+        if errors:
+            note += f", {len(errors)} error lines among them shown below"
+        if skipped_errors:
+            note += f", {skipped_errors} more not shown"
+        parts.append(note + "] …")
+        parts += [line for _, line in errors]
+        if errors:
+            parts.append("… [end of omitted lines] …")
+    parts += [line for _, line in tail]
+    parts.append(footer)
+    return "\n".join(parts)
+
+
+def condense_result(result, max_tokens: int, store: Optional[OutputStore] = None):
+    """Condenses a str result, or the output and error of a TaskOutput-like result."""
+    if isinstance(result, str):
+        return condense_text(result, max_tokens, store)
+    if hasattr(result, "model_copy") and isinstance(getattr(result, "output", None), str):
+        update = {"output": condense_text(result.output, max_tokens, store)}
+        if isinstance(getattr(result, "error", None), str):
+            update["error"] = condense_text(result.error, max_tokens, store)
+        return result.model_copy(update=update)
+    return result
+
+
+def condense_wrapper(func, max_tokens: int = settings.TOOL_OUTPUT_MAX_TOKENS, store: Optional[OutputStore] = None):
+    """Condenses every result of `func` to about max_tokens (see condense_text)."""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            return condense_result(await func(*args, **kwargs), max_tokens, store)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return condense_result(func(*args, **kwargs), max_tokens, store)
+    return wrapper
+
+
+def fetch_tool_output(handle: str,
+                    start_line: int = 1,
+                    end_line: Optional[int] = None,
+                    pattern: Optional[str] = None) -> str:
+    """
+    Reads lines start_line..end_line (1-based, inclusive) of a condensed tool output.
+    pattern: optional regex, only matching lines of the range are returned.
+    Long ranges are cut at the token budget, the last line tells where to continue.
+    """
+    lines = output_store.get(handle)
+    if lines is None:
+        return f"output {handle} not found, it expired: run the tool again"
+    end_line = min(end_line or len(lines), len(lines))
+    start_line = max(1, start_line)
+    try:
+        matcher = re.compile(pattern, re.IGNORECASE) if pattern else None
+    except re.error as e:
+        return f"invalid pattern: {e}"
+    budget = settings.TOOL_OUTPUT_MAX_TOKENS * 4
+    parts, used = [], 0
+    for number in range(start_line, end_line + 1):
+        line = lines[number - 1]
+        if matcher and not matcher.search(line):
+            continue
+        line = f"L{number}: {cap_line(line)}"
+        if used + len(line) + 1 > budget:
+            parts.append(f"[cut at the token budget, continue with start_line={number}]")
+            break
+        parts.append(line)
+        used += len(line) + 1
+    if not parts:
+        return f"no lines{' matching ' + repr(pattern) if pattern else ''} in {start_line}-{end_line} of {len(lines)}"
+    return "\n".join(parts)
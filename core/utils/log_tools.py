@@ -1,6 +1,16 @@
+import queue
+import atexit
+import random
+import asyncio
+import inspect
 import functools
-from typing import Optional, Callable
+import threading
+from typing import Optional, Callable, Union
 from langchain.tools import StructuredTool
+from core import settings
+from core.utils.cache_tools import cache_wrapper, invalidate_wrapper
+from core.utils.metric_tools import metrics_wrapper
+from core.utils.condense_tools import condense_wrapper
 
 class StyledPrinter:
     """
@@ -12,72 +22,213 @@ class StyledPrinter:
         printer["italic"]["red"]("Italic red text")
         printer["blue"]["bg_red"]["bold"]["underline"]("Styled text")
     """
+    # ANSI style codes
+    styles = {
+        "bold": "1",
+        "underline": "4",
+        "reverse": "7",
+        "italic": "3",
+    }
+
+    # Foreground colors (your extended 256-color list)
+    fg_colors = {
+        "warm_yellow": "220", "yellow": "226", "orange": "208",
+        "red": "196", "light_red": "203", "green": "82", "light_green": "120",
+        "cyan": "51", "light_cyan": "159", "blue": "33", "light_blue": "75",
+        "purple": "129", "magenta": "201", "pink": "205", "gray": "245",
+        "dark_gray": "240", "light_gray": "250", "white": "15", "black": "16",
+        "gold": "220", "teal": "37", "olive": "142", "brown": "94",
+        "maroon": "124", "navy": "18", "violet": "135", "turquoise": "80",
+        "lime": "118", "dark_green": "22", "sky": "153", "warm_blue": "117"
+    }
+
+    # Every key resolved to its ANSI code once, backgrounds included
+    codes_map = {
+        **styles,
+        **{name: f"38;5;{code}" for name, code in fg_colors.items()},
+        **{"bg_" + name: f"48;5;{code}" for name, code in fg_colors.items()},
+    }
+
     def __init__(self, codes=None):
         self.codes = codes or []
+        self.prefix = f"\033[{';'.join(self.codes)}m" if self.codes else ""
+        self._children = {}
 
     def __getitem__(self, key):
-        # ANSI style codes
-        styles = {
-            "bold": "1",
-            "underline": "4",
-            "reverse": "7",
-            "italic": "3",
-        }
-        
-        # Foreground colors (your extended 256-color list)
-        fg_colors = {
-            "warm_yellow": "220", "yellow": "226", "orange": "208",
-            "red": "196", "light_red": "203", "green": "82", "light_green": "120",
-            "cyan": "51", "light_cyan": "159", "blue": "33", "light_blue": "75",
-            "purple": "129", "magenta": "201", "pink": "205", "gray": "245",
-            "dark_gray": "240", "light_gray": "250", "white": "15", "black": "16",
-            "gold": "220", "teal": "37", "olive": "142", "brown": "94",
-            "maroon": "124", "navy": "18", "violet": "135", "turquoise": "80",
-            "lime": "118", "dark_green": "22", "sky": "153", "warm_blue": "117"
-        }
-
-        # Background colors
-        bg_colors = dict(("bg_" + color_name, code) for color_name, code in fg_colors.items())
-
-        code = None
-        if key in styles:
-            code = styles[key]
-        elif key in fg_colors:
-            code = f"38;5;{fg_colors[key]}"
-        elif key in bg_colors:
-            code = f"48;5;{bg_colors[key]}"
-        else:
+        # Chained printers are built once and reused
+        if child := self._children.get(key):
+            return child
+        if key not in self.codes_map:
             raise KeyError(f"Style or color '{key}' not defined.")
+        child = self._children[key] = StyledPrinter(self.codes + [self.codes_map[key]])
+        return child
+
+    def keys(self):
+        return self.codes_map.keys()
 
-        # Return a new instance with combined codes
-        return StyledPrinter(self.codes + [code])
+    def format(self, text) -> str:
+        if not self.prefix:
+            return str(text)
+        return f"{self.prefix}{text}\033[0m"
 
     def __call__(self, text):
-        if not self.codes:
-            print(text)
-        else:
-            print(f"\033[{';'.join(self.codes)}m{text}\033[0m")
+        print(self.format(text))
 
 
 # Create the printer instance
 printers = StyledPrinter()
 
 
-def log_wrapper(func, log_colour:Optional[str]="warm_yellow", printer=None):
+def shorten(value, max_chars: int) -> str:
+    """Keeps head and tail of the text form of `value` within max_chars."""
+    text = value if isinstance(value, str) else str(value)
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    half = max_chars // 2
+    return f"{text[:half]} ... [{len(text) - max_chars} chars truncated] ... {text[-half:]}"
+
+
+class LogSink:
+    """
+    Queue-backed logging sink that keeps styling and terminal writes
+    off the calling thread.
+
+    Records are queued as text already capped by the caller, so the queue never
+    keeps tool results alive. They are sampled with `sample_rate` (check
+    `sampled()` before formatting one) and dropped (and counted) when the queue is full.
+
+    Example usage:
+        if log_sink.sampled():
+            log_sink.emit(printers["red"], shorten(repr(obj), log_sink.max_chars))
+    """
+    def __init__(self,
+                max_chars: int = 2000,
+                sample_rate: float = 1.0,
+                max_queue: int = 10_000,
+                background: bool = True):
+        self.max_chars = max_chars
+        self.sample_rate = sample_rate
+        self.background = background
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def sampled(self) -> bool:
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def emit(self, printer: StyledPrinter, text: str):
+        if not self.background:
+            self._write(printer, text)
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((printer, text))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Blocks until every queued record is written."""
+        if self._thread:
+            self._queue.join()
+
+    def _write(self, printer, text):
+        try:
+            printer(text)
+        except Exception as e:
+            print(f"[LOG] failed to write log record: {e}")
+
+    def _run(self):
+        while True:
+            printer, text = self._queue.get()
+            self._write(printer, text)
+            self._queue.task_done()
+
+    def _ensure_started(self):
+        if self._thread:
+            return
+        with self._lock:
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+
+log_sink = LogSink(
+    max_chars=settings.TOOL_LOG_MAX_CHARS,
+    sample_rate=settings.TOOL_LOG_SAMPLE_RATE,
+    background=settings.TOOL_LOG_BACKGROUND,
+)
+
+
+def log_wrapper(func, log_colour:Optional[str]="warm_yellow", printer=None, sink=None):
     printer = printer or printers[log_colour]
+    sink = sink or log_sink
+
+    def emit(args, kwargs, result):
+        if not sink.sampled():
+            return
+        # capped here, a queued record must not hold on to the full result
+        sink.emit(printer, (
+            f"[LOG] Using {func.__name__} "
+            f"with args: {shorten(args, sink.max_chars)}, "
+            f"kwargs: {shorten(kwargs, sink.max_chars)}\n"
+            f"---> result: {shorten(result, sink.max_chars)}"
+        ))
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            log = kwargs.pop("log", True)  # extract `log` if passed
+            result = await func(*args, **kwargs)
+            if log:
+                emit(args, kwargs, result)
+            return result
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         log = kwargs.pop("log", True)  # extract `log` if passed
         result = func(*args, **kwargs)
         if log:
-            printer(
-                f"[LOG] Using {func.__name__}"
-                f"with args: {args}, kwargs: {kwargs}\n---> result: {result}"
-            )
+            emit(args, kwargs, result)
         return result
     return wrapper
 
 
+def to_thread_wrapper(func):
+    """Coroutine running the blocking `func` in a worker thread."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return wrapper
+
+
+def _instrument_tool_callable(func,
+                            name,
+                            log,
+                            log_colour,
+                            log_printer,
+                            cache_ttl,
+                            cache_group,
+                            invalidates,
+                            metrics,
+                            condense):
+    """Applies the tool wrappers to a sync or async callable, returns (wrapped, base)."""
+    if cache_ttl:
+        func = cache_wrapper(func, name, cache_ttl, group=cache_group)
+    if invalidates:
+        func = invalidate_wrapper(func, invalidates)
+    # outside the cache: a cached condensed result would point at a handle
+    # the output store may have dropped since, every call stores its own
+    if condense:
+        func = condense_wrapper(func, settings.TOOL_OUTPUT_MAX_TOKENS if condense is True else condense)
+    base_func = func
+    func = log_wrapper(func, log_colour, printer=log_printer) if log else func
+    func = metrics_wrapper(func, name) if metrics else func
+    return func, base_func
+
+
 def create_structured_tool(
                     func,
                     name,
@@ -85,27 +236,73 @@ def create_structured_tool(
                     args_schema=None,
                     log=True,
                     log_colour="warm_yellow",
-                    log_printer=None):
-    func = log_wrapper(func, log_colour, printer=log_printer) if log else func
+                    log_printer=None,
+                    cache_ttl: Optional[float] = None,
+                    cache_group: str = "default",
+                    invalidates: Optional[list[str]] = None,
+                    metrics=True,
+                    coroutine=None,
+                    condense: Union[bool, int] = False):
+    """
+    cache_ttl: marks the tool as read-only, results are cached per normalized args
+    cache_group: cache group the read-only results are stored in
+    invalidates: cache groups dropped after each call (for mutating tools)
+    metrics: record call counts, errors, latency and result size in tool_metrics
+    coroutine: async implementation, derived from `func` (run in a worker thread)
+        when omitted. An async `func` is used as the coroutine of an async-only tool
+    condense: token budget results are condensed to before they reach the model
+        (True for TOOL_OUTPUT_MAX_TOKENS), the full output stays readable with fetch_tool_output
+    """
+    if coroutine is None and inspect.iscoroutinefunction(func):
+        func, coroutine = None, func
+    if coroutine is None:
+        coroutine = to_thread_wrapper(func)
+
+    wrapper_options = dict(
+        name=name,
+        log=log,
+        log_colour=log_colour,
+        log_printer=log_printer,
+        cache_ttl=cache_ttl,
+        cache_group=cache_group,
+        invalidates=invalidates,
+        metrics=metrics,
+        condense=condense,
+    )
+    base_func = None
+    if func is not None:
+        func, base_func = _instrument_tool_callable(func, **wrapper_options)
+    coroutine, base_coroutine = _instrument_tool_callable(coroutine, **wrapper_options)
     tool = ToolWrapper.from_function(
         func=func,
+        coroutine=coroutine,
         name=name,
         description=description,
         args_schema=args_schema,
     )
-    tool.base_func = func
+    tool.base_func = base_func
+    tool.base_coroutine = base_coroutine
+    tool.record_metrics = metrics
     return tool
 
 
 class ToolWrapper(StructuredTool):
     last_func: Optional[Callable] = None
     base_func: Optional[Callable] = None
+    base_coroutine: Optional[Callable] = None
+    record_metrics: bool = True
     
     def change_log_colour(self, log_colour=None):
-        self.base = log_wrapper(self.base_func, log_colour)
+        def rewrap(base):
+            if base is None:
+                return None
+            wrapped = log_wrapper(base, log_colour)
+            return metrics_wrapper(wrapped, self.name) if self.record_metrics else wrapped
+        self.func = rewrap(self.base_func)
+        self.coroutine = rewrap(self.base_coroutine)
 
     def add_wrapper(self, wrapper):
-        self.fun = wrapper(self.fun)
+        self.func = wrapper(self.func)
         
     
         
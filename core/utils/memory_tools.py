@@ -0,0 +1,226 @@
+import functools
+from collections import deque
+from contextvars import ContextVar
+from typing import Callable, Optional
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from core import settings
+
+
+# memory of the chat session being served, read by graphs shared between sessions
+current_context_memory: ContextVar[Optional["TokenBudgetMemory"]] = ContextVar(
+    "current_context_memory", default=None
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # tiktoken missing or its BPE file can not be fetched (offline)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return " ".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for part in message.content
+    )
+
+
+def message_tokens(message: BaseMessage) -> int:
+    tokens = count_tokens(message_text(message)) + 4  # role and framing overhead
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        tokens += count_tokens(f"{tool_call.get('name')}{tool_call.get('args')}")
+    return tokens
+
+
+def elide_text(text: str, max_tokens: int) -> str:
+    """Keeps the head and tail of text within roughly max_tokens."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    keep_chars = max_tokens * 2  # ~4 chars per token, half for head and half for tail
+    return (
+        f"{text[:keep_chars]}\n... [output elided, {len(text)} chars total] ...\n{text[-keep_chars:]}"
+    )
+
+
+def extractive_summary(previous_summary: str, messages: list[BaseMessage], max_tokens: int = 500) -> str:
+    """Cheap summarizer: one short line per user/assistant message, most recent kept."""
+    lines = previous_summary.splitlines() if previous_summary else []
+    for message in messages:
+        if isinstance(message, ToolMessage):
+            continue
+        text = " ".join(message_text(message).split())
+        if isinstance(message, HumanMessage):
+            lines.append(f"user: {text[:200]}")
+        elif text:
+            lines.append(f"assistant: {text[:200]}")
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            lines.append(f"assistant called {tool_call.get('name')}")
+
+    while lines and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def llm_summarizer(llm, max_tokens: int = 500) -> Callable[[str, list[BaseMessage], int], str]:
+    """Builds a summarizer that folds new messages into the previous summary with `llm`."""
+    def summarize(previous_summary: str, messages: list[BaseMessage], _max_tokens: int = max_tokens) -> str:
+        transcript = "\n".join(
+            f"{message.type}: {elide_text(message_text(message), 200)}" for message in messages
+        )
+        response = llm.invoke(
+            f"Update the summary of an ops conversation in under {_max_tokens} tokens. "
+            "Keep container names, ids, commands and decisions.\n\n"
+            f"Current summary:\n{previous_summary or '(empty)'}\n\nNew messages:\n{transcript}"
+        )
+        return message_text(response)
+    return summarize
+
+
+def split_turns(messages: list[BaseMessage]) -> list[list[BaseMessage]]:
+    """Groups messages into turns, each starting at a user message."""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def recent_turns(messages: list[BaseMessage], turns: int) -> list[BaseMessage]:
+    """Messages of the last `turns` turns, tool calls kept with their results."""
+    return [m for turn in split_turns(messages)[-turns:] for m in turn]
+
+
+class TokenBudgetMemory:
+    """
+    Conversation memory with a hard token budget.
+
+    The prompt is built from a rolling summary of older turns plus a sliding
+    window of the most recent turns (a turn starts at a user message, so tool
+    calls are never split from their results). Tool outputs outside the
+    current turn are elided to `tool_output_tokens`. With no `token_budget`
+    the messages are passed through untrimmed.
+
+    The messages themselves live in the graph state (checkpointer), the memory
+    only trims what the model sees, through its pre_model_hook.
+
+    Example usage:
+        memory = TokenBudgetMemory(token_budget=6000)
+        memory.trim(state["messages"])  # or create_react_agent(..., pre_model_hook=memory.pre_model_hook)
+        memory.last_stats  # {"history_tokens": ..., "prompt_tokens": ..., ...}
+    """
+    def __init__(self,
+                token_budget: Optional[int] = 8000,
+                window_turns: int = 6,
+                tool_output_tokens: int = 500,
+                summary_tokens: int = 500,
+                summarizer: Optional[Callable] = None,
+                stats_size: int = 100):
+        self.token_budget = token_budget
+        self.window_turns = window_turns
+        self.tool_output_tokens = tool_output_tokens
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer or extractive_summary
+        self.turn_stats: deque[dict] = deque(maxlen=stats_size)
+        # last summarized message id -> rolling summary up to that message
+        self._summaries: dict = {}
+
+    @property
+    def last_stats(self) -> Optional[dict]:
+        return self.turn_stats[-1] if self.turn_stats else None
+
+    def pre_model_hook(self, state) -> dict:
+        """LangGraph pre_model_hook: trims the model input, the graph state keeps every message."""
+        return {"llm_input_messages": self.trim(state["messages"])}
+
+    def trim(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+        if self.token_budget is None:
+            return messages
+        system_messages = [m for m in messages if isinstance(m, SystemMessage)]
+        turns = self._split_turns([m for m in messages if not isinstance(m, SystemMessage)])
+        history_tokens = sum(message_tokens(m) for m in messages)
+
+        window = turns[-self.window_turns:] if self.window_turns else turns[-1:]
+        window = [self._elide_tool_outputs(turn) for turn in window[:-1]] + window[-1:]
+        window_tokens = [sum(message_tokens(m) for m in turn) for turn in window]
+        system_tokens = sum(message_tokens(m) for m in system_messages)
+        budget = self.token_budget - system_tokens - self.summary_tokens
+        if window and window_tokens[-1] > budget:
+            # the current turn alone is over budget, elide its tool outputs too
+            window[-1] = self._elide_tool_outputs(window[-1])
+            window_tokens[-1] = sum(message_tokens(m) for m in window[-1])
+        while len(window) > 1 and sum(window_tokens) > budget:
+            window.pop(0)
+            window_tokens.pop(0)
+
+        older = [m for turn in turns[:len(turns) - len(window)] for m in turn]
+        summary_messages = []
+        if older:
+            summary_messages.append(SystemMessage(
+                content=f"Summary of the earlier conversation:\n{self._summarize(older)}"
+            ))
+
+        trimmed = system_messages + summary_messages + [m for turn in window for m in turn]
+        self.turn_stats.append({
+            "history_tokens": history_tokens,
+            "prompt_tokens": sum(message_tokens(m) for m in trimmed),
+            "turns_kept": len(window),
+            "turns_summarized": len(turns) - len(window),
+        })
+        return trimmed
+
+    @staticmethod
+    def _split_turns(messages: list[BaseMessage]) -> list[list[BaseMessage]]:
+        return split_turns(messages)
+
+    def _elide_tool_outputs(self, turn: list[BaseMessage]) -> list[BaseMessage]:
+        return [
+            message.model_copy(update={"content": elide_text(message_text(message), self.tool_output_tokens)})
+            if isinstance(message, ToolMessage) else message
+            for message in turn
+        ]
+
+    def _summarize(self, older: list[BaseMessage]) -> str:
+        keys = [m.id or id(m) for m in older]
+        if summary := self._summaries.get(keys[-1]):
+            return summary
+        # resume from the longest already summarized prefix
+        start, previous = 0, ""
+        for i in range(len(keys) - 1, -1, -1):
+            if keys[i] in self._summaries:
+                start, previous = i + 1, self._summaries[keys[i]]
+                break
+        summary = self.summarizer(previous, older[start:], self.summary_tokens)
+        self._summaries[keys[-1]] = summary
+        if len(self._summaries) > 256:
+            self._summaries.pop(next(iter(self._summaries)))
+        return summary
+
+
+def create_conversation_memory(mode: Optional[str] = None):
+    """
+    Returns the memory for a chat session.
+    mode: "budget" (trimmed to MEMORY_TOKEN_BUDGET) or "buffer" (the whole history
+          goes to the model), defaults to settings.MEMORY_MODE
+    """
+    mode = mode or settings.MEMORY_MODE
+    if mode == "buffer":
+        return TokenBudgetMemory(token_budget=None)
+    return TokenBudgetMemory(
+        token_budget=settings.MEMORY_TOKEN_BUDGET,
+        window_turns=settings.MEMORY_WINDOW_TURNS,
+        tool_output_tokens=settings.MEMORY_TOOL_OUTPUT_TOKENS,
+    )
@@ -0,0 +1,239 @@
+import time
+import bisect
+import inspect
+import functools
+import threading
+from pathlib import Path
+from typing import Optional, Sequence
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from core.utils.cache_tools import served_from_cache
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+RESULT_SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with Prometheus-style quantile estimation."""
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Linear interpolation inside the bucket holding the q-th observation."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower
+                upper = self.buckets[i]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def render(self, metric: str, labels: str) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{metric}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{metric}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class ToolStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.result_size = Histogram(RESULT_SIZE_BUCKETS)
+
+
+class ToolMetrics:
+    """
+    Per-tool call counts, error counts, latency and result size histograms.
+
+    Example usage:
+        tool_metrics.observe("list_available_containers", 0.12, 2048)
+        print(tool_metrics.render_prometheus())
+    """
+    def __init__(self):
+        self._tools: dict[str, ToolStats] = {}
+        self._lock = threading.Lock()
+
+    def observe(self,
+                tool_name: str,
+                duration: float,
+                result_size: int = 0,
+                error: bool = False,
+                cache_hit: bool = False):
+        """Cache hits are only counted, their latency and size would describe the cache, not the tool."""
+        with self._lock:
+            stats = self._tools.get(tool_name)
+            if stats is None:
+                stats = self._tools[tool_name] = ToolStats()
+            stats.calls += 1
+            if cache_hit:
+                stats.cache_hits += 1
+                return
+            stats.errors += int(error)
+            stats.latency.observe(duration)
+            stats.result_size.observe(result_size)
+
+    def snapshot(self) -> dict:
+        """Summary per tool with p50/p99 latency in seconds and result size in characters."""
+        with self._lock:
+            return {
+                name: {
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "cache_hits": stats.cache_hits,
+                    "latency_p50": stats.latency.quantile(0.5),
+                    "latency_p99": stats.latency.quantile(0.99),
+                    "result_size_p50": stats.result_size.quantile(0.5),
+                    "result_size_p99": stats.result_size.quantile(0.99),
+                }
+                for name, stats in self._tools.items()
+            }
+
+    def render_prometheus(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format (0.0.4)."""
+        lines = [
+            "# HELP opsagent_tool_calls_total Number of tool calls.",
+            "# TYPE opsagent_tool_calls_total counter",
+        ]
+        with self._lock:
+            tools = sorted(self._tools.items())
+            for name, stats in tools:
+                lines.append(f'opsagent_tool_calls_total{{tool="{name}"}} {stats.calls}')
+            lines += [
+                "# HELP opsagent_tool_errors_total Number of failed tool calls.",
+                "# TYPE opsagent_tool_errors_total counter",
+            ]
+            for name, stats in tools:
+                lines.append(f'opsagent_tool_errors_total{{tool="{name}"}} {stats.errors}')
+            lines += [
+                "# HELP opsagent_tool_cache_hits_total Number of tool calls answered from the result cache.",
+                "# TYPE opsagent_tool_cache_hits_total counter",
+            ]
+            for name, stats in tools:
+                lines.append(f'opsagent_tool_cache_hits_total{{tool="{name}"}} {stats.cache_hits}')
+            lines += [
+                "# HELP opsagent_tool_latency_seconds Tool call latency.",
+                "# TYPE opsagent_tool_latency_seconds histogram",
+            ]
+            for name, stats in tools:
+                lines += stats.latency.render("opsagent_tool_latency_seconds", f'tool="{name}"')
+            lines += [
+                "# HELP opsagent_tool_result_chars Size of tool results in characters.",
+                "# TYPE opsagent_tool_result_chars histogram",
+            ]
+            for name, stats in tools:
+                lines += stats.result_size.render("opsagent_tool_result_chars", f'tool="{name}"')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        Path(path).write_text(self.render_prometheus(), encoding="utf-8")
+
+    def reset(self):
+        with self._lock:
+            self._tools.clear()
+
+
+tool_metrics = ToolMetrics()
+
+
+def result_size(result) -> int:
+    if isinstance(result, (str, bytes)):
+        return len(result)
+    return len(str(result))
+
+
+def is_error_result(result) -> bool:
+    """TaskOutput(success=False) and the like, or a message of the tools' "❌ ..." convention."""
+    if isinstance(result, str):
+        return result.lstrip().startswith("❌")
+    return getattr(result, "success", True) is False
+
+
+def metrics_wrapper(func, name: str, metrics: Optional[ToolMetrics] = None):
+    """Records latency, result size and failures of every call to `func` under `name`, cache hits apart."""
+    metrics = metrics or tool_metrics
+
+    def observe(start, result, cache_token):
+        cache_hit = served_from_cache.get()
+        served_from_cache.reset(cache_token)
+        metrics.observe(
+            name,
+            time.perf_counter() - start,
+            result_size(result),
+            error=is_error_result(result),
+            cache_hit=cache_hit,
+        )
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            cache_token = served_from_cache.set(False)
+            start = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception:
+                served_from_cache.reset(cache_token)
+                metrics.observe(name, time.perf_counter() - start, error=True)
+                raise
+            observe(start, result, cache_token)
+            return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        cache_token = served_from_cache.set(False)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            served_from_cache.reset(cache_token)
+            metrics.observe(name, time.perf_counter() - start, error=True)
+            raise
+        observe(start, result, cache_token)
+        return result
+    return wrapper
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", metrics: Optional[ToolMetrics] = None):
+    """Serves `metrics` on http://host:port/metrics from a daemon thread."""
+    metrics = metrics or tool_metrics
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
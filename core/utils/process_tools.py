@@ -0,0 +1,252 @@
+import time
+import uuid
+import atexit
+import threading
+import multiprocessing
+from collections import namedtuple
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Callable, Iterable, Optional, Union
+
+from core import settings
+
+
+# name and length of a shared memory block, what is pickled instead of the data itself
+SharedRef = namedtuple("SharedRef", ["name", "size"])
+# result blocks of a worker task are named after it, so the parent can remove those
+# of a task it killed (short: macOS limits shared memory names to 31 characters)
+RESULT_BLOCK_PREFIX = "opsagent_"
+# in a worker: id of the running task and the number of result blocks it wrote
+_current_task: Optional[list] = None
+
+
+def result_block_name(task_id: str, index: int) -> str:
+    return f"{RESULT_BLOCK_PREFIX}{task_id}_{index}"
+
+
+def unlink_results(task_id: str):
+    """Removes the result blocks a task wrote (its worker was killed before they were taken)."""
+    index = 0
+    while True:
+        try:
+            block = shared_memory.SharedMemory(name=result_block_name(task_id, index))
+        except FileNotFoundError:
+            return  # blocks are numbered in order, no later one exists
+        block.close()
+        block.unlink()
+        index += 1
+
+
+@contextmanager
+def share(data: Union[bytes, str]):
+    """
+    Copies `data` (str as utf-8) into a shared memory block once and yields its SharedRef.
+    The block is removed when the block exits, after the worker read it.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8", errors="surrogatepass")
+    block = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    try:
+        block.buf[:len(data)] = data
+        yield SharedRef(block.name, len(data))
+    finally:
+        block.close()
+        block.unlink()
+
+
+def read_shared(ref: SharedRef) -> bytes:
+    block = shared_memory.SharedMemory(name=ref.name)
+    try:
+        return bytes(block.buf[:ref.size])
+    finally:
+        block.close()
+
+
+def write_shared(data: Union[bytes, str]) -> SharedRef:
+    """Result side of share: the block is left for the receiver of the ref to read and remove (take_shared)."""
+    if isinstance(data, str):
+        data = data.encode("utf-8", errors="surrogatepass")
+    name = None
+    if _current_task is not None:
+        name = result_block_name(*_current_task)
+        _current_task[1] += 1
+    block = shared_memory.SharedMemory(name=name, create=True, size=max(1, len(data)))
+    block.buf[:len(data)] = data
+    block.close()
+    return SharedRef(block.name, len(data))
+
+
+def take_shared(ref: SharedRef) -> bytes:
+    block = shared_memory.SharedMemory(name=ref.name)
+    try:
+        return bytes(block.buf[:ref.size])
+    finally:
+        block.close()
+        block.unlink()
+
+
+def _worker_loop(connection):
+    global _current_task
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        task_id, func, args = task
+        _current_task = [task_id, 0]
+        try:
+            result = (True, func(*args))
+        except BaseException as e:
+            result = (False, e)
+        finally:
+            _current_task = None
+        try:
+            connection.send(result)
+        except Exception as e:
+            # the result or the exception can't be pickled
+            connection.send((False, RuntimeError(f"{func.__name__}: unpicklable result: {e}")))
+
+
+class _Worker:
+    def __init__(self, context):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_worker_loop, args=(child_connection,), daemon=True)
+        self.process.start()
+        child_connection.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.connection.close()
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except Exception:
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.kill()
+
+
+class ProcessPool:
+    """
+    Bounded pool of worker processes for CPU-bound steps (HTML parsing, text splitting),
+    so they neither hold the GIL of the event loop process nor stall other users.
+
+    At most `max_workers` tasks run at once, other callers wait for a worker. A task
+    running past its timeout is cancelled by killing its worker, which is replaced on
+    the next call, and the result blocks it wrote are removed. Workers are forked from a forkserver that imported `preload` once,
+    so the modules of the task functions aren't imported again by every worker.
+    Large inputs are handed over with `share` rather than pickled through the pipe.
+
+    Example usage:
+        with share(html) as ref:
+            text = process_pool.run(parse_html_text, ref, timeout=30)
+    """
+    def __init__(self,
+                max_workers: int = settings.PROCESS_POOL_WORKERS,
+                timeout: float = settings.PROCESS_POOL_TIMEOUT,
+                preload: Iterable[str] = ()):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.preload = list(preload)
+        self._context = None
+        self._idle: list[_Worker] = []
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._lock = threading.Lock()
+        self.stats = {"tasks": 0, "timeouts": 0, "workers_started": 0}
+
+    def _get_context(self):
+        with self._lock:
+            if self._context is None:
+                if "forkserver" in multiprocessing.get_all_start_methods():
+                    self._context = multiprocessing.get_context("forkserver")
+                    self._context.set_forkserver_preload(self.preload)
+                else:
+                    self._context = multiprocessing.get_context("spawn")
+            return self._context
+
+    def _acquire_worker(self) -> _Worker:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.connection.close()
+        worker = _Worker(self._get_context())
+        self.stats["workers_started"] += 1
+        return worker
+
+    def run(self, func: Callable, *args, timeout: Optional[float] = None):
+        """Runs func(*args) in a worker, raises TimeoutError (worker killed) past `timeout` seconds."""
+        timeout = timeout or self.timeout
+        deadline = time.monotonic() + timeout
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"{func.__name__}: no free worker within {timeout}s")
+        worker = None
+        task_id = uuid.uuid4().hex[:16]
+        try:
+            worker = self._acquire_worker()
+            worker.connection.send((task_id, func, args))
+            if not worker.connection.poll(max(0.0, deadline - time.monotonic())):
+                self.stats["timeouts"] += 1
+                worker.kill()
+                worker = None
+                unlink_results(task_id)
+                raise TimeoutError(f"{func.__name__} cancelled after {timeout}s")
+            try:
+                ok, result = worker.connection.recv()
+            except (EOFError, OSError):
+                # the worker died (e.g. out of memory)
+                worker.kill()
+                worker = None
+                unlink_results(task_id)
+                raise RuntimeError(f"{func.__name__}: worker process exited")
+            self.stats["tasks"] += 1
+            if not ok:
+                raise result
+            return result
+        finally:
+            if worker is not None:
+                with self._lock:
+                    self._idle.append(worker)
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            workers, self._idle = self._idle, []
+        for worker in workers:
+            worker.stop()
+
+
+# core.utils first: it is the import order that resolves the core.utils <-> core.agents cycle
+process_pool = ProcessPool(preload=["core.utils", "core.agents.search_agent"])
+atexit.register(process_pool.close)
+
+
+def offload(func: Callable, data: Union[bytes, str], *args, timeout: Optional[float] = None, pool: Optional[ProcessPool] = None):
+    """
+    func(SharedRef of data, *args) in the process pool, or func(data, *args) in the calling
+    thread when data is below PROCESS_OFFLOAD_MIN_BYTES (not worth a round trip) or the pool
+    is disabled (PROCESS_POOL_WORKERS=0). `func` has to accept both (see shared_or_bytes).
+    """
+    pool = pool or process_pool
+    if pool.max_workers <= 0 or len(data) < settings.PROCESS_OFFLOAD_MIN_BYTES:
+        return func(data, *args)
+    with share(data) as ref:
+        return pool.run(func, ref, *args, timeout=timeout)
+
+
+def shared_or_bytes(data: Union[SharedRef, bytes, str]) -> Union[bytes, str]:
+    """Worker side of offload: the data behind a SharedRef, or the data itself when run inline."""
+    return read_shared(data) if isinstance(data, SharedRef) else data
+
+
+def received_text(result: Union[SharedRef, str]) -> str:
+    """Caller side of a task returning its text with write_shared when it ran in a worker."""
+    if isinstance(result, SharedRef):
+        return take_shared(result).decode("utf-8", errors="surrogatepass")
+    return result
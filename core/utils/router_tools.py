@@ -0,0 +1,123 @@
+import re
+import json
+from collections import deque
+from contextvars import ContextVar
+from typing import Iterable, Optional, Sequence
+from langchain_core.messages import HumanMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from core.utils.memory_tools import count_tokens, message_text
+
+
+# per-request list the router appends its selections to, set by the caller
+current_route_stats: ContextVar[Optional[list]] = ContextVar("current_route_stats", default=None)
+
+
+def keyword_pattern(keyword: str) -> str:
+    """A keyword matches the whole word or its plural, a trailing `*` marks a stem ("repositor*")."""
+    if keyword.endswith("*"):
+        return re.escape(keyword[:-1]) + r"\w*"
+    return re.escape(keyword) + r"(?:e?s)?"
+
+
+class ToolGroup:
+    def __init__(self, tool_names: Iterable[str], keywords: Iterable[str]):
+        self.tool_names = tuple(tool_names)
+        # bounded on both sides, "doc" must not match "docker" nor "log" "login"
+        self.pattern = re.compile(
+            r"\b(?:" + "|".join(keyword_pattern(keyword) for keyword in keywords) + r")\b",
+            re.IGNORECASE
+        )
+
+
+class ToolRouter:
+    """
+    Picks the tool subset offered to the model on every step.
+
+    A group is selected when the last user message matches one of its keywords
+    or when one of its tools was called in the current or previous turn.
+    Tools outside every group are always offered. With no match `default_groups`
+    are used (all tools when None).
+
+    The model with each subset bound, and the schema token count of every tool,
+    are computed once and cached.
+
+    Example usage:
+        router = ToolRouter(model, tools, {"images": ToolGroup(["pull_docker_image"], ["image", "pull"])})
+        bound_model = router.select_model(state, runtime)
+    """
+    def __init__(self,
+                model,
+                tools: Sequence,
+                groups: dict[str, ToolGroup],
+                default_groups: Optional[Sequence[str]] = None,
+                stats_size: int = 100):
+        self.model = model
+        self.tools = list(tools)
+        self.groups = groups
+        self.default_groups = default_groups
+        self.stats: deque[dict] = deque(maxlen=stats_size)
+        grouped = {name for group in groups.values() for name in group.tool_names}
+        self.always_tools = [tool.name for tool in self.tools if tool.name not in grouped]
+        self.schema_tokens = {
+            tool.name: count_tokens(json.dumps(convert_to_openai_tool(tool)))
+            for tool in self.tools
+        }
+        self.all_schema_tokens = sum(self.schema_tokens.values())
+        self._bound_models: dict[tuple[str, ...], object] = {}
+
+    def select_tools(self, messages: Sequence) -> list[str]:
+        last_human_index = max(
+            (i for i, m in enumerate(messages) if isinstance(m, HumanMessage)),
+            default=None
+        )
+        if last_human_index is None:
+            return [tool.name for tool in self.tools]
+        query = message_text(messages[last_human_index])
+
+        previous_human_index = max(
+            (i for i, m in enumerate(messages[:last_human_index]) if isinstance(m, HumanMessage)),
+            default=0
+        )
+        recently_called = {
+            tool_call["name"]
+            for message in messages[previous_human_index:]
+            for tool_call in getattr(message, "tool_calls", None) or []
+        }
+
+        selected_groups = [
+            name for name, group in self.groups.items()
+            if group.pattern.search(query) or recently_called.intersection(group.tool_names)
+        ]
+        if not selected_groups:
+            if self.default_groups is None:
+                return [tool.name for tool in self.tools]
+            selected_groups = list(self.default_groups)
+
+        selected = set(self.always_tools)
+        for name in selected_groups:
+            selected.update(self.groups[name].tool_names)
+        # keep the registration order so equal subsets share one cache entry
+        return [tool.name for tool in self.tools if tool.name in selected]
+
+    def bind(self, tool_names: Sequence[str]):
+        key = tuple(tool_names)
+        if bound_model := self._bound_models.get(key):
+            return bound_model
+        selected = set(tool_names)
+        bound_model = self.model.bind_tools([tool for tool in self.tools if tool.name in selected])
+        self._bound_models[key] = bound_model
+        return bound_model
+
+    def select_model(self, state, runtime=None):
+        """Dynamic model for create_react_agent: the model bound to this step's tool subset."""
+        tool_names = self.select_tools(state["messages"])
+        schema_tokens = sum(self.schema_tokens[name] for name in tool_names)
+        stats = {
+            "tools": len(tool_names),
+            "schema_tokens": schema_tokens,
+            "saved_schema_tokens": self.all_schema_tokens - schema_tokens,
+        }
+        self.stats.append(stats)
+        if (route_stats := current_route_stats.get()) is not None:
+            route_stats.append(stats)
+        return self.bind(tool_names)
@@ -1,4 +1,5 @@
 import requests
+from bs4 import BeautifulSoup
 from typing import Optional
 from langchain.tools import tool
 from langchain_tavily import TavilySearch
@@ -31,8 +32,16 @@ def search_through_url(url: str, query: Optional[str]):
     return search_agent.invoke({"url": url, "query": query})
 
 
+async def asearch_through_url(url: str, query: Optional[str]):
+    """
+    loads webpage of the url and searches query through its content
+    """
+    return await search_agent.ainvoke({"url": url, "query": query})
+
+
 search_through_url_tool = create_structured_tool(
     func=search_through_url,
+    coroutine=asearch_through_url,
     name="search_through_url",
     description="loads webpage of the url and searches query through its content",
     log=True,
@@ -40,11 +49,28 @@ search_through_url_tool = create_structured_tool(
 )
 
 
-@tool("url_extractor", return_direct=False)
-def url_extractor(url: str) -> str:
-    """extract url info."""
-    # Placeholder implementation
-    return requests.get(url).content.decode()
+def extract_url(url: str) -> str:
+    """
+    extract url info: the readable text of the page (scripts, styles and markup removed)
+    """
+    response = requests.get(url, timeout=30)
+    if "html" not in response.headers.get("Content-Type", "html"):
+        return response.text
+    soup = BeautifulSoup(response.content, "html.parser")
+    for element in soup(["script", "style", "noscript", "svg", "template"]):
+        element.decompose()
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    text = "\n".join(line for line in (line.strip() for line in soup.get_text("\n").splitlines()) if line)
+    return f"{title}\n\n{text}" if title else text
+
+
+url_extractor = create_structured_tool(
+    func=extract_url,
+    name="url_extractor",
+    condense=True,
+    log=True,
+    log_colour="orange"
+)
 
 
 @tool("search_web", return_direct=False)
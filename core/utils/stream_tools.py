@@ -0,0 +1,115 @@
+import time
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+
+# tokenizing every frame would run on the event loop, tokens are estimated from chars instead
+CHARS_PER_TOKEN = 4
+
+
+class StreamStats:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.chunks = 0
+        self.chars = 0
+        self.frames = 0
+
+    @property
+    def tokens(self) -> int:
+        return round(self.chars / CHARS_PER_TOKEN)
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        if self.first_token_at is None or self.finished_at is None:
+            return None
+        elapsed = self.finished_at - self.first_token_at
+        return self.tokens / elapsed if elapsed > 0 else float(self.tokens)
+
+    def as_dict(self) -> dict:
+        return {
+            "time_to_first_token": self.time_to_first_token,
+            "tokens_per_second": self.tokens_per_second,
+            "chunks": self.chunks,
+            "tokens": self.tokens,
+            "chars": self.chars,
+            "frames": self.frames,
+        }
+
+
+class TokenCoalescer:
+    """
+    Buffers streamed tokens and sends them as one frame once `max_chars`
+    are buffered or `max_interval` seconds passed since the first buffered token.
+
+    Example usage:
+        async with TokenCoalescer(res.stream_token) as coalescer:
+            async for token in tokens:
+                await coalescer.push(token)
+        print(coalescer.stats.as_dict())
+    """
+    def __init__(self,
+                send: Callable[[str], Awaitable],
+                max_chars: int = 256,
+                max_interval: float = 0.05):
+        self.send = send
+        self.max_chars = max_chars
+        self.max_interval = max_interval
+        self.stats = StreamStats()
+        self._buffer: list[str] = []
+        self._buffered_chars = 0
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # the loop keeps only a weak reference to tasks
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def push(self, token: str):
+        if not token:
+            return
+        if self.stats.first_token_at is None:
+            self.stats.first_token_at = time.perf_counter()
+        self.stats.chunks += 1
+        self.stats.chars += len(token)
+        self._buffer.append(token)
+        self._buffered_chars += len(token)
+        if self._buffered_chars >= self.max_chars:
+            await self.flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.max_interval, self._start_flush)
+
+    def _start_flush(self):
+        self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self):
+        async with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            if not self._buffer:
+                return
+            frame = "".join(self._buffer)
+            self._buffer.clear()
+            self._buffered_chars = 0
+            self.stats.frames += 1
+            await self.send(frame)
+
+    async def close(self) -> StreamStats:
+        if self._flush_task is not None:
+            await self._flush_task
+        await self.flush()
+        self.stats.finished_at = time.perf_counter()
+        return self.stats
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -1,29 +1,94 @@
+import os
 import time
 import threading
 import functools
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import WebDriverException
+from selenium.common.exceptions import WebDriverException, SessionNotCreatedException
 from webdriver_manager.chrome import ChromeDriverManager
+from core import settings
 
 
 class AutoQuitDriverManager:
-    def __init__(self, headless=True, idle_timeout=300, check_interval=5):
+    # chromedriver path resolved once per process and shared by all managers
+    _resolved_driver_path = None
+    _resolve_lock = threading.Lock()
+
+    def __init__(self,
+                headless=True,
+                idle_timeout=300,
+                check_interval=5,
+                driver_path=None,
+                offline=None):
         """
         headless: run Chrome headless
         idle_timeout: seconds of inactivity before auto-quit
         check_interval: how often to check idle time (seconds)
+        driver_path: local chromedriver binary, skips webdriver_manager entirely
+        offline: never touch the network to resolve chromedriver
         """
         self.headless = headless
         self.idle_timeout = idle_timeout
         self.check_interval = check_interval
+        self.driver_path = driver_path or settings.CHROMEDRIVER_PATH
+        self.offline = settings.CHROMEDRIVER_OFFLINE if offline is None else offline
         self.driver = None
         self.last_used = None
-        self.lock = threading.Lock()
+        # re-entrant: the idle watcher calls quit() while holding the lock
+        self.lock = threading.RLock()
         self._init_driver()
         self._start_watcher()
 
+    @classmethod
+    def resolve_driver_path(cls, driver_path=None, offline=False) -> str:
+        """
+        Returns the chromedriver binary path, resolving it at most once.
+
+        Order: explicit driver_path, path pinned in this process, path pinned
+        on disk by a previous run and finally ChromeDriverManager().install()
+        which may hit the network (not allowed in offline mode).
+        """
+        if driver_path:
+            if not os.path.isfile(driver_path):
+                raise FileNotFoundError(f"chromedriver not found at {driver_path}")
+            return str(driver_path)
+        if cls._resolved_driver_path:
+            return cls._resolved_driver_path
+
+        with cls._resolve_lock:
+            if cls._resolved_driver_path:
+                return cls._resolved_driver_path
+            cache_file = settings.CHROMEDRIVER_PATH_CACHE
+            if cache_file.exists():
+                pinned_path = cache_file.read_text(encoding="utf-8").strip()
+                if os.path.isfile(pinned_path):
+                    cls._resolved_driver_path = pinned_path
+                    return pinned_path
+            if offline:
+                raise RuntimeError(
+                    "chromedriver offline mode is enabled but no local driver is configured. "
+                    "set CHROMEDRIVER_PATH or resolve it once while online."
+                )
+            resolved_path = ChromeDriverManager().install()
+            try:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                cache_file.write_text(resolved_path, encoding="utf-8")
+            except OSError as e:
+                print(f"Could not pin chromedriver path: {e}")
+            cls._resolved_driver_path = resolved_path
+            return resolved_path
+
+    @classmethod
+    def forget_driver_path(cls):
+        """Drops the pinned chromedriver path, in this process and on disk."""
+        with cls._resolve_lock:
+            cls._resolved_driver_path = None
+            try:
+                settings.CHROMEDRIVER_PATH_CACHE.unlink(missing_ok=True)
+            except OSError as e:
+                print(f"Could not remove pinned chromedriver path: {e}")
+
     def _init_driver(self):
         options = Options()
         if self.headless:
@@ -39,11 +104,24 @@ class AutoQuitDriverManager:
         if self.driver:
             self.quit()
 
-        self.driver = webdriver.Chrome(
-            service=Service(ChromeDriverManager().install()),
+        try:
+            self.driver = self._start_chrome(options)
+        except SessionNotCreatedException as e:
+            # usually Chrome updated itself past the pinned driver, resolve a matching one once
+            if self.driver_path or self.offline:
+                raise
+            print(f"Chrome session not created with the pinned chromedriver, resolving it again: {e.msg}")
+            self.forget_driver_path()
+            self.driver = self._start_chrome(options)
+        self.last_used = time.time()
+
+    def _start_chrome(self, options) -> webdriver.Chrome:
+        return webdriver.Chrome(
+            service=Service(
+                self.resolve_driver_path(self.driver_path, offline=self.offline)
+            ),
             options=options
         )
-        self.last_used = time.time()
 
     def get_driver(self) -> webdriver.Chrome:
         with self.lock:
@@ -89,10 +167,14 @@ def cache_driver(driver_manager_accessor):
 @cache_driver
 def access_chrome_driver_manager(headless=True,
                         idle_timeout=300,
-                        check_interval=5) -> AutoQuitDriverManager:
+                        check_interval=5,
+                        driver_path=None,
+                        offline=None) -> AutoQuitDriverManager:
 
     return AutoQuitDriverManager(
         headless=headless,
         idle_timeout=idle_timeout,
-        check_interval=check_interval
+        check_interval=check_interval,
+        driver_path=driver_path,
+        offline=offline
     )
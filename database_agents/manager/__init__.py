@@ -1,22 +1,183 @@
+from typing import Iterable, Optional
+from core.schemas import TaskOutput
+from devops_agents.docker.utils.manager import DockerManager
+from devops_agents.docker.utils.readiness import wait_until_ready
+from database_agents.manager.sessions import PsqlSessionPool, psql_pool, quote_ident, quote_literal
+
+
+# the postgres image declares /var/lib/postgresql/data as VOLUME, docker commit only
+# keeps data stored elsewhere in the container filesystem
+POSTGRES_VOLUME_PGDATA = "/var/lib/postgresql/data"
+SNAPSHOT_PGDATA = "/var/lib/postgresql/snapshot"
+
+
 class DatabaseManager:
-    def __init__(self, docker_manager):
+    """
+    Statements run through pooled long-lived psql sessions (see PsqlSessionPool),
+    so a query costs one round trip instead of a docker exec and a new backend.
+
+    Fast provisioning:
+        - golden template databases, cloned with CREATE DATABASE ... TEMPLATE
+        - pre-seeded container snapshots (containers started with `snapshottable=True`)
+        - bulk create/drop of many databases in one session
+
+    Example usage:
+        manager = DatabaseManager()
+        manager.create_template_db("app_template", schema_sql=open("schema.sql").read())
+        manager.create_databases([f"test_{i}" for i in range(20)], template="app_template")
+    """
+    def __init__(self, docker_manager=DockerManager, pool: Optional[PsqlSessionPool] = None):
         self.docker = docker_manager
+        self.pool = pool or psql_pool
 
-    def create_postgres_db(self, db_name, container_name="postgres_db"):
-        # Start container if not running
-        stdout, stderr = self.docker.run_container(
-            image="postgres:15",
-            name=container_name,
-            ports={"5432": "5432"},
-            env={"POSTGRES_PASSWORD": "securepass"}
-        )
-        print(stdout, stderr)
+    def execute_sql(self,
+                    sql: str,
+                    container_name: str = "postgres_db",
+                    database: str = "postgres",
+                    user: str = "postgres") -> TaskOutput:
+        return self.pool.execute(container_name, sql, database=database, user=user)
+
+    def start_postgres_container(self,
+                                container_name: str = "postgres_db",
+                                image: str = "postgres:15",
+                                port: Optional[int] = 5432,
+                                snapshottable: bool = False) -> TaskOutput:
+        """
+        Starts the container, creating it from `image` when it doesn't exist,
+        and returns once the server accepts connections.
+        snapshottable: keep PGDATA outside the image volume so snapshot_postgres_container
+            can save the data (containers created from a snapshot inherit it)
+        """
+        started = self.docker.start_container(container_name)
+        if not started.success:
+            env = {"POSTGRES_PASSWORD": "securepass"}
+            if snapshottable:
+                env["PGDATA"] = SNAPSHOT_PGDATA
+            started = self.docker.run_container(
+                image=image,
+                name=container_name,
+                ports={"5432": str(port)} if port else None,
+                env=env
+            )
+            if not started.success:
+                return started
+        # a fresh container runs initdb and restarts the server before it can be used
+        ready = wait_until_ready(container_name, database="postgres")
+        if not ready.success:
+            return ready
+        return TaskOutput(success=True, output=f"{started.output}\n{ready.output}")
+
+    @staticmethod
+    def _create_database_sql(db_name: str, template: Optional[str] = None, strategy: Optional[str] = None) -> str:
+        sql = f"CREATE DATABASE {quote_ident(db_name)}"
+        if template:
+            sql += f" TEMPLATE {quote_ident(template)}"
+        if strategy:
+            # FILE_COPY (PostgreSQL 15+) is faster than the default WAL_LOG for large templates
+            sql += f" STRATEGY {strategy}"
+        return sql + ";"
+
+    def create_postgres_db(self,
+                        db_name,
+                        container_name="postgres_db",
+                        template: Optional[str] = None,
+                        strategy: Optional[str] = None) -> TaskOutput:
+        started = self.start_postgres_container(container_name)
+        if not started.success:
+            return started
+        print(started.output)
         # Create database
-        cmd = f'psql -U postgres -c "CREATE DATABASE {db_name};"'
-        stdout, stderr = self.docker.exec_command(container_name, cmd)
-        return stdout, stderr
-
-    def drop_postgres_db(self, db_name, container_name="postgres_db"):
-        cmd = f'psql -U postgres -c "DROP DATABASE {db_name};"'
-        stdout, stderr = self.docker.exec_command(container_name, cmd)
-        return stdout, stderr
+        return self.execute_sql(self._create_database_sql(db_name, template, strategy), container_name)
+
+    def drop_postgres_db(self, db_name, container_name="postgres_db") -> TaskOutput:
+        # pooled sessions connected to the database would block the drop
+        self.pool.close(container_name, database=db_name)
+        return self.execute_sql(f"DROP DATABASE {quote_ident(db_name)};", container_name)
+
+    def create_template_db(self,
+                        template_name: str,
+                        schema_sql: str = "",
+                        container_name: str = "postgres_db",
+                        replace: bool = False) -> TaskOutput:
+        """
+        Creates a golden database loaded with `schema_sql` (schema and seed data) and marks
+        it as template. It no longer accepts connections, so clones never wait on it.
+        """
+        template = quote_ident(template_name)
+        if replace:
+            self.pool.close(container_name, database=template_name)
+            dropped = self.execute_sql(
+                "DO $$ BEGIN "
+                f"IF EXISTS (SELECT 1 FROM pg_database WHERE datname = {quote_literal(template_name)}) THEN "
+                f"EXECUTE {quote_literal(f'ALTER DATABASE {template} IS_TEMPLATE false')}; "
+                "END IF; END $$;\n"
+                f"DROP DATABASE IF EXISTS {template} WITH (FORCE);",
+                container_name
+            )
+            if not dropped.success:
+                return dropped
+
+        created = self.execute_sql(f"CREATE DATABASE {template};", container_name)
+        if not created.success:
+            return created
+        if schema_sql.strip():
+            loaded = self.execute_sql(schema_sql, container_name, database=template_name)
+            if not loaded.success:
+                return loaded
+        # CREATE DATABASE ... TEMPLATE fails while anyone is connected to the template
+        self.pool.close(container_name, database=template_name)
+        marked = self.execute_sql(
+            f"ALTER DATABASE {template} WITH IS_TEMPLATE true ALLOW_CONNECTIONS false;",
+            container_name
+        )
+        if not marked.success:
+            return marked
+        return TaskOutput(success=True, output=f"✅ Template database '{template_name}' ready")
+
+    def create_databases(self,
+                        db_names: Iterable[str],
+                        template: Optional[str] = None,
+                        container_name: str = "postgres_db",
+                        strategy: Optional[str] = None) -> TaskOutput:
+        """Creates every database in one psql round trip."""
+        db_names = list(db_names)
+        statements = "\n".join(self._create_database_sql(name, template, strategy) for name in db_names)
+        created = self.execute_sql(statements, container_name)
+        if created.success:
+            created.output = f"✅ Created {len(db_names)} databases"
+        return created
+
+    def drop_databases(self, db_names: Iterable[str], container_name: str = "postgres_db") -> TaskOutput:
+        """Drops every database in one psql round trip, disconnecting their clients."""
+        db_names = list(db_names)
+        for name in db_names:
+            self.pool.close(container_name, database=name)
+        statements = "\n".join(f"DROP DATABASE IF EXISTS {quote_ident(name)} WITH (FORCE);" for name in db_names)
+        dropped = self.execute_sql(statements, container_name)
+        if dropped.success:
+            dropped.output = f"✅ Dropped {len(db_names)} databases"
+        return dropped
+
+    def snapshot_postgres_container(self,
+                                    container_name: str,
+                                    repository: str,
+                                    tag: Optional[str] = None) -> TaskOutput:
+        """
+        Saves a seeded postgres container as an image, containers started from it
+        (start_postgres_container(image=...)) come up with the data already loaded.
+        """
+        data_directory = self.execute_sql("SHOW data_directory;", container_name)
+        if not data_directory.success:
+            return data_directory
+        if data_directory.output.splitlines()[-1].startswith(POSTGRES_VOLUME_PGDATA):
+            return TaskOutput(
+                success=False,
+                output="",
+                error=f"PGDATA of '{container_name}' is in the image volume and would not be saved, "
+                    "start the container with snapshottable=True"
+            )
+        # flush dirty pages so the committed files need no recovery
+        checkpoint = self.execute_sql("CHECKPOINT;", container_name)
+        if not checkpoint.success:
+            return checkpoint
+        return self.docker.commit_container(container_name, repository, tag)
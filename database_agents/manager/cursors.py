@@ -0,0 +1,312 @@
+import re
+import json
+import time
+import uuid
+import atexit
+import threading
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from core.schemas import TaskOutput
+from core.settings import (
+    DATABASE_CURSOR_PAGE_SIZE,
+    DATABASE_CURSOR_TTL,
+    DATABASE_CURSOR_MAX_OPEN,
+)
+from database_agents.manager.sessions import PsqlSession, PsqlSessionPool, psql_pool, quote_ident
+
+
+# per-request list the query tool appends the cursors it opens to, set by the caller (UI paging)
+current_query_cursors: ContextVar[Optional[list]] = ContextVar("current_query_cursors", default=None)
+
+CURSOR_NAME = "opsagent_cursor"
+NUMERIC_TYPE = re.compile(r"^(smallint|integer|bigint|numeric|real|double precision|money)\b")
+TEMPORAL_TYPE = re.compile(r"^(date|time|timestamp|interval)\b")
+TEXT_TYPE = re.compile(r"^(text|character|name|citext|uuid)\b")
+
+
+def markdown_table(columns: List[str], rows: List[list], max_cell_chars: int = 40) -> str:
+    def cell(value) -> str:
+        text = "NULL" if value is None else value if isinstance(value, str) else json.dumps(value)
+        text = text.replace("|", "\\|").replace("\n", " ")
+        return text if len(text) <= max_cell_chars else text[:max_cell_chars - 1] + "…"
+
+    lines = ["| " + " | ".join(cell(c) for c in columns) + " |", "|" + "---|" * len(columns)]
+    lines += ["| " + " | ".join(cell(v) for v in row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+class _Pairs(list):
+    pass
+
+
+def _plain(value):
+    if isinstance(value, _Pairs):
+        return {key: _plain(item) for key, item in value}
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    return value
+
+
+def row_values(line: str) -> list:
+    """Values of one row_to_json line, in column order (duplicate column names included)."""
+    return [_plain(value) for _, value in json.loads(line, object_pairs_hook=_Pairs)]
+
+
+class QueryCursor:
+    """
+    Pages through the result of one query with a server-side cursor, so only the
+    rows of the current page ever leave the database.
+
+    The cursor lives in a read-only transaction of its own psql session (not taken
+    from the pool, it is held until the cursor is closed). Rows travel as one JSON
+    document per line, values containing separators or newlines can't break the parsing.
+
+    Example usage:
+        cursor = QueryCursor("SELECT * FROM events", container_name="postgres_db", database="app")
+        cursor.columns          # [("id", "bigint"), ("payload", "jsonb"), ...]
+        cursor.fetch(100)       # first 100 rows as lists
+        cursor.row_count()      # rows of the whole result
+        cursor.stats()          # row count and per column aggregates, computed by the server
+        cursor.close()
+    """
+    def __init__(self,
+                sql: str,
+                container_name: str = "postgres_db",
+                database: str = "postgres",
+                user: str = "postgres",
+                pool: Optional[PsqlSessionPool] = None,
+                session_factory=PsqlSession):
+        self.id = uuid.uuid4().hex[:12]
+        self.sql = sql.strip().rstrip(";").strip()
+        self.container_name = container_name
+        self.database = database
+        self.user = user
+        self.pool = pool or psql_pool
+        self.columns: List[Tuple[str, str]] = []
+        self.fetched = 0
+        self.exhausted = False
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        self.session = session_factory(container_name, database=database, user=user)
+        try:
+            self._open()
+        except Exception:
+            self.close()
+            raise
+
+    def _open(self):
+        # \gdesc describes the result columns without running the query
+        described = self.session.execute(f"{self.sql}\n\\gdesc")
+        if not described.success:
+            raise ValueError(described.error)
+        self.columns = [tuple(line.rsplit("|", 1)) for line in described.output.splitlines()[1:]]
+        # SCROLL lets row_count move to the end of the result and back
+        opened = self.session.execute(
+            f"BEGIN READ ONLY;\nDECLARE {CURSOR_NAME} SCROLL CURSOR FOR "
+            f"SELECT row_to_json(q)::text FROM (\n{self.sql}\n) q;"
+        )
+        if not opened.success:
+            raise ValueError(opened.error)
+
+    @property
+    def column_names(self) -> List[str]:
+        return [name for name, _ in self.columns]
+
+    def fetch(self, rows: int = DATABASE_CURSOR_PAGE_SIZE) -> List[list]:
+        """Next `rows` rows, an empty list once the result is exhausted."""
+        with self.lock:
+            self.last_used = time.monotonic()
+            if self.exhausted:
+                return []
+            page = self.session.execute(f"FETCH FORWARD {int(rows)} FROM {CURSOR_NAME};")
+            if not page.success:
+                self.close()
+                raise ValueError(page.error)
+            records = [row_values(line) for line in page.output.splitlines()[1:]]
+            self.fetched += len(records)
+            if len(records) < rows:
+                self.exhausted = True
+            return records
+
+    def row_count(self) -> int:
+        """
+        Rows of the whole result, counted by the server moving the cursor to its end
+        and back to the current position (psql -q prints no MOVE tag, :ROW_COUNT has it).
+        """
+        with self.lock:
+            self.last_used = time.monotonic()
+            moved = self.session.execute(
+                f"MOVE FORWARD ALL IN {CURSOR_NAME};\n\\echo :ROW_COUNT\n"
+                f"MOVE ABSOLUTE {self.fetched} IN {CURSOR_NAME};"
+            )
+            if not moved.success:
+                self.close()
+                raise ValueError(moved.error)
+            return self.fetched + int(moved.output.splitlines()[0])
+
+    def stats(self) -> dict:
+        """
+        Row count (from the cursor) and per column non-null count, min/max (numbers
+        and dates), mean (numbers) and max length (text). The aggregates run in one
+        scan on a pooled session, outside the cursor transaction.
+        """
+        rows = self.row_count()
+        select_list = []
+        for i, (name, type_name) in enumerate(self.columns):
+            column = quote_ident(name)
+            select_list.append(f'count({column}) AS "{i}.non_null"')
+            if NUMERIC_TYPE.match(type_name) or TEMPORAL_TYPE.match(type_name):
+                select_list.append(f'min({column}) AS "{i}.min"')
+                select_list.append(f'max({column}) AS "{i}.max"')
+            if NUMERIC_TYPE.match(type_name):
+                select_list.append(f'avg({column})::float8 AS "{i}.mean"')
+            elif TEXT_TYPE.match(type_name):
+                select_list.append(f'max(length({column}::text)) AS "{i}.max_length"')
+        if not select_list:
+            return {"rows": rows, "columns": {}}
+        aggregated = self.pool.execute(
+            self.container_name,
+            f"SELECT row_to_json(s)::text FROM (SELECT {', '.join(select_list)} FROM (\n{self.sql}\n) q) s;",
+            database=self.database,
+            user=self.user,
+        )
+        if not aggregated.success:
+            raise ValueError(aggregated.error)
+        values = json.loads(aggregated.output.splitlines()[-1])
+        columns = {}
+        for i, (name, type_name) in enumerate(self.columns):
+            prefix = f"{i}."
+            columns[name] = {"type": type_name, **{
+                key[len(prefix):]: value for key, value in values.items() if key.startswith(prefix)
+            }}
+        return {"rows": rows, "columns": columns}
+
+    def close(self):
+        self.exhausted = True
+        self.session.close()
+
+
+class QueryCursorRegistry:
+    """
+    Open cursors by id, so the agent and the UI can keep paging after the query tool returned.
+    Cursors unused for `ttl` seconds are closed, at most `max_open` are kept
+    (the least recently used one is closed first).
+    """
+    def __init__(self, ttl: float = DATABASE_CURSOR_TTL, max_open: int = DATABASE_CURSOR_MAX_OPEN):
+        self.ttl = ttl
+        self.max_open = max_open
+        self._cursors: Dict[str, QueryCursor] = {}
+        self._lock = threading.Lock()
+
+    def _evict(self) -> List[QueryCursor]:
+        now = time.monotonic()
+        evicted = [c for c in self._cursors.values() if now - c.last_used > self.ttl]
+        by_use = sorted(
+            (c for c in self._cursors.values() if c not in evicted), key=lambda c: c.last_used
+        )
+        evicted += by_use[:max(0, len(by_use) - self.max_open + 1)]
+        for cursor in evicted:
+            del self._cursors[cursor.id]
+        return evicted
+
+    def open(self, sql: str, **kwargs) -> QueryCursor:
+        with self._lock:
+            evicted = self._evict()
+        for cursor in evicted:
+            cursor.close()
+        cursor = QueryCursor(sql, **kwargs)
+        with self._lock:
+            self._cursors[cursor.id] = cursor
+        return cursor
+
+    def get(self, cursor_id: str) -> Optional[QueryCursor]:
+        with self._lock:
+            return self._cursors.get(cursor_id)
+
+    def close(self, cursor_id: Optional[str] = None):
+        """Closes one cursor, every cursor when no id is given."""
+        with self._lock:
+            ids = [cursor_id] if cursor_id else list(self._cursors)
+            cursors = [self._cursors.pop(i) for i in ids if i in self._cursors]
+        for cursor in cursors:
+            cursor.close()
+
+
+query_cursors = QueryCursorRegistry()
+atexit.register(query_cursors.close)
+
+
+def format_page(cursor: QueryCursor, rows: List[list]) -> str:
+    first = cursor.fetched - len(rows) + 1
+    header = f"rows {first}-{cursor.fetched}" if rows else "no more rows"
+    if cursor.exhausted:
+        header += " (end of result)"
+    else:
+        header += f", more with fetch_query_page(cursor_id=\"{cursor.id}\")"
+    return header + ("\n" + markdown_table(cursor.column_names, rows) if rows else "")
+
+
+def format_stats(stats: dict) -> str:
+    columns = ["column", "type", "non-null", "min", "max", "mean", "max length"]
+    rows = [
+        [name, column["type"], column.get("non_null"), column.get("min"), column.get("max"),
+         round(column["mean"], 4) if column.get("mean") is not None else None, column.get("max_length")]
+        for name, column in stats["columns"].items()
+    ]
+    return f"{stats['rows']} rows\n" + markdown_table(columns, rows)
+
+
+def query_database(sql: str,
+                container_name: str = "postgres_db",
+                database: str = "postgres",
+                preview_rows: int = 20,
+                stats: bool = True) -> TaskOutput:
+    """
+    Runs a read-only query (SELECT, WITH ... SELECT, VALUES, TABLE) on a postgres container
+    through a server-side cursor. Returns the row count and column stats plus the first
+    `preview_rows` rows, and a cursor_id to page through the rest with fetch_query_page.
+    Prefer it over the psql shell for queries that may return many rows.
+    """
+    try:
+        cursor = query_cursors.open(sql, container_name=container_name, database=database)
+    except (ValueError, ConnectionError) as e:
+        return TaskOutput(success=False, output="", error=str(e))
+    if (opened := current_query_cursors.get()) is not None:
+        opened.append(cursor.id)
+    try:
+        parts = []
+        if stats:
+            try:
+                parts.append(format_stats(cursor.stats()))
+            except ValueError as e:
+                parts.append(f"column stats unavailable: {e}")
+        rows = cursor.fetch(preview_rows)
+        parts.append(format_page(cursor, rows))
+    except ValueError as e:
+        query_cursors.close(cursor.id)
+        return TaskOutput(success=False, output="", error=str(e))
+    if cursor.exhausted:
+        query_cursors.close(cursor.id)
+    return TaskOutput(success=True, output="\n\n".join(parts))
+
+
+def fetch_query_page(cursor_id: str, rows: int = DATABASE_CURSOR_PAGE_SIZE) -> TaskOutput:
+    """Returns the next `rows` rows of a query opened with query_database."""
+    cursor = query_cursors.get(cursor_id)
+    if not cursor:
+        return TaskOutput(success=False, output="", error=f"Cursor {cursor_id} not found, it was exhausted, closed or expired")
+    try:
+        page = format_page(cursor, cursor.fetch(rows))
+    except ValueError as e:
+        query_cursors.close(cursor_id)
+        return TaskOutput(success=False, output="", error=str(e))
+    if cursor.exhausted:
+        query_cursors.close(cursor_id)
+    return TaskOutput(success=True, output=page)
+
+
+def close_query_cursor(cursor_id: str) -> TaskOutput:
+    """Closes a cursor opened with query_database once no more rows are needed."""
+    query_cursors.close(cursor_id)
+    return TaskOutput(success=True, output=f"Cursor {cursor_id} closed")
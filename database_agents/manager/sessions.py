@@ -0,0 +1,258 @@
+import re
+import time
+import uuid
+import atexit
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import pexpect
+
+from core.schemas import TaskOutput
+from core.settings import (
+    DATABASE_SESSION_POOL_SIZE,
+    DATABASE_SESSION_IDLE_TIMEOUT,
+    DATABASE_STATEMENT_TIMEOUT,
+)
+
+
+PSQL_ERROR = re.compile(r"^(?:psql:\S+ )?(?:ERROR|FATAL|PANIC):", re.MULTILINE)
+# same anchoring as PSQL_ERROR, "FATAL:" inside returned rows is not a lost connection
+PSQL_FATAL = r"(?:^|\n)(?:psql:\S+ )?FATAL:[^\n]*\n"
+# statements that may leave a transaction or session state behind for the next borrower,
+# false positives only cost a reset
+SESSION_STATE_SQL = re.compile(
+    r"(?:^|;)\s*(?:BEGIN|START\s+TRANSACTION|SET|RESET|PREPARE|DECLARE|LISTEN|LOCK)\b"
+    r"|\bTEMP(?:ORARY)?\b|\bpg_(?:try_)?advisory_lock|\bset_config\s*\(",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def quote_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class PsqlSession:
+    """
+    Long-lived psql process inside a container, fed statements over stdin.
+
+    psql runs without a terminal (`docker exec -i`), so there is no prompt and no echo:
+    the end of every batch is found by an `\\echo` marker printed on its own line.
+    One backend connection serves every statement sent through the session.
+
+    Example usage:
+        session = PsqlSession("postgres_db", database="app")
+        session.execute("SELECT count(*) FROM users")
+    """
+    def __init__(self,
+                container_name: str,
+                database: str = "postgres",
+                user: str = "postgres",
+                timeout: float = DATABASE_STATEMENT_TIMEOUT,
+                docker_cmd: str = "docker"):
+        self.container_name = container_name
+        self.database = database
+        self.user = user
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.child = pexpect.spawn(
+            docker_cmd,
+            [
+                "exec", "-i", container_name,
+                "psql", "-X", "-q", "-A",
+                "-P", "pager=off", "-P", "footer=off",
+                "-v", "ON_ERROR_STOP=0",
+                "-U", user, "-d", database,
+            ],
+            encoding="utf-8",
+            timeout=timeout,
+            echo=False,
+        )
+        # pexpect waits 50ms before every send by default, that would dominate the round trip
+        self.child.delaybeforesend = None
+        self.last_used = time.monotonic()
+        self.setup_sql = f"SET statement_timeout = {int(timeout * 1000)}"
+        connected = self.execute(self.setup_sql)
+        if not connected.success:
+            self.close()
+            raise ConnectionError(
+                f"cannot open psql session on {container_name}/{database}: {connected.error}"
+            )
+        # set by execute when a statement may have changed the session, cleared by reset
+        self.dirty = False
+
+    @property
+    def alive(self) -> bool:
+        return self.child.isalive()
+
+    def execute(self, sql: str, timeout: Optional[float] = None) -> TaskOutput:
+        """Runs one or more statements and returns psql's unaligned output."""
+        sql = sql.strip()
+        # a trailing meta-command (\gdesc, \gset ...) ends the statement itself
+        if sql and not sql.endswith(";") and not sql.splitlines()[-1].lstrip().startswith("\\"):
+            sql += ";"
+        marker = f"MARKER_{uuid.uuid4().hex[:8]}"
+        with self.lock:
+            self.last_used = time.monotonic()
+            if SESSION_STATE_SQL.search(sql):
+                self.dirty = True
+            try:
+                self.child.send(f"{sql}\n\\echo {marker}\n")
+                matched = self.child.expect(
+                    [rf"(?:^|\n){marker}\r?\n", PSQL_FATAL],
+                    timeout=timeout or self.timeout + 5
+                )
+                if matched == 1:
+                    # lost (or never got) the backend connection
+                    self.close()
+                    return TaskOutput(success=False, output="", error=(self.child.before + self.child.after).strip())
+            except pexpect.TIMEOUT:
+                # the session is out of step with its output, it can't be reused
+                self.close()
+                return TaskOutput(success=False, output="", error=f"no answer from psql within {timeout or self.timeout}s")
+            except pexpect.EOF:
+                self.close()
+                return TaskOutput(success=False, output="", error=(self.child.before or "psql exited").strip())
+            # read before leaving the lock, the next batch overwrites it
+            output = self.child.before.replace("\r\n", "\n").strip()
+        if PSQL_ERROR.search(output):
+            return TaskOutput(success=False, output=output, error=output)
+        return TaskOutput(success=True, output=output)
+
+    def reset(self) -> bool:
+        """
+        Rolls back the open (or failed) transaction and discards session state (settings,
+        prepared statements, temporary tables, advisory locks...), as a new session would be.
+        """
+        # outside a transaction ROLLBACK only prints a WARNING
+        if not self.execute(f"ROLLBACK; DISCARD ALL; {self.setup_sql}").success:
+            return False
+        self.dirty = False
+        return True
+
+    def close(self):
+        try:
+            if self.child.isalive():
+                self.child.sendeof()
+                self.child.terminate(force=True)
+        except Exception:
+            pass
+
+
+SessionKey = Tuple[str, str, str]
+
+
+class PsqlSessionPool:
+    """
+    Pool of PsqlSession per (container, database, user).
+
+    Sessions are reused across calls (reset when released dirty), at most `max_sessions`
+    per key run at once and idle ones are closed after `idle_timeout` seconds.
+
+    Example usage:
+        with psql_pool.session("postgres_db", "app") as session:
+            session.execute("BEGIN; UPDATE ...; COMMIT")
+        psql_pool.execute("postgres_db", "SELECT 1")
+    """
+    def __init__(self,
+                max_sessions: int = DATABASE_SESSION_POOL_SIZE,
+                idle_timeout: float = DATABASE_SESSION_IDLE_TIMEOUT,
+                session_factory=PsqlSession):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.session_factory = session_factory
+        self._idle: Dict[SessionKey, List[PsqlSession]] = {}
+        self._open: Dict[SessionKey, int] = {}
+        self._condition = threading.Condition()
+
+    def _close_expired(self):
+        now = time.monotonic()
+        for key, sessions in self._idle.items():
+            for session in [s for s in sessions if now - s.last_used > self.idle_timeout]:
+                sessions.remove(session)
+                self._open[key] -= 1
+                session.close()
+
+    def acquire(self, container_name: str, database: str = "postgres", user: str = "postgres") -> PsqlSession:
+        key = (container_name, database, user)
+        with self._condition:
+            while True:
+                self._close_expired()
+                idle = self._idle.setdefault(key, [])
+                while idle:
+                    session = idle.pop()
+                    if session.alive:
+                        return session
+                    self._open[key] -= 1
+                if self._open.get(key, 0) < self.max_sessions:
+                    self._open[key] = self._open.get(key, 0) + 1
+                    break
+                self._condition.wait()
+        # spawning takes a docker exec round trip, don't hold the lock meanwhile
+        try:
+            return self.session_factory(container_name, database=database, user=user)
+        except Exception:
+            with self._condition:
+                self._open[key] -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, session: PsqlSession):
+        key = (session.container_name, session.database, session.user)
+        # the next borrower must not inherit a transaction or SET of this one,
+        # a session that can't be reset is dropped (clean ones skip the round trip)
+        if session.alive and session.dirty and not session.reset():
+            session.close()
+        with self._condition:
+            if session.alive:
+                self._idle.setdefault(key, []).append(session)
+            else:
+                self._open[key] -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def session(self, container_name: str, database: str = "postgres", user: str = "postgres"):
+        session = self.acquire(container_name, database, user)
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+    def execute(self,
+                container_name: str,
+                sql: str,
+                database: str = "postgres",
+                user: str = "postgres",
+                timeout: Optional[float] = None) -> TaskOutput:
+        try:
+            with self.session(container_name, database, user) as session:
+                return session.execute(sql, timeout=timeout)
+        except ConnectionError as e:
+            return TaskOutput(success=False, output="", error=str(e))
+
+    def close(self, container_name: Optional[str] = None, database: Optional[str] = None):
+        """Closes idle sessions, of one container and/or database when given."""
+        with self._condition:
+            for key, sessions in self._idle.items():
+                if container_name not in (None, key[0]) or database not in (None, key[1]):
+                    continue
+                for session in sessions:
+                    session.close()
+                self._open[key] -= len(sessions)
+                sessions.clear()
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "/".join(key): {"open": self._open.get(key, 0), "idle": len(self._idle.get(key, []))}
+                for key in set(self._open) | set(self._idle)
+            }
+
+
+psql_pool = PsqlSessionPool()
+atexit.register(psql_pool.close)
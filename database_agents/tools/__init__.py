@@ -0,0 +1,11 @@
+from database_agents.tools.query_tools import all_query_tools
+from core.utils.router_tools import ToolGroup
+
+
+# tool groups offered to the model only when the turn is about them (see ToolRouter)
+database_tool_groups = {
+    "database": ToolGroup(
+        [tool.name for tool in all_query_tools],
+        ["sql", "psql", "select", "quer*", "table", "rows", "database", "postgres*", "cursor", "page"],
+    ),
+}
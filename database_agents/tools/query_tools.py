@@ -0,0 +1,31 @@
+from core.utils import create_structured_tool
+from database_agents.manager.cursors import query_database, fetch_query_page, close_query_cursor
+
+
+query_database_tool = create_structured_tool(
+    func = query_database,
+    name = "query_database",
+    log=True,
+    log_colour="gold"
+)
+
+fetch_query_page_tool = create_structured_tool(
+    func = fetch_query_page,
+    name = "fetch_query_page",
+    log=True,
+    log_colour="gold"
+)
+
+close_query_cursor_tool = create_structured_tool(
+    func = close_query_cursor,
+    name = "close_query_cursor",
+    log=True,
+    log_colour="gold"
+)
+
+
+all_query_tools = [
+    query_database_tool,
+    fetch_query_page_tool,
+    close_query_cursor_tool
+]
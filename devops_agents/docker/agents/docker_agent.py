@@ -15,9 +15,12 @@ from typing_extensions import TypedDict
 from core.base import OpsAgent, OpsAgentFactory
 from core.schemas import TaskInput, TaskOutput
 from core.utils import printers
+from core.utils.memory_tools import current_context_memory
+from core.utils.router_tools import ToolRouter
 from core.utils.search_tools import tavily_search, google_search, search_through_url_tool
-from devops_agents.docker.tools import all_container_tools, all_shell_tools
+from devops_agents.docker.tools import all_container_tools, all_shell_tools, docker_tool_groups
 from devops_agents.docker.prompts import docker_agent_main_prompt
+from database_agents.tools import all_query_tools, database_tool_groups
 
 
 
@@ -34,8 +37,19 @@ class DockerAgent(OpsAgent):
                 client_config: Optional[dict] = None,
                 memory_saver=SqliteSaver,
                 output_color="warm_blue",
-                streaming=True):
-        
+                streaming=True,
+                context_memory=None,
+                checkpointer=None,
+                route_tools=True):
+        """
+        context_memory: memory with a `pre_model_hook` (e.g. TokenBudgetMemory)
+            used to trim the messages sent to the model on every step,
+            overridden per session by `current_context_memory`
+        checkpointer: ready checkpointer (e.g. from CheckpointStore), takes
+            precedence over memory_saver(connection)
+        route_tools: offer the model only the tool groups relevant to the turn
+        """
+
         self.model = model
         self.api_key = api_key
         self.client = client(
@@ -43,10 +57,13 @@ class DockerAgent(OpsAgent):
             **(client_config or {}),
             streaming=streaming
         )
-        self.memory = memory_saver(connection) if connection else None
+        self.memory = checkpointer or (memory_saver(connection) if connection else None)
         self._graph = None
         self.output_color = output_color
-        
+        self.context_memory = context_memory
+        self.route_tools = route_tools
+        self.tool_router: Optional[ToolRouter] = None
+
     @property
     def graph(self):
         if not self._graph:
@@ -90,16 +107,37 @@ class DockerAgent(OpsAgent):
             printers[self.output_color](response)
             user_input = input(">>  ")
     
+    def pre_model_hook(self, state) -> dict:
+        memory = current_context_memory.get() or self.context_memory
+        if not hasattr(memory, "pre_model_hook"):
+            return {"llm_input_messages": state["messages"]}
+        return memory.pre_model_hook(state)
+
     def create_graph(self):
         model = self.client
-        tools =  all_container_tools
-        tools += all_shell_tools
-        tools += [
+        # new list: `+=` on all_container_tools grew the shared module list per graph
+        tools = [
+            *all_container_tools,
+            *all_shell_tools,
+            *all_query_tools,
             tavily_search,
             google_search,
             search_through_url_tool
         ]
-        agent = create_react_agent(model, tools, prompt=docker_agent_main_prompt)
+        if self.route_tools:
+            self.tool_router = ToolRouter(
+                model,
+                tools,
+                {**docker_tool_groups, **database_tool_groups},
+                default_groups=("containers", "tasks", "images"),
+            )
+            model = self.tool_router.select_model
+        agent = create_react_agent(
+            model,
+            tools,
+            prompt=docker_agent_main_prompt,
+            pre_model_hook=self.pre_model_hook,
+        )
         workflow = StateGraph(MessagesState)
         workflow.add_node("agent", agent)
         workflow.set_entry_point("agent")
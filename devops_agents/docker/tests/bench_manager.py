@@ -0,0 +1,333 @@
+"""
+Benchmarks for DockerManager and DockerTaskRunner against the fake engine in fake_engine.py,
+no docker daemon needed.
+
+The file name keeps it out of the default test collection, run it explicitly:
+    pip install pytest pytest-benchmark docker
+    pytest devops_agents/docker/tests/bench_manager.py --benchmark-json=bench_manager.json
+
+Compare two runs with:
+    pytest-benchmark compare bench_manager_old.json bench_manager.json
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("docker")
+
+sys.path.insert(0, os.path.dirname(__file__))
+from fake_engine import FakeDockerEngine
+from devops_agents.docker.utils.manager import DockerManager, TaskStatus, RUNNER_REGISTRY
+from devops_agents.docker.utils.readiness import wait_until_ready, LogProbe
+from devops_agents.docker.utils.pulls import pull_images
+from devops_agents.docker.utils.stats import ContainerStatsSampler, FIELDS
+from devops_agents.docker.utils.log_index import ContainerLogIndex
+
+
+def wait_for_status(runner_id: str, statuses: tuple, timeout: float = 60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if DockerManager.get_task_runner_status(runner_id) in statuses:
+            return
+        time.sleep(0.001)
+    raise TimeoutError(f"runner {runner_id} not in {statuses} within {timeout}s")
+
+
+@pytest.fixture
+def engine_factory(monkeypatch):
+    """Starts a fake engine with the given options and points DockerManager and DockerTaskRunner at it."""
+    socket_dir = tempfile.mkdtemp(prefix="fake-docker-")  # unix socket paths are limited to ~100 chars
+    engines = []
+
+    def start(**options) -> FakeDockerEngine:
+        engine = FakeDockerEngine(os.path.join(socket_dir, f"docker-{len(engines)}.sock"), **options).start()
+        engines.append(engine)
+        monkeypatch.setenv("DOCKER_HOST", engine.base_url)
+        monkeypatch.setattr(DockerManager, "_client", None)
+        return engine
+
+    yield start
+    for engine in engines:
+        engine.stop()
+    RUNNER_REGISTRY.clear()
+    os.rmdir(socket_dir)
+
+
+@pytest.mark.parametrize("latency", [0, 0.001])
+@pytest.mark.parametrize("containers", [10, 100, 1000])
+def test_list_containers(benchmark, engine_factory, containers, latency):
+    engine = engine_factory(containers=containers, latency=latency)
+    DockerManager.list_available_containers()  # warm up the client and connection pool
+
+    requests_before = engine.requests
+    result = benchmark.pedantic(DockerManager.list_available_containers, rounds=3, iterations=1)
+    assert result.success, result.error
+    benchmark.extra_info["containers"] = containers
+    benchmark.extra_info["engine_latency"] = latency
+    benchmark.extra_info["api_requests_per_call"] = (engine.requests - requests_before) / 3
+    benchmark.extra_info["output_chars"] = len(result.output)
+
+
+@pytest.mark.parametrize("containers", [1000, 10000])
+def test_list_containers_filtered_pages(benchmark, engine_factory, containers):
+    """Walk every running "api" container page by page, the filters and the paging done by the engine."""
+    engine = engine_factory(containers=containers)
+    DockerManager.list_available_containers(limit=1)
+
+    def walk():
+        names, cursor = [], None
+        while True:
+            result = DockerManager.list_available_containers(name="api", status="running", limit=100, cursor=cursor)
+            assert result.success, result.error
+            lines = result.output.splitlines()
+            names += [line.split(" | ")[0].lstrip("| ") for line in lines[2:-1]]
+            if "cursor=" not in lines[-1]:
+                return names
+            cursor = lines[-1].split('cursor="')[1].rstrip('"')
+
+    requests_before = engine.requests
+    names = benchmark.pedantic(walk, rounds=3, iterations=1)
+    expected = [c["Names"][0][1:] for c in engine.containers if c["State"] == "running" and "api" in c["Names"][0]]
+    assert sorted(names) == sorted(expected)
+    benchmark.extra_info["containers"] = containers
+    benchmark.extra_info["matching"] = len(names)
+    benchmark.extra_info["api_requests_per_walk"] = (engine.requests - requests_before) / 3
+
+
+@pytest.mark.parametrize("images", [10, 100, 1000])
+def test_list_images(benchmark, engine_factory, images):
+    engine = engine_factory(containers=0, images=images)
+    DockerManager.get_list_of_images()
+
+    requests_before = engine.requests
+    result = benchmark.pedantic(DockerManager.get_list_of_images, rounds=3, iterations=1)
+    assert result.startswith("✅"), result
+    benchmark.extra_info["images"] = images
+    benchmark.extra_info["api_requests_per_call"] = (engine.requests - requests_before) / 3
+
+
+@pytest.mark.parametrize("tasks", [10, 50, 200])
+def test_run_task_burst(benchmark, engine_factory, tasks):
+    """Time from firing `tasks` run_task calls until all of them finished."""
+    engine = engine_factory(containers=10, exec_output_bytes=4096, exec_duration=0.05)
+
+    def burst():
+        runner_ids = [DockerManager.run_task("api-1", ["echo", "hello"]) for _ in range(tasks)]
+        for runner_id in runner_ids:
+            wait_for_status(runner_id, (TaskStatus.DONE, TaskStatus.FAILED), timeout=120)
+        return runner_ids
+
+    runner_ids = benchmark.pedantic(burst, rounds=3, iterations=1)
+    statuses = [DockerManager.get_task_runner_status(runner_id) for runner_id in runner_ids]
+    benchmark.extra_info["tasks"] = tasks
+    benchmark.extra_info["failed"] = statuses.count(TaskStatus.FAILED)
+    benchmark.extra_info["tasks_per_second"] = tasks / benchmark.stats.stats.mean
+    benchmark.extra_info["api_requests"] = engine.requests
+
+
+@pytest.mark.parametrize("output_bytes", [1024, 1024 ** 2, 10 * 1024 ** 2])
+def test_task_output_size(benchmark, engine_factory, output_bytes):
+    """Run a task to completion and fetch its output as the get_task_runner_output tool does."""
+    engine_factory(containers=10, exec_output_bytes=output_bytes)
+
+    def run_and_fetch():
+        runner_id = DockerManager.run_task("api-1", ["cat", "big.log"])
+        wait_for_status(runner_id, (TaskStatus.DONE, TaskStatus.FAILED), timeout=120)
+        return DockerManager.get_task_runner_output(runner_id)
+
+    output = benchmark.pedantic(run_and_fetch, rounds=3, iterations=1)
+    assert len(output) == output_bytes
+    benchmark.extra_info["output_bytes"] = output_bytes
+    benchmark.extra_info["bytes_per_second"] = output_bytes / benchmark.stats.stats.mean
+
+
+def test_interrupt_latency(benchmark, engine_factory):
+    """Time for stop_runner to return on a task that would otherwise run for a minute."""
+    engine_factory(containers=10, exec_output_bytes=1024 ** 2, exec_duration=60)
+
+    def start_runner():
+        runner_id = DockerManager.run_task("api-1", ["tail", "-f", "app.log"])
+        wait_for_status(runner_id, (TaskStatus.PROCESSING,))
+        return (runner_id,), {}
+
+    result = benchmark.pedantic(DockerManager.stop_runner, setup=start_runner, rounds=5, iterations=1)
+    assert "successfully" in result, result
+
+
+def test_interrupt_kills_exec_trapping_sigint(benchmark, engine_factory):
+    """stop_runner on a task ignoring Ctrl+C: the exec's process is killed once force_timeout is over."""
+    engine_factory(containers=10, exec_output_bytes=1024 ** 2, exec_duration=60, exec_traps_sigint=True)
+    runners = []
+
+    def start_runner():
+        runner_id = DockerManager.run_task("api-1", ["tail", "-f", "app.log"])
+        wait_for_status(runner_id, (TaskStatus.PROCESSING,))
+        runners.append(runner_id)
+        return (runner_id,), {}
+
+    result = benchmark.pedantic(DockerManager.stop_runner, setup=start_runner, rounds=2, iterations=1)
+    assert "successfully" in result, result
+    for runner_id in runners:
+        wait_for_status(runner_id, (TaskStatus.FAILED,), timeout=10)
+
+
+@pytest.mark.parametrize("events", [True, False])
+def test_readiness_wake_latency(benchmark, engine_factory, monkeypatch, events):
+    """Time between a container turning healthy and wait_until_ready returning, with and without engine events."""
+    engine = engine_factory(containers=10)
+    if not events:
+        monkeypatch.setattr(DockerManager._get_docker_client(), "events", lambda **kwargs: 1 / 0)
+    turns_healthy = 0.5
+    healthy_at = []
+
+    def become_healthy():
+        time.sleep(turns_healthy)
+        healthy_at.append(time.perf_counter())
+        engine.set_health("api-1", "healthy")
+
+    def setup():
+        engine.set_health("api-1", "starting")
+        healthy_at.clear()
+        threading.Thread(target=become_healthy, daemon=True).start()
+        return (), {}
+
+    lags = []
+
+    def wait():
+        result = wait_until_ready("api-1", timeout=10)
+        lags.append(time.perf_counter() - healthy_at[0])
+        return result
+
+    result = benchmark.pedantic(wait, setup=setup, rounds=5, iterations=1)
+    assert result.success, result.error
+    benchmark.extra_info["events"] = events
+    benchmark.extra_info["wake_latency_seconds"] = sorted(lags)[len(lags) // 2]
+
+
+def test_log_probe_check(benchmark, engine_factory):
+    """
+    One LogProbe check after a few new lines. Lines a nanosecond apart, or at the very
+    timestamp of the last counted one, must each be counted once.
+    """
+    engine = engine_factory(containers=10)
+    container = DockerManager._get_docker_client().containers.get("api-1")
+    probe = LogProbe("ready")
+    start = time.time_ns() // 10 ** 6 * 10 ** 6
+    rounds = iter(range(1000))
+
+    def setup():
+        timestamp = start + next(rounds) * 10 ** 6
+        for offset in (0, 1, 1, 999):
+            engine.append_log("api-1", "ready", timestamp + offset)
+        return (container,), {}
+
+    benchmark.pedantic(probe.check, setup=setup, rounds=10, iterations=1)
+    assert probe.found == 10 * 4, probe.found
+    # the next check gets the lines again from the last microsecond and counts nothing new
+    probe.check(container)
+    assert probe.found == 10 * 4, probe.found
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_pull_images(benchmark, engine_factory, bulk):
+    """Pull 10 images (sharing a base layer) one by one with docker_pull_image, or with pull_images."""
+    engine = engine_factory(containers=0, images=0, pull_layers=3, pull_layer_seconds=0.1)
+    rounds = iter(range(1000))
+
+    def setup():
+        # fresh names and layer cache every round, nothing is already present
+        engine.downloaded_layers.clear()
+        return ([f"bench/app-{next(rounds)}-{i}:1.0" for i in range(10)],), {}
+
+    def pull_one_by_one(images):
+        return [DockerManager.docker_pull_image(image) for image in images]
+
+    result = benchmark.pedantic(pull_images if bulk else pull_one_by_one, setup=setup, rounds=3, iterations=1)
+    if bulk:
+        assert result.success, result.error
+    else:
+        assert all(line.startswith("✅") for line in result), result
+    benchmark.extra_info["images"] = 10
+    benchmark.extra_info["layer_seconds"] = 0.1
+
+
+@pytest.mark.parametrize("containers", [10, 100, 1000])
+def test_stats_top(benchmark, containers):
+    """Aggregate full stats windows (300 samples per container) into the top-N table."""
+    np = pytest.importorskip("numpy")
+    sampler = ContainerStatsSampler(capacity=300)
+    rng = np.random.default_rng(0)
+    now = time.time()
+    for c in range(containers):
+        rows = np.zeros((300, len(FIELDS)))
+        rows[:, 0] = now - 300 + np.arange(300)
+        rows[:, 1:] = np.cumsum(rng.random((300, len(FIELDS) - 1)) * 1e6, axis=0)
+        rows[:, 3] = 4
+        for row in rows:
+            sampler.ring.record(f"container-{c}", row)
+
+    table = benchmark(sampler.top, "cpu", 10)
+    assert table.startswith(f"top 10 of {containers}")
+    benchmark.extra_info["containers"] = containers
+    benchmark.extra_info["ring_bytes"] = sampler.ring.data.nbytes
+
+
+@pytest.mark.parametrize("events", [True, False])
+def test_stats_eviction_latency(benchmark, engine_factory, events):
+    """
+    Time for a stopped container to leave the stats ring, on its die event or,
+    without one, once it is missing from the listing. Its row is reused on restart.
+    """
+    pytest.importorskip("numpy")
+    engine = engine_factory(containers=10)
+    sampler = ContainerStatsSampler(mode="poll", interval=0.1).start()
+    sampler.wait_for_samples(samples=1, timeout=10)
+    rows = len(sampler.ring.head)
+
+    def stop():
+        engine.set_state("api-1", "running", "start")
+        deadline = time.monotonic() + 10
+        while "api-1" not in sampler.ring.slots and time.monotonic() < deadline:
+            time.sleep(0.005)
+        engine.set_state("api-1", "exited", "die" if events else None)
+        return (), {}
+
+    def evicted():
+        deadline = time.monotonic() + 10
+        while "api-1" in sampler.ring.slots:
+            assert time.monotonic() < deadline, "api-1 was never evicted"
+            time.sleep(0.005)
+
+    try:
+        benchmark.pedantic(evicted, setup=stop, rounds=5, iterations=1)
+        assert "api-1 |" not in sampler.top(n=20)
+        assert len(sampler.ring.head) == rows
+    finally:
+        sampler.stop()
+    benchmark.extra_info["events"] = events
+
+
+@pytest.mark.parametrize("lines", [100_000, 1_000_000])
+def test_log_search(benchmark, tmp_path, lines):
+    """Full text search over the log index, filtered by container glob and time window."""
+    index = ContainerLogIndex(tmp_path / "logs.sqlite3")
+    now = time.time()
+    levels = ["INFO", "INFO", "INFO", "DEBUG", "WARN", "ERROR"]
+    with index.connect() as connection:
+        connection.executemany(
+            "INSERT INTO log_lines (container, ts, line) VALUES (?, ?, ?)",
+            (
+                (f"{'api' if i % 4 else 'worker'}-{i % 20}", now - lines + i,
+                 f"{levels[i % 6]} request {i} handled in {i % 500}ms status={200 if i % 97 else 503}")
+                for i in range(lines)
+            )
+        )
+
+    rows = benchmark(index.search, "ERROR status=503", "api-*", 60, 50)
+    assert rows and all(line.startswith("ERROR") and name.startswith("api-") for name, _, line in rows)
+    benchmark.extra_info["lines"] = lines
+    benchmark.extra_info["db_bytes"] = os.path.getsize(index.path)
@@ -0,0 +1,156 @@
+"""
+Benchmarks for the interactive shell subsystem (PExpectPipe, CMDTools) against plain bash.
+
+The file name keeps it out of the default test collection, run it explicitly:
+    pip install pytest pytest-benchmark psutil
+    pytest devops_agents/docker/tests/bench_shell.py --benchmark-json=bench_shell.json
+
+Compare two runs with:
+    pytest-benchmark compare bench_shell_old.json bench_shell.json
+"""
+import re
+import time
+import asyncio
+import shutil
+import threading
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("pexpect")
+psutil = pytest.importorskip("psutil")
+if not shutil.which("bash"):
+    pytest.skip("bash is required for shell benchmarks", allow_module_level=True)
+
+from devops_agents.docker.utils.cmd_tools import CMDTools, PExpectPipe, PXPIPE_REGISTRY, current_output_stream
+
+
+def wait_for_marker(pipe: PExpectPipe, start: int, timeout: float = 60) -> str:
+    """
+    Waits until the marker of the last command is printed on its own line.
+    The echoed command line also holds the marker, so plain `in` checks are not enough
+    (bash may prefix the line with a bracketed-paste escape ending in a carriage return).
+    """
+    pattern = re.compile(rf"(?:^|\r){re.escape(pipe.marker)}\r?$", re.MULTILINE)
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        output = pipe._output_buffer[start:]
+        if pattern.search(output):
+            return output
+        time.sleep(0.001)
+    raise TimeoutError(f"marker {pipe.marker} not seen within {timeout}s")
+
+
+def run_and_wait(pipe: PExpectPipe, command: str, timeout: float = 60) -> str:
+    start = len(pipe._output_buffer)
+    pipe.write(command)
+    return wait_for_marker(pipe, start, timeout)
+
+
+@pytest.fixture
+def pipe():
+    shell = PExpectPipe("bash", timeout=5)
+    yield shell
+    shell.close()
+
+
+def test_create_shell_latency(benchmark):
+    def create_and_close():
+        pipe_id = CMDTools.create_shell("bash")
+        PXPIPE_REGISTRY[pipe_id].close()
+
+    benchmark(create_and_close)
+
+
+def test_command_round_trip(benchmark, pipe):
+    benchmark(run_and_wait, pipe, "true")
+
+
+def test_read_output_round_trip(benchmark, pipe):
+    """CMDTools.read_output as used by the agent, bounded by its timeout argument."""
+    def round_trip():
+        CMDTools.run_command(pipe.id, "true")
+        return CMDTools.read_output(pipe.id, timeout=1)
+
+    benchmark.pedantic(round_trip, rounds=5, iterations=1)
+
+
+@pytest.mark.parametrize("command", [
+    "seq 1 200000",
+    "yes | head -n 200000",
+])
+def test_output_throughput(benchmark, pipe, command):
+    sizes = []
+
+    def produce():
+        sizes.append(len(run_and_wait(pipe, command, timeout=120)))
+
+    benchmark.pedantic(produce, rounds=3, iterations=1)
+    benchmark.extra_info["output_chars"] = sizes[-1]
+    benchmark.extra_info["chars_per_second"] = sizes[-1] / benchmark.stats.stats.mean
+
+
+def test_stream_command_lines(benchmark, pipe):
+    """
+    stream_command on output spanning many reads of the terminal: every line reaches the
+    live view and the result whole, once, and without terminal escape codes.
+    """
+    expected = [str(i) for i in range(1, 20001)]
+    pushed = []
+
+    class View:
+        async def push(self, text):
+            pushed.append(text)
+
+    @asynccontextmanager
+    async def view(title):
+        yield View()
+
+    async def stream():
+        pushed.clear()
+        current_output_stream.set(view)
+        return await CMDTools.stream_command(pipe.id, "seq 1 20000", overall_timeout=120)
+
+    output = benchmark.pedantic(lambda: asyncio.run(stream()), rounds=3, iterations=1)
+    assert output.split("\n") == expected
+    assert "".join(pushed).splitlines() == expected
+    benchmark.extra_info["output_chars"] = len(output)
+
+
+def test_memory_growth_long_session(benchmark, pipe):
+    process = psutil.Process()
+    commands = 1000
+
+    def long_session():
+        rss_before = process.memory_info().rss
+        for i in range(commands):
+            run_and_wait(pipe, f"echo line-{i}")
+        return process.memory_info().rss - rss_before
+
+    rss_growth = benchmark.pedantic(long_session, rounds=1, iterations=1)
+    benchmark.extra_info["commands"] = commands
+    benchmark.extra_info["rss_growth_bytes"] = rss_growth
+    benchmark.extra_info["output_buffer_chars"] = len(pipe._output_buffer)
+    benchmark.extra_info["output_queue_items"] = pipe._output_queue.qsize()
+
+
+@pytest.mark.parametrize("shells", [50, 100, 500])
+def test_concurrent_shells(benchmark, shells):
+    process = psutil.Process()
+
+    def session_storm():
+        with ThreadPoolExecutor(max_workers=min(shells, 64)) as executor:
+            pipes = list(executor.map(lambda _: PExpectPipe("bash", timeout=30), range(shells)))
+            try:
+                list(executor.map(lambda shell: run_and_wait(shell, "echo ready", timeout=120), pipes))
+                return threading.active_count(), process.memory_info().rss, process.cpu_percent()
+            finally:
+                list(executor.map(lambda shell: shell.close(), pipes))
+
+    process.cpu_percent()
+    threads, rss, cpu = benchmark.pedantic(session_storm, rounds=1, iterations=1)
+    benchmark.extra_info["shells"] = shells
+    benchmark.extra_info["threads_while_open"] = threads
+    benchmark.extra_info["rss_bytes_while_open"] = rss
+    benchmark.extra_info["cpu_percent"] = cpu
@@ -0,0 +1,685 @@
+"""
+Stand-in Docker Engine API server on a unix socket, for benchmarks without a docker daemon.
+
+Serves the subset of the API used by DockerManager and DockerTaskRunner:
+    GET  /_ping, /version
+    GET  /containers/json, /containers/{id}/json, /containers/{id}/logs, /containers/{id}/stats
+    GET  /images/json, /images/{name}/json
+    POST /containers/{id}/exec, /exec/{id}/start
+    POST /images/create (pull)
+    GET  /exec/{id}/json
+    GET  /events
+
+Example usage:
+    with FakeDockerEngine("/tmp/fake-docker.sock", containers=1000, latency=0.002) as engine:
+        client = docker.DockerClient(base_url=engine.base_url)
+        client.containers.list(all=True)
+"""
+import os
+import re
+import json
+import time
+import queue
+import uuid
+import hashlib
+import subprocess
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+
+API_VERSION = "1.43"
+VERSION_PREFIX = re.compile(r"^/v[0-9.]+")
+
+
+def fake_id(seed: str) -> str:
+    return hashlib.sha256(seed.encode()).hexdigest()
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 1024  # bursts open a connection pool per task runner
+
+
+class FakeDockerEngine:
+    def __init__(self,
+                socket_path: str,
+                containers: int = 100,
+                images: int = 50,
+                latency: float = 0.0,
+                exec_output_bytes: int = 1024,
+                exec_duration: float = 0.0,
+                exec_exit_code: int = 0,
+                exec_traps_sigint: bool = False,
+                pull_layers: int = 3,
+                pull_layer_bytes: int = 10 * 1024 ** 2,
+                pull_layer_seconds: float = 0.0,
+                stats_interval: float = 1.0,
+                events_interval: Optional[float] = None):
+        """
+        latency: seconds slept before answering every request
+        exec_output_bytes: bytes written by every exec
+        exec_duration: seconds an exec keeps running (output is spread over it)
+        exec_exit_code: exit code of every exec that is not killed
+        exec_traps_sigint: execs ignore Ctrl+C, they run as a real `sleep` process whose pid
+            is reported by /exec/{id}/json, so only killing that process ends them early
+        pull_layers: layers of every pulled image, the first one is shared by all images
+        pull_layer_bytes: size of every layer
+        pull_layer_seconds: download time of every layer, a layer is downloaded once
+            (like the daemon, concurrent pulls of a shared layer wait for the same download)
+        stats_interval: seconds between two samples of a streamed /containers/{id}/stats
+        events_interval: when set, /events also sends a synthetic start event this often,
+            cycling through the containers (events from emit_event are always sent)
+        """
+        self.socket_path = socket_path
+        self.latency = latency
+        self.exec_output_bytes = exec_output_bytes
+        self.exec_duration = exec_duration
+        self.exec_exit_code = exec_exit_code
+        self.exec_traps_sigint = exec_traps_sigint
+        self.pull_layers = pull_layers
+        self.pull_layer_bytes = pull_layer_bytes
+        self.pull_layer_seconds = pull_layer_seconds
+        self.downloaded_layers: dict[str, threading.Event] = {}
+        self.stats_interval = stats_interval
+        self.events_interval = events_interval
+        self.started_at = time.time()
+        self.requests = 0
+        self.images = [self._make_image(i) for i in range(images)]
+        self.containers = [self._make_container(i) for i in range(containers)]
+        self.execs: dict[str, dict] = {}
+        self.health: dict[str, str] = {}
+        self.logs: dict[str, list[tuple[int, str]]] = {}  # (epoch nanoseconds, line)
+        self._subscribers: list[queue.Queue] = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._stopped = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"unix://{self.socket_path}"
+
+    def _make_image(self, i: int) -> dict:
+        dangling = i % 10 == 9
+        return {
+            "Id": f"sha256:{fake_id(f'image-{i}')}",
+            "ParentId": "",
+            "RepoTags": None if dangling else [f"bench/image-{i}:latest"],
+            "RepoDigests": [],
+            "Created": 1700000000 + i,
+            "Size": 10_000_000 + i * 1000,
+            "SharedSize": -1,
+            "VirtualSize": 10_000_000 + i * 1000,
+            "Labels": {"team": "ops" if i % 2 else "dev"},
+            "Containers": -1,
+        }
+
+    def _make_container(self, i: int) -> dict:
+        image = self.images[i % len(self.images)] if self.images else self._make_image(0)
+        running = i % 3 != 0
+        return {
+            "Id": fake_id(f"container-{i}"),
+            "Names": [f"/{'api' if i % 2 else 'worker'}-{i}"],
+            "Image": (image["RepoTags"] or [image["Id"]])[0],
+            "ImageID": image["Id"],
+            "Command": "sleep infinity",
+            "Created": 1700000000 + i,
+            "State": "running" if running else "exited",
+            "Status": "Up 2 hours" if running else "Exited (0) 1 hour ago",
+            "Ports": [],
+            "Labels": {"app": "api" if i % 2 else "worker"},
+            "Mounts": [],
+        }
+
+    # ----------------------
+    # Lookups and filters
+    # ----------------------
+    def find_container(self, ref: str):
+        for container in self.containers:
+            if container["Id"].startswith(ref) or container["Names"][0] == f"/{ref}":
+                return container
+        return None
+
+    def find_image(self, ref: str):
+        for image in self.images:
+            if image["Id"] == ref or image["Id"].split(":")[-1].startswith(ref) or ref in (image["RepoTags"] or []):
+                return image
+        return None
+
+    @staticmethod
+    def _match_labels(labels: dict, wanted: list[str]) -> bool:
+        for label in wanted:
+            key, _, value = label.partition("=")
+            if key not in labels or (value and labels[key] != value):
+                return False
+        return True
+
+    def filter_containers(self, query: dict) -> list[dict]:
+        filters = json.loads(query.get("filters", ["{}"])[0] or "{}")
+        containers = self.containers
+        if query.get("all", ["0"])[0] in ("0", "false", "False"):
+            containers = [c for c in containers if c["State"] == "running"]
+        if names := filters.get("name"):
+            containers = [c for c in containers if any(re.search(n, c["Names"][0]) for n in names)]
+        if statuses := filters.get("status"):
+            containers = [c for c in containers if c["State"] in statuses]
+        if labels := filters.get("label"):
+            containers = [c for c in containers if self._match_labels(c["Labels"], labels)]
+        if ancestors := filters.get("ancestor"):
+            containers = [c for c in containers if c["Image"] in ancestors or c["ImageID"] in ancestors]
+        # newest first, `before` keeps the containers created before the given one
+        containers = sorted(containers, key=lambda c: c["Created"], reverse=True)
+        if before := filters.get("before"):
+            reference = self.find_container(before[0])
+            containers = [c for c in containers if reference and c["Created"] < reference["Created"]]
+        if limit := int(query.get("limit", ["-1"])[0]):
+            if limit > 0:
+                containers = containers[:limit]
+        return containers
+
+    def filter_images(self, query: dict) -> list[dict]:
+        filters = json.loads(query.get("filters", ["{}"])[0] or "{}")
+        images = self.images
+        references = filters.get("reference", []) + query.get("filter", [])
+        if references:
+            images = [
+                i for i in images
+                if any(ref.split(":")[0] in tag for ref in references for tag in (i["RepoTags"] or []))
+            ]
+        if dangling := filters.get("dangling"):
+            want_dangling = dangling[0] in ("true", "1")
+            images = [i for i in images if (i["RepoTags"] is None) == want_dangling]
+        if labels := filters.get("label"):
+            images = [i for i in images if self._match_labels(i["Labels"], labels)]
+        return images
+
+    def inspect_container(self, container: dict) -> dict:
+        return {
+            "Id": container["Id"],
+            "Name": container["Names"][0],
+            "Created": "2024-01-01T00:00:00Z",
+            "Image": container["ImageID"],
+            "State": {
+                "Status": container["State"],
+                "Running": container["State"] == "running",
+                "ExitCode": 0,
+                **({"Health": {"Status": self.health[container["Id"]]}} if container["Id"] in self.health else {}),
+            },
+            "Config": {
+                "Image": container["Image"],
+                "Labels": container["Labels"],
+                "Cmd": ["sleep", "infinity"],
+                "Env": [],
+                "Tty": False,
+            },
+            "HostConfig": {},
+            "NetworkSettings": {"Ports": {}},
+            "Mounts": [],
+        }
+
+    def inspect_image(self, image: dict) -> dict:
+        return {
+            "Id": image["Id"],
+            "RepoTags": image["RepoTags"] or [],
+            "RepoDigests": [],
+            "Created": "2024-01-01T00:00:00Z",
+            "Size": image["Size"],
+            "Config": {"Labels": image["Labels"]},
+        }
+
+    def container_stats(self, container: dict) -> dict:
+        """Counters growing at a steady rate, every container with its own load."""
+        i = self.containers.index(container)
+        elapsed = time.time() - self.started_at
+        cpus = 4
+        load = (i * 37 % 100) / 100  # share of one cpu
+        return {
+            "read": time.strftime("%Y-%m-%dT%H:%M:%S.000000000Z", time.gmtime()),
+            "pids_stats": {"current": 1 + i % 20},
+            "cpu_stats": {
+                "cpu_usage": {"total_usage": int(load * elapsed * 1e9)},
+                "system_cpu_usage": int(1e12 + elapsed * cpus * 1e9),
+                "online_cpus": cpus,
+            },
+            "precpu_stats": {"cpu_usage": {"total_usage": 0}},
+            "memory_stats": {
+                "usage": (i % 10 + 1) * 50 * 1024 ** 2 + int(elapsed * 1024) % 4096,
+                "limit": 8 * 1024 ** 3,
+                "stats": {"inactive_file": 1024 ** 2},
+            },
+            "networks": {"eth0": {"rx_bytes": int((i % 5) * 1000 * elapsed), "tx_bytes": int((i % 3) * 500 * elapsed)}},
+            "blkio_stats": {"io_service_bytes_recursive": [
+                {"major": 8, "minor": 0, "op": "read", "value": int((i % 4) * 2000 * elapsed)},
+                {"major": 8, "minor": 0, "op": "write", "value": int((i % 6) * 3000 * elapsed)},
+            ]},
+        }
+
+    # ----------------------
+    # State changes
+    # ----------------------
+    def make_event(self, container: dict, action: str) -> dict:
+        now = time.time()
+        return {
+            "Type": "container",
+            "Action": action,
+            "status": action,
+            "id": container["Id"],
+            "from": container["Image"],
+            "Actor": {
+                "ID": container["Id"],
+                "Attributes": {"name": container["Names"][0].lstrip("/"), "image": container["Image"]},
+            },
+            "time": int(now),
+            "timeNano": int(now * 1e9),
+        }
+
+    def emit_event(self, ref: str, action: str):
+        """Sends a container event to every open /events stream."""
+        event = self.make_event(self.find_container(ref), action)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(event)
+
+    def set_state(self, ref: str, state: str, action: Optional[str] = None):
+        container = self.find_container(ref)
+        container["State"] = state
+        if action:
+            self.emit_event(ref, action)
+
+    def set_health(self, ref: str, status: str):
+        self.health[self.find_container(ref)["Id"]] = status
+        self.emit_event(ref, f"health_status: {status}")
+
+    def append_log(self, ref: str, line: str, timestamp_ns: Optional[int] = None):
+        """Adds a log line, followed /logs streams send it right away."""
+        self.logs.setdefault(self.find_container(ref)["Id"], []).append((timestamp_ns or time.time_ns(), line))
+
+    # ----------------------
+    # Server lifecycle
+    # ----------------------
+    def start(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = _UnixHTTPServer(self.socket_path, _make_handler(self))
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _make_handler(engine: FakeDockerEngine):
+
+    class FakeEngineHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def address_string(self):
+            return "fake-engine"
+
+        def log_message(self, format, *args):
+            pass
+
+        # ----------------------
+        # Response helpers
+        # ----------------------
+        def send_json(self, payload, status=200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_text(self, text, status=200):
+            body = text.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def not_found(self, what="page"):
+            self.send_json({"message": f"No such {what}"}, status=404)
+
+        def start_chunked(self, content_type="application/json"):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+        def write_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def end_chunked(self):
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+        def read_body(self) -> bytes:
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def read_json_body(self) -> dict:
+            body = self.read_body()
+            return json.loads(body) if body else {}
+
+        def route(self, method):
+            with engine._lock:
+                engine.requests += 1
+            if engine.latency:
+                time.sleep(engine.latency)
+            parsed = urlparse(self.path)
+            path = VERSION_PREFIX.sub("", parsed.path)
+            query = parse_qs(parsed.query)
+            handler = getattr(self, f"handle_{method}", None)
+            handler(path, query)
+
+        def do_GET(self):
+            self.route("get")
+
+        def do_POST(self):
+            self.route("post")
+
+        def do_HEAD(self):
+            self.send_text("")
+
+        # ----------------------
+        # Endpoints
+        # ----------------------
+        def handle_get(self, path, query):
+            if path == "/_ping":
+                return self.send_text("OK")
+            if path == "/version":
+                return self.send_json({
+                    "Version": "24.0.0",
+                    "ApiVersion": API_VERSION,
+                    "MinAPIVersion": "1.12",
+                    "Os": "linux",
+                    "Arch": "amd64",
+                })
+            if path == "/containers/json":
+                return self.send_json(engine.filter_containers(query))
+            if match := re.fullmatch(r"/containers/([^/]+)/json", path):
+                container = engine.find_container(match.group(1))
+                return self.send_json(engine.inspect_container(container)) if container else self.not_found("container")
+            if match := re.fullmatch(r"/containers/([^/]+)/logs", path):
+                container = engine.find_container(match.group(1))
+                if not container:
+                    return self.not_found("container")
+                return self.stream_logs(container, query)
+            if match := re.fullmatch(r"/containers/([^/]+)/stats", path):
+                container = engine.find_container(match.group(1))
+                if not container:
+                    return self.not_found("container")
+                if query.get("stream", ["1"])[0] in ("0", "false", "False"):
+                    return self.send_json(engine.container_stats(container))
+                return self.stream_stats(container)
+            if path == "/images/json":
+                return self.send_json(engine.filter_images(query))
+            if match := re.fullmatch(r"/images/(.+)/json", path):
+                image = engine.find_image(match.group(1))
+                return self.send_json(engine.inspect_image(image)) if image else self.not_found("image")
+            if match := re.fullmatch(r"/exec/([^/]+)/json", path):
+                exec_info = engine.execs.get(match.group(1))
+                if not exec_info:
+                    return self.not_found("exec instance")
+                return self.send_json({
+                    "ID": match.group(1),
+                    "Running": exec_info["running"],
+                    "Pid": exec_info["pid"],
+                    "ExitCode": exec_info["exit_code"],
+                    "ContainerID": exec_info["container"],
+                })
+            if path == "/events":
+                return self.stream_events(json.loads(query.get("filters", ["{}"])[0]))
+            return self.not_found()
+
+        def handle_post(self, path, query):
+            if match := re.fullmatch(r"/containers/([^/]+)/exec", path):
+                container = engine.find_container(match.group(1))
+                if not container:
+                    return self.not_found("container")
+                body = self.read_json_body()
+                exec_id = uuid.uuid4().hex
+                engine.execs[exec_id] = {
+                    "container": container["Id"],
+                    "tty": body.get("Tty", False),
+                    "stdin": body.get("AttachStdin", False),
+                    "pid": 0,
+                    "running": False,
+                    "exit_code": None,
+                    "killed": threading.Event(),
+                    "signal_exit_code": None,
+                }
+                return self.send_json({"Id": exec_id}, status=201)
+            if match := re.fullmatch(r"/exec/([^/]+)/start", path):
+                # like the daemon, the output is framed unless the exec was created with a tty
+                # (there is no endpoint to signal an exec, it ends through its terminal)
+                self.read_json_body()
+                return self.stream_exec(match.group(1))
+            if path == "/images/create":
+                self.read_body()
+                return self.stream_pull(query["fromImage"][0], query.get("tag", ["latest"])[0])
+            return self.not_found()
+
+        def read_terminal(self, exec_info):
+            """
+            Input of a tty exec: Ctrl+C interrupts it (exit 130) unless it traps SIGINT.
+            Like the daemon, input is dropped when the exec was created without stdin,
+            and closing the connection does not end the exec.
+            """
+            try:
+                while data := self.connection.recv(1024):
+                    if exec_info["stdin"] and b"\x03" in data and not engine.exec_traps_sigint:
+                        exec_info["signal_exit_code"] = 130
+                        exec_info["killed"].set()
+                        return
+            except OSError:
+                pass
+
+        def watch_process(self, exec_info, process):
+            """A killed backing process ends its exec with 128 + the signal number."""
+            if process.wait() < 0:
+                exec_info["signal_exit_code"] = 128 - process.returncode
+                exec_info["killed"].set()
+
+        def stream_exec(self, exec_id):
+            exec_info = engine.execs.get(exec_id)
+            if not exec_info:
+                return self.not_found("exec instance")
+            tty = exec_info["tty"]
+            process = None
+            if engine.exec_traps_sigint:
+                process = subprocess.Popen(["sleep", str(engine.exec_duration + 1)])
+                exec_info["pid"] = process.pid
+                threading.Thread(target=self.watch_process, args=(exec_info, process), daemon=True).start()
+            exec_info["running"] = True
+            self.close_connection = True
+            self.send_response(101)
+            self.send_header("Content-Type", "application/vnd.docker.raw-stream")
+            self.send_header("Connection", "Upgrade")
+            self.send_header("Upgrade", "tcp")
+            self.end_headers()
+            self.wfile.flush()
+            # docker-py reads the hijacked socket directly, let it finish parsing headers first
+            time.sleep(0.01)
+            if tty:
+                threading.Thread(target=self.read_terminal, args=(exec_info,), daemon=True).start()
+
+            chunk_size = 16 * 1024
+            chunks = max(1, -(-engine.exec_output_bytes // chunk_size))
+            pause = engine.exec_duration / chunks
+            remaining = engine.exec_output_bytes
+            deadline = time.time() + engine.exec_duration
+            try:
+                while remaining > 0 and not exec_info["killed"].is_set():
+                    size = min(chunk_size, remaining)
+                    data = (b"x" * 79 + b"\n") * (size // 80) + b"x" * (size % 80)
+                    if tty:
+                        self.wfile.write(data)
+                    else:
+                        self.wfile.write(b"\x01\x00\x00\x00" + len(data).to_bytes(4, "big") + data)
+                    remaining -= size
+                    if pause:
+                        exec_info["killed"].wait(pause)
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # the exec outlives its connection
+                exec_info["killed"].wait(max(0.0, deadline - time.time()))
+            finally:
+                if process:
+                    process.kill()
+                    process.wait()
+                exec_info["running"] = False
+                exec_info["exit_code"] = exec_info["signal_exit_code"] or engine.exec_exit_code
+
+        def stream_logs(self, container, query):
+            def frame(entry) -> bytes:
+                timestamp, line = entry
+                if timestamps:
+                    seconds, nanoseconds = divmod(timestamp, 10 ** 9)
+                    line = f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))}.{nanoseconds:09d}Z {line}"
+                data = (line + "\n").encode()
+                return b"\x01\x00\x00\x00" + len(data).to_bytes(4, "big") + data
+
+            logs = engine.logs.setdefault(container["Id"], [])
+            timestamps = query.get("timestamps", ["0"])[0] in ("1", "true", "True")
+            # "<seconds>[.<nanoseconds>]" like the daemon parses it
+            seconds, _, fraction = query.get("since", ["0"])[0].partition(".")
+            since = int(seconds) * 10 ** 9 + int(f"{fraction:0<9}"[:9])
+            sent = len(logs)
+            # inclusive like the daemon, lines at exactly `since` are sent again
+            entries = [entry for entry in logs[:sent] if entry[0] >= since]
+            tail = query.get("tail", ["all"])[0]
+            if tail != "all":
+                entries = entries[len(entries) - int(tail):] if int(tail) else []
+            if query.get("follow", ["0"])[0] not in ("1", "true", "True"):
+                data = b"".join(frame(entry) for entry in entries)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/vnd.docker.raw-stream")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                return self.wfile.write(data)
+
+            self.close_connection = True
+            self.start_chunked()
+            try:
+                if entries:
+                    self.write_chunk(b"".join(frame(entry) for entry in entries))
+                while not engine._stopped.is_set() and container["State"] == "running":
+                    if len(logs) > sent:
+                        new, sent = logs[sent:], len(logs)
+                        self.write_chunk(b"".join(frame(entry) for entry in new))
+                    else:
+                        engine._stopped.wait(0.02)
+                self.end_chunked()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def stream_stats(self, container):
+            self.close_connection = True
+            self.start_chunked()
+            try:
+                while not engine._stopped.is_set() and container["State"] == "running":
+                    self.write_chunk(json.dumps(engine.container_stats(container)).encode() + b"\n")
+                    engine._stopped.wait(engine.stats_interval)
+                self.end_chunked()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def stream_pull(self, repository, tag):
+            if "missing" in repository:
+                return self.send_json({"message": f"manifest for {repository}:{tag} not found: manifest unknown"}, status=404)
+            reference = f"{repository}@{tag}" if tag.startswith("sha256:") else f"{repository}:{tag}"
+            layers = [fake_id("layer-base")[:12]] + [
+                fake_id(f"layer-{reference}-{i}")[:12] for i in range(1, engine.pull_layers)
+            ]
+            self.close_connection = True
+            self.start_chunked()
+            send = lambda message: self.write_chunk(json.dumps(message).encode() + b"\r\n")
+            try:
+                send({"status": f"Pulling from {repository}", "id": tag})
+                for layer in layers:
+                    with engine._lock:
+                        done = engine.downloaded_layers.get(layer)
+                        owner = done is None
+                        if owner:
+                            done = engine.downloaded_layers[layer] = threading.Event()
+                    if not owner and done.is_set():
+                        send({"status": "Already exists", "progressDetail": {}, "id": layer})
+                        continue
+                    send({"status": "Pulling fs layer", "progressDetail": {}, "id": layer})
+                    if not owner:
+                        send({"status": "Waiting", "progressDetail": {}, "id": layer})
+                        done.wait()
+                    else:
+                        for step in range(1, 6):
+                            time.sleep(engine.pull_layer_seconds / 5)
+                            send({
+                                "status": "Downloading",
+                                "progressDetail": {"current": engine.pull_layer_bytes * step // 5, "total": engine.pull_layer_bytes},
+                                "id": layer,
+                            })
+                        done.set()
+                    send({"status": "Download complete", "progressDetail": {}, "id": layer})
+                    send({"status": "Pull complete", "progressDetail": {}, "id": layer})
+                send({"status": f"Digest: sha256:{fake_id(reference)}"})
+                send({"status": f"Status: Downloaded newer image for {reference}"})
+                with engine._lock:
+                    if not engine.find_image(reference):
+                        image = engine._make_image(len(engine.images))
+                        image["RepoTags"] = [reference]
+                        engine.images.append(image)
+                self.end_chunked()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def stream_events(self, filters: dict):
+            def wanted(event):
+                containers = filters.get("container")
+                if containers and not {event["id"], event["Actor"]["Attributes"]["name"]} & set(containers):
+                    return False
+                actions = filters.get("event")
+                # like the daemon, "health_status" also matches "health_status: healthy"
+                return not actions or any(event["Action"].split(":")[0] == action for action in actions)
+
+            events = queue.Queue()
+            with engine._lock:
+                engine._subscribers.append(events)
+            self.close_connection = True
+            self.start_chunked()
+            i = 0
+            try:
+                while not engine._stopped.is_set():
+                    try:
+                        event = events.get(timeout=engine.events_interval or 0.1)
+                    except queue.Empty:
+                        if not engine.events_interval or not engine.containers:
+                            continue
+                        event = engine.make_event(engine.containers[i % len(engine.containers)], "start")
+                        i += 1
+                    if wanted(event):
+                        self.write_chunk(json.dumps(event).encode() + b"\n")
+                self.end_chunked()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                with engine._lock:
+                    engine._subscribers.remove(events)
+
+    return FakeEngineHandler
@@ -1,6 +1,8 @@
 from devops_agents.docker.tools.container_tools import all_container_tools, all_container_tools_mapping
 from devops_agents.docker.tools.shell_tools import shell_tools_map, all_shell_tools
 from core.utils import create_structured_tool, ToolColourChanger
+from core.utils.condense_tools import fetch_tool_output
+from core.utils.router_tools import ToolGroup
 
 
 change_tools_colour_tool = create_structured_tool(
@@ -10,12 +12,65 @@ change_tools_colour_tool = create_structured_tool(
     log=True,
     log_colour="white",
 )
+# in no group, so always offered: condensed outputs of every group point to it
+fetch_tool_output_tool = create_structured_tool(
+    func=fetch_tool_output,
+    name="fetch_tool_output",
+    log=True,
+    log_colour="white",
+)
 all_container_tools_mapping.update(
-    {change_tools_colour_tool.name: change_tools_colour_tool}
+    {tool.name: tool for tool in (change_tools_colour_tool, fetch_tool_output_tool)}
 )
 ToolColourChanger.tool_mapping.update(all_container_tools_mapping)
-all_container_tools.append(change_tools_colour_tool)
-
-
+all_container_tools.extend([change_tools_colour_tool, fetch_tool_output_tool])
 
 
+# tool groups offered to the model only when the turn is about them (see ToolRouter)
+docker_tool_groups = {
+    "containers": ToolGroup(
+        [
+            "run_container",
+            "list_available_containers",
+            "start_docker_container",
+            "stop_docker_container_tool",
+            "wait_until_ready",
+        ],
+        ["container", "run", "start", "stop", "restart", "ps", "list", "status", "running", "port",
+         "ready", "wait", "health*"],
+    ),
+    "tasks": ToolGroup(
+        [
+            "run_task_container",
+            "check_task_runner_status",
+            "get_task_runner_output",
+            "stop_task_runner",
+        ],
+        ["exec", "execute", "command", "run", "task", "inside", "log", "output", "runner"],
+    ),
+    "images": ToolGroup(
+        ["get_list_of_docker_images", "pull_docker_image", "pull_images"],
+        ["image", "pull", "tag", "registry", "registries", "repositor*"],
+    ),
+    "stats": ToolGroup(
+        ["container_stats"],
+        ["cpu", "memory", "ram", "usage", "stats", "resource", "load", "top", "heav*", "consum*"],
+    ),
+    "logs": ToolGroup(
+        ["search_container_logs"],
+        ["log", "logging", "error", "exception", "warn*", "fail*", "crash*", "grep", "trace*", "stack"],
+    ),
+    "shell": ToolGroup(
+        [shell_tool.name for shell_tool in shell_tools_map.values()],
+        ["shell", "bash", "interactive", "terminal", "powershell", "psql", "postgres",
+         "mysql", "redis", "mongo*", "python", "session", "pipe", "operating system", "stream*"],
+    ),
+    "search": ToolGroup(
+        ["tavily_search", "google_search_results_json", "search_through_url"],
+        ["search", "google", "web", "docs", "documentation", "url", "http*", "internet", "look up", "how to", "error"],
+    ),
+    "settings": ToolGroup(
+        ["change_tools_colour_tool"],
+        ["colour", "color"],
+    ),
+}
@@ -1,13 +1,22 @@
 from devops_agents.docker.utils.manager import DockerManager
+from devops_agents.docker.utils.readiness import wait_until_ready
+from devops_agents.docker.utils.pulls import pull_images
+from devops_agents.docker.utils.stats import get_container_stats
+from devops_agents.docker.utils.log_index import search_container_logs
 from core.utils import create_structured_tool
+from core.settings import DOCKER_TOOLS_CACHE_TTL
 from devops_agents.docker.schemas import ContainerSpec, ContainerTask
 
 
+# cache group of read-only engine queries, dropped by every mutating tool
+DOCKER_CACHE_GROUP = "docker"
+
 run_container_tool = create_structured_tool(
     func = DockerManager.run_container,
     name = "run_container",
     description="runs docker containers with specified parameter",
     args_schema=ContainerSpec,
+    invalidates=[DOCKER_CACHE_GROUP],
     log=True,
     log_colour="orange"
 )
@@ -28,6 +37,7 @@ get_task_runner_output_tool = create_structured_tool(
     func = DockerManager.get_task_runner_output,
     name = "get_task_runner_output",
     description="""output result of task runner with given runner_id""",
+    condense=True,
     log=True,
     log_colour="white"
 )
@@ -52,7 +62,10 @@ stop_task_runner_tool = create_structured_tool(
 get_list_of_containers_tool = create_structured_tool(
     func = DockerManager.list_available_containers,
     name = "list_available_containers",
-    description="""lists all container""",
+    description="""lists containers as a table, newest first, at most `limit` per page.
+    filter by name, label, status or ancestor image instead of listing everything""",
+    cache_ttl=DOCKER_TOOLS_CACHE_TTL,
+    cache_group=DOCKER_CACHE_GROUP,
     log=True,
     log_colour="purple"
 )
@@ -60,6 +73,8 @@ get_list_of_containers_tool = create_structured_tool(
 get_list_of_images_tool = create_structured_tool(
     func = DockerManager.get_list_of_images,
     name = "get_list_of_docker_images",
+    cache_ttl=DOCKER_TOOLS_CACHE_TTL,
+    cache_group=DOCKER_CACHE_GROUP,
     log=True,
     log_colour="purple"
 )
@@ -67,6 +82,7 @@ get_list_of_images_tool = create_structured_tool(
 start_docket_container_tool = create_structured_tool(
     func = DockerManager.start_container,
     name = "start_docker_container",
+    invalidates=[DOCKER_CACHE_GROUP],
     log=True,
     log_colour="purple"
 )
@@ -74,6 +90,7 @@ start_docket_container_tool = create_structured_tool(
 stop_docker_container_tool = create_structured_tool(
     func = DockerManager.stop_container,
     name = "stop_docker_container_tool",
+    invalidates=[DOCKER_CACHE_GROUP],
     log=True,
     log_colour="purple"
 )
@@ -81,6 +98,43 @@ stop_docker_container_tool = create_structured_tool(
 pull_docker_image_tool = create_structured_tool(
     func = DockerManager.docker_pull_image,
     name = "pull_docker_image",
+    invalidates=[DOCKER_CACHE_GROUP],
+    log=True,
+    log_colour="purple"
+)
+
+pull_images_tool = create_structured_tool(
+    func = pull_images,
+    name = "pull_images",
+    description="""pulls several docker images concurrently and streams their progress to the user.
+    use it instead of pull_docker_image when more than one image is needed""",
+    invalidates=[DOCKER_CACHE_GROUP],
+    log=True,
+    log_colour="purple"
+)
+
+wait_until_ready_tool = create_structured_tool(
+    func = wait_until_ready,
+    name = "wait_until_ready",
+    description="""waits until a container is ready (running, healthy and optionally
+    accepting connections on a port, printing a log line or answering a database ping).
+    use it after starting a container instead of sleeping or polling its status""",
+    log=True,
+    log_colour="purple"
+)
+
+container_stats_tool = create_structured_tool(
+    func = get_container_stats,
+    name = "container_stats",
+    log=True,
+    log_colour="purple"
+)
+
+search_container_logs_tool = create_structured_tool(
+    func = search_container_logs,
+    name = "search_container_logs",
+    description="""searches the indexed logs of running containers (full text, container glob,
+    time window) and returns only the matching lines. use it instead of reading whole logs""",
     log=True,
     log_colour="purple"
 )
@@ -93,10 +147,14 @@ all_container_tools = [
     get_list_of_containers_tool,
     get_list_of_images_tool,
     pull_docker_image_tool,
+    pull_images_tool,
     get_task_runner_output_tool,
     check_task_runner_status_tool,
     start_docket_container_tool,
-    stop_docker_container_tool
+    stop_docker_container_tool,
+    wait_until_ready_tool,
+    container_stats_tool,
+    search_container_logs_tool
 ]
 
 all_container_tools_mapping = { 
@@ -1,11 +1,18 @@
+import inspect
 from devops_agents.docker.utils import CMDTools
 from core.utils import create_structured_tool, printers
 
 
+# tools returning raw terminal output, condensed before it reaches the model
+condensed_tools = {"read_output", "read_output_from_queue", "stream_command"}
+
 cmd_tools_functions = [
-    tool for name, tool in
-    CMDTools.__dict__.items()
+    getattr(CMDTools, name) for name in
+    CMDTools.__dict__
     if not str(name).startswith("__")
+    # generators stream to the UI, the model can't consume them (stream_command wraps them)
+    and not inspect.isgeneratorfunction(getattr(CMDTools, name))
+    and not inspect.isasyncgenfunction(getattr(CMDTools, name))
 ]
 
 shell_tools_map = dict(
@@ -15,8 +22,9 @@ shell_tools_map = dict(
             func=tool,
             name="shell_tool__" + tool.__name__,
             description=tool.__doc__,
+            condense=tool.__name__ in condensed_tools,
             log_printer=printers["bg_black"]["gold"]["bold"]["italic"]
         )
     ) for tool in cmd_tools_functions
 )
-all_shell_tools = list(shell_tools_map.values())
\ No newline at end of file
+all_shell_tools = list(shell_tools_map.values())
@@ -5,12 +5,23 @@ import pexpect
 import queue
 import signal
 import uuid
+import asyncio
 import threading
-from typing import Optional, Generator, AsyncGenerator, Dict
+from contextlib import aclosing, nullcontext
+from contextvars import ContextVar
+from typing import Optional, Generator, AsyncGenerator, AsyncContextManager, Callable, Dict, Iterable, List, Tuple
 from enum import StrEnum
 
+from core.settings import SHELL_STREAM_MAX_CHUNKS
+from core.terminal import strip_ansi
+
 
 PXPIPE_REGISTRY: Dict[str, 'PExpectPipe']  = {}
+# per-request factory of the live output view (UI) a streamed command is written to,
+# called with a title and entered around the stream: `async with factory(title) as out: await out.push(text)`
+current_output_stream: ContextVar[Optional[Callable[[str], AsyncContextManager]]] = ContextVar(
+    "current_output_stream", default=None
+)
 # PXPIPE_REGISTRY_LOCK = threading.Lock()
 # ToDo: decide to apply lock or not as its time consuming
 class ShellTypes(StrEnum):
@@ -107,6 +118,10 @@ class PExpectPipe:
 
         # Optional queue for pub/sub style
         self._output_queue = queue.Queue()
+        # (loop, event) of a running astream_output, woken by the reader thread
+        self._output_waiter = None
+        self._output_drained = threading.Event()
+        self._output_drained.set()
         
         # Background thread to continuously read
         self._stop_reader = threading.Event()
@@ -130,12 +145,40 @@ class PExpectPipe:
                     # with self._buffer_lock:
                     self._output_buffer += chunk
                     self._output_queue.put(chunk)
+                    self._notify_output()
+                    self._wait_for_room()
             except pexpect.TIMEOUT:
                 continue
             except pexpect.EOF:
                 break
             except Exception:
                 break
+        # lets a waiting astream_output see the end of the output
+        self._notify_output()
+
+    def _notify_output(self):
+        waiter = self._output_waiter
+        if waiter is not None:
+            loop, event = waiter
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # loop closed
+
+    def _wait_for_room(self):
+        """
+        Backpressure while astream_output consumes the queue: the reader stops reading once
+        SHELL_STREAM_MAX_CHUNKS are queued, so the command blocks on its terminal until the
+        consumer catches up instead of the queue growing without bound.
+        """
+        while (self._output_waiter is not None
+                and self._output_queue.qsize() >= SHELL_STREAM_MAX_CHUNKS
+                and not self._stop_reader.is_set()):
+            self._output_drained.clear()
+            # the consumer may have drained between the check and the clear
+            if self._output_queue.qsize() < SHELL_STREAM_MAX_CHUNKS:
+                break
+            self._output_drained.wait(0.1)
 
     # ----------------------
     # Helper to wait for generic prompts
@@ -200,66 +243,117 @@ class PExpectPipe:
     # ----------------------
     # Non-blocking streaming (consume queue)
     # ----------------------
-    async def astream_output(self, timeout:Optional[float] = None) -> AsyncGenerator[dict, None]:
-        """Generator yielding chunks as they arrive (for Redis/pub-sub)."""
-        timeout = timeout or 0.2
+    @staticmethod
+    def _complete_lines(pending: str, chunk: str) -> Tuple[List[str], str]:
+        """
+        Lines of `pending` + `chunk` ended by a newline, and the unterminated rest.
+        Chunks are cut at the read size, the rest is carried over to the next chunk.
+        """
+        *lines, rest = (pending + chunk).split("\n")
+        return lines, rest
+
+    def _output_items(self, lines: Iterable[str]) -> Generator[dict, None, None]:
+        """
+        Turns complete lines of output into partial_output items, and a completion item for the
+        line the marker command printed. The terminal echo of the command carries the marker too,
+        its lines are partial_output flagged with `command_echo`.
+        Terminal escape codes are stripped, lines holding nothing else are dropped.
+        """
+        for raw_line in lines:
+            line = strip_ansi(raw_line)
+            if raw_line.strip() and not line.strip():
+                continue  # e.g. bash switching bracketed paste mode off
+            command_echo = bool(re.search(self.echo_marker_patterns, line))
+            matches = re.findall(self.marker_pattern, line)
+            cleaned_line = re.sub(self.echo_marker_patterns, "", line).strip()
+            cleaned_line = re.sub(self.marker_pattern, "", cleaned_line).strip()
+            if self.marker and self.marker in line and not command_echo:
+                self.status = self.PipeStatus.COMPLETED
+                yield {
+                    "type": "completion",
+                    "content": cleaned_line,
+                    "command_marker_id": self.marker
+                }
+            else:
+                yield {
+                    "type": "partial_output",
+                    "content": cleaned_line,
+                    "marker_id": matches[0] if matches else self.marker,
+                    "command_echo": command_echo
+                }
+
+    def discard_queued_output(self):
+        """Empties the output queue (the output stays in the buffer read_until_marker reads)."""
         while True:
             try:
-                chunk = self._output_queue.get(timeout=timeout)
-                if self.marker and self.marker in chunk:
-                    cleaned_chunk = re.sub(self.marker_pattern, "", chunk).strip()
-                    self.status = self.PipeStatus.COMPLETED
-                    yield {
-                        "type": "completion",
-                        "content": cleaned_chunk,
-                        "command_marker_id": self.marker
-                    }
-                elif chunk:
-                    for line in str(chunk).splitlines():
-                        matches = re.findall(self.marker_pattern, line)
-                        cleaned_line = re.sub(self.echo_marker_patterns, "", line).strip()
-                        cleaned_line = re.sub(self.marker_pattern, "", cleaned_line).strip()
-                        yield {
-                            "type": "partial_output",
-                            "content": cleaned_line,
-                            "marker_id": matches[0] if matches else self.marker
-                        }
+                self._output_queue.get_nowait()
             except queue.Empty:
-                if not self._reader_thread.is_alive():
-                    break
+                break
+
+    async def astream_output(self,
+                            timeout:Optional[float] = None,
+                            overall_timeout: Optional[float] = None) -> AsyncGenerator[dict, None]:
+        """
+        Async generator yielding chunks as they arrive, without blocking the event loop:
+        the reader thread wakes it up through the loop, `timeout` only bounds each wait.
+        Stops when the shell exits or after `overall_timeout` seconds.
+        Applies backpressure to the command while it runs (see _wait_for_room).
+        """
+        timeout = timeout or 0.2
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + overall_timeout if overall_timeout else None
+        waiter = (loop, asyncio.Event())
+        arrived = waiter[1]
+        self._output_waiter = waiter
+        pending = ""
+        try:
+            while deadline is None or loop.time() < deadline:
+                try:
+                    chunk = self._output_queue.get_nowait()
+                except queue.Empty:
+                    if not self._reader_thread.is_alive():
+                        break
+                    arrived.clear()
+                    # the reader may have queued a chunk between get_nowait and clear
+                    if self._output_queue.empty():
+                        wait = timeout if deadline is None else max(0.0, min(timeout, deadline - loop.time()))
+                        try:
+                            await asyncio.wait_for(arrived.wait(), wait)
+                        except asyncio.TimeoutError:
+                            pass
+                    continue
+                if not self._output_drained.is_set() and self._output_queue.qsize() <= SHELL_STREAM_MAX_CHUNKS // 2:
+                    self._output_drained.set()
+                lines, pending = self._complete_lines(pending, chunk)
+                for item in self._output_items(lines):
+                    yield item
+            # stopped before the next newline, the rest is output too
+            if pending:
+                for item in self._output_items([pending]):
+                    yield item
+        finally:
+            # a stream left with break is finalized late, after the next one may have started
+            if self._output_waiter is waiter:
+                self._output_waiter = None
+                self._output_drained.set()
 
     def stream_output(self, timeout:Optional[float] = None, overall_timeout=5) -> Generator[dict, None, None]:
         """Generator yielding chunks as they arrive (for Redis/pub-sub)."""
         timeout = timeout or 0.2
         start_time = time.time()
         now = time.time()
+        pending = ""
         while now - start_time < overall_timeout:
             now = time.time()
             try:
                 chunk = self._output_queue.get(timeout=timeout)
-                if self.marker and self.marker in chunk:
-                    cleaned_chunk = re.sub(self.echo_marker_patterns, "", chunk).strip()
-                    cleaned_chunk = re.sub(self.marker_pattern, "", cleaned_chunk).strip()
-                    self.status = self.PipeStatus.COMPLETED
-                    yield {
-                        "type": "completion",
-                        "content": cleaned_chunk,
-                        "command_marker_id": self.marker
-                    }
-                    # break
-                elif chunk:
-                    for line in str(chunk).splitlines():
-                        matches = re.findall(self.marker_pattern, line)
-                        cleaned_line = re.sub(self.echo_marker_patterns, "", line).strip()
-                        cleaned_line = re.sub(self.marker_pattern, "", cleaned_line).strip()
-                        yield {
-                            "type": "partial_output",
-                            "content": cleaned_line,
-                            "marker_id": matches[0] if matches else self.marker
-                        }
+                lines, pending = self._complete_lines(pending, chunk)
+                yield from self._output_items(lines)
             except queue.Empty:
                 if not self._reader_thread.is_alive():
                     break
+        if pending:
+            yield from self._output_items([pending])
     
     # ----------------------
     # Blocking read until marker appears
@@ -504,7 +598,7 @@ class CMDTools:
         pipe = PXPIPE_REGISTRY.get(pipe_id)
         if not pipe:
             raise ValueError(f"pipe with {pipe_id=} not found!")
-        yield pipe.stream_output(timeout=timeout)
+        yield from pipe.stream_output(timeout=timeout)
     
     @staticmethod
     async def aread_output_streaming(pipe_id: str, timeout=5) -> AsyncGenerator:
@@ -534,8 +628,63 @@ class CMDTools:
         pipe = PXPIPE_REGISTRY.get(pipe_id)
         if not pipe:
             raise ValueError(f"pipe with {pipe_id=} not found!")
-        yield pipe.astream_output(timeout=timeout)
-        
+        async for item in pipe.astream_output(timeout=timeout):
+            yield item
+
+    @staticmethod
+    async def stream_command(pipe_id: str, command, shell_type=ShellTypes.BASH, overall_timeout: float = 60) -> str:
+        """
+        Execute a command within an existing shell session and stream its output live
+        to the user until it completes, then return the collected output.
+
+        Prefer this over `run_command` + `read_output` for long running commands
+        (builds, installs, migrations), the user sees every line as it is printed.
+
+        Args:
+            pipe_id (str): The ID of the target shell session.
+            command (str): The shell command to execute.
+            shell_type (str, optional): The type of shell the command runs in,
+                as for `run_command`. Default is "BASH".
+            overall_timeout (float, optional): Maximum time (in seconds) to stream.
+                Default is 60; the command keeps running after it.
+
+        Returns:
+            str: The output of the command.
+
+        Raises:
+            ValueError: If the session with `pipe_id` does not exist.
+
+        Example:
+            ```python
+            output = await stream_command(pipe_id, "docker build -t app .")
+            ```
+        """
+        pipe = PXPIPE_REGISTRY.get(pipe_id)
+        if not pipe:
+            raise ValueError(f"pipe with {pipe_id=} not found!")
+        # output left from earlier commands would be shown as this one's
+        pipe.discard_queued_output()
+        # pexpect sleeps delaybeforesend in every send
+        await asyncio.to_thread(pipe.write, command=command, shell_type=shell_type)
+        factory = current_output_stream.get()
+        lines = []
+        async with (
+            factory(f"$ {command}") if factory else nullcontext() as output,
+            aclosing(pipe.astream_output(overall_timeout=overall_timeout)) as items,
+        ):
+            async for item in items:
+                if item["type"] == "partial_output" and item["command_echo"]:
+                    continue
+                # the marker line holds the last output when it doesn't end with a newline
+                if item["content"] or item["type"] == "partial_output":
+                    lines.append(item["content"])
+                    if output is not None:
+                        # awaiting the view is the backpressure of a slow client
+                        await output.push(item["content"] + "\n")
+                if item["type"] == "completion":
+                    break
+        return "\n".join(lines).strip()
+
     @staticmethod
     def check_pipe_status(pipe_id:str) -> str:
         """
@@ -0,0 +1,330 @@
+import time
+import queue
+import sqlite3
+import calendar
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from core.schemas import TaskOutput
+from core.settings import (
+    DOCKER_LOG_INDEX_DB,
+    DOCKER_LOG_RETENTION_SECONDS,
+    DOCKER_LOG_MAX_LINES_PER_CONTAINER,
+)
+from devops_agents.docker.utils.manager import DockerManager
+
+
+SCHEMA = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    """CREATE TABLE IF NOT EXISTS log_lines (
+        id INTEGER PRIMARY KEY,
+        container TEXT NOT NULL,
+        ts REAL NOT NULL,
+        line TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS log_lines_container_ts ON log_lines (container, ts)",
+    "CREATE INDEX IF NOT EXISTS log_lines_ts ON log_lines (ts)",
+    # external content table: the text is stored once, in log_lines
+    """CREATE VIRTUAL TABLE IF NOT EXISTS log_fts USING fts5 (
+        line, content='log_lines', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS log_lines_insert AFTER INSERT ON log_lines BEGIN
+        INSERT INTO log_fts (rowid, line) VALUES (new.id, new.line);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS log_lines_delete AFTER DELETE ON log_lines BEGIN
+        INSERT INTO log_fts (log_fts, rowid, line) VALUES ('delete', old.id, old.line);
+    END""",
+)
+FTS_OPERATORS = {"AND", "OR", "NOT"}
+
+
+def parse_log_line_ns(raw: bytes) -> Tuple[int, str]:
+    """Splits a `docker logs --timestamps` line (RFC 3339 with nanoseconds) into epoch nanoseconds and text."""
+    text = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+    stamp, _, line = text.partition(" ")
+    try:
+        seconds, _, fraction = stamp.rstrip("Z").partition(".")
+        ts = calendar.timegm(time.strptime(seconds, "%Y-%m-%dT%H:%M:%S")) * 10 ** 9 + int(f"{fraction:0<9}"[:9])
+    except ValueError:
+        return time.time_ns(), text
+    return ts, line
+
+
+def parse_log_line(raw: bytes) -> Tuple[float, str]:
+    """Same as parse_log_line_ns, in epoch seconds (a float keeps about microseconds)."""
+    ts, line = parse_log_line_ns(raw)
+    return ts / 10 ** 9, line
+
+
+def fts_query(text: str) -> str:
+    """
+    Free text to an FTS5 query: every word must appear, AND/OR/NOT are kept as operators
+    and a trailing * searches by prefix. Quoting keeps punctuation from being read as syntax.
+    """
+    terms = []
+    for word in text.split():
+        if word in FTS_OPERATORS:
+            # an operator needs a term on both sides
+            if terms and terms[-1] not in FTS_OPERATORS:
+                terms.append(word)
+        elif word.endswith("*") and len(word) > 1:
+            terms.append('"' + word[:-1].replace('"', '""') + '"*')
+        else:
+            terms.append('"' + word.replace('"', '""') + '"')
+    if terms and terms[-1] in FTS_OPERATORS:
+        terms.pop()
+    return " ".join(terms)
+
+
+class ContainerLogIndex:
+    """
+    Tails the logs of running containers through the engine API into a SQLite FTS5 index.
+
+    One follow stream per container feeds a single writer thread, which inserts in batches
+    and enforces the retention limits (age and lines per container). Tails resume from the
+    newest indexed line, so restarts don't index a line twice.
+
+    Example usage:
+        index = ContainerLogIndex("logs.sqlite3").start()
+        index.search("connection refused", container="api-*", since_minutes=10)
+    """
+    def __init__(self,
+                path=DOCKER_LOG_INDEX_DB,
+                retention_seconds: float = DOCKER_LOG_RETENTION_SECONDS,
+                max_lines_per_container: int = DOCKER_LOG_MAX_LINES_PER_CONTAINER,
+                batch_size: int = 1000,
+                flush_interval: float = 0.2,
+                retention_interval: float = 60):
+        self.path = str(path)
+        self.retention_seconds = retention_seconds
+        self.max_lines_per_container = max_lines_per_container
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_interval = retention_interval
+        self.lines: "queue.Queue[Tuple[str, float, str]]" = queue.Queue(maxsize=100_000)
+        self.tails: Dict[str, object] = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.indexed = 0
+        self.running = False
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with self.connect() as connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+
+    def connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        connection.execute("PRAGMA busy_timeout=5000")
+        return connection
+
+    # ----------------------
+    # Ingestion
+    # ----------------------
+    def start(self):
+        self.stopped.clear()
+        self.running = True
+        threading.Thread(target=self.write_loop, daemon=True).start()
+        self.refresh()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.running = False
+        with self.lock:
+            streams, self.tails = [s for s in self.tails.values() if s is not None], {}
+        for stream in streams:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def refresh(self):
+        """Starts tailing every running container that is not tailed yet."""
+        for container in DockerManager._get_docker_client().containers.list(sparse=True):
+            name = container.attrs["Names"][0].lstrip("/")
+            with self.lock:
+                if name in self.tails:
+                    continue
+                self.tails[name] = None  # reserved, opened by the thread
+            threading.Thread(target=self.tail, args=(container, name), daemon=True).start()
+
+    def newest(self, container_name: str) -> float:
+        with self.connect() as connection:
+            row = connection.execute(
+                "SELECT max(ts) FROM log_lines WHERE container = ?", (container_name,)
+            ).fetchone()
+        return row[0] or 0.0
+
+    def tail(self, container, name: str):
+        try:
+            newest = self.newest(name)
+            stream = container.logs(stream=True, follow=True, timestamps=True, since=newest or None)
+            with self.lock:
+                if self.stopped.is_set():
+                    return stream.close()
+                self.tails[name] = stream
+            # tty containers stream a byte at a time and frames of the others may hold
+            # several lines or part of one: lines are cut at newlines, the rest carried over
+            pending = bytearray()
+            for chunk in stream:
+                pending += chunk
+                if b"\n" not in chunk:
+                    continue
+                *lines, rest = pending.split(b"\n")
+                pending = bytearray(rest)
+                for raw in lines:
+                    self.add_line(name, raw, newest)
+            if pending:
+                self.add_line(name, pending, newest)
+        except Exception:
+            pass  # container stopped or stream closed
+        finally:
+            with self.lock:
+                self.tails.pop(name, None)
+
+    def add_line(self, name: str, raw: bytes, newest: float):
+        ts, line = parse_log_line(raw)
+        # `since` has whole second resolution on older engines
+        if ts > newest:
+            self.lines.put((name, ts, line))
+
+    def write_loop(self):
+        connection = self.connect()
+        last_retention = time.monotonic()
+        try:
+            while not self.stopped.is_set():
+                batch = []
+                try:
+                    batch.append(self.lines.get(timeout=self.flush_interval))
+                    while len(batch) < self.batch_size:
+                        batch.append(self.lines.get_nowait())
+                except queue.Empty:
+                    pass
+                if batch:
+                    with connection:
+                        connection.executemany("INSERT INTO log_lines (container, ts, line) VALUES (?, ?, ?)", batch)
+                    self.indexed += len(batch)
+                if time.monotonic() - last_retention > self.retention_interval:
+                    self.apply_retention(connection)
+                    last_retention = time.monotonic()
+        finally:
+            connection.close()
+
+    def apply_retention(self, connection: Optional[sqlite3.Connection] = None) -> int:
+        """Deletes lines older than the retention and the oldest lines of containers over their limit."""
+        connection = connection or self.connect()
+        with connection:
+            deleted = connection.execute(
+                "DELETE FROM log_lines WHERE ts < ?", (time.time() - self.retention_seconds,)
+            ).rowcount
+            over_limit = connection.execute(
+                "SELECT container FROM log_lines GROUP BY container HAVING count(*) > ?",
+                (self.max_lines_per_container,)
+            ).fetchall()
+            for (container,) in over_limit:
+                deleted += connection.execute(
+                    "DELETE FROM log_lines WHERE container = ? AND id <= ("
+                    "SELECT id FROM log_lines WHERE container = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (container, container, self.max_lines_per_container)
+                ).rowcount
+        return deleted
+
+    def flush(self, timeout: float = 5.0):
+        """Waits until the queued lines are written (for tests and benchmarks)."""
+        deadline = time.monotonic() + timeout
+        while not self.lines.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(self.flush_interval)
+
+    # ----------------------
+    # Search
+    # ----------------------
+    def search(self,
+                query: str = "",
+                container: str = "*",
+                since_minutes: Optional[float] = None,
+                limit: int = 50) -> List[Tuple[str, float, str]]:
+        """
+        Newest `limit` lines matching `query` (see fts_query) in containers matching the
+        glob `container`, within the last `since_minutes`. An empty query matches every line.
+        """
+        conditions, params = ["l.container GLOB ?"], [container or "*"]
+        since = time.time() - since_minutes * 60 if since_minutes else None
+        if since:
+            conditions.append("l.ts >= ?")
+            params.append(since)
+        with self.connect() as connection:
+            if not query.strip():
+                sql = f"SELECT l.container, l.ts, l.line FROM log_lines l WHERE {' AND '.join(conditions)} ORDER BY l.ts DESC LIMIT ?"
+                return connection.execute(sql, (*params, limit)).fetchall()
+            match, match_params = ["log_fts MATCH ?"], [fts_query(query)]
+            if since:
+                # ids grow with time: a rowid bound lets FTS5 skip the older part of every posting list
+                # (without the hint the planner walks the primary key looking for min(id))
+                first_id = connection.execute(
+                    "SELECT min(id) FROM log_lines INDEXED BY log_lines_ts WHERE ts >= ?", (since,)
+                ).fetchone()[0]
+                match.append("log_fts.rowid >= ?")
+                match_params.append(first_id or 0)
+            sql = (
+                "SELECT l.container, l.ts, l.line FROM log_fts JOIN log_lines l ON l.id = log_fts.rowid "
+                f"WHERE {' AND '.join(match + conditions)} ORDER BY l.ts DESC LIMIT ?"
+            )
+            return connection.execute(sql, (*match_params, *params, limit)).fetchall()
+
+    def stats(self) -> dict:
+        with self.connect() as connection:
+            lines, containers = connection.execute("SELECT count(*), count(DISTINCT container) FROM log_lines").fetchone()
+        return {"lines": lines, "containers": containers, "tails": len(self.tails), "queued": self.lines.qsize()}
+
+
+log_index: Optional[ContainerLogIndex] = None
+_log_index_lock = threading.Lock()
+
+
+def get_log_index() -> ContainerLogIndex:
+    """The shared index, started on first use after letting the tails backfill existing logs."""
+    global log_index
+    with _log_index_lock:
+        if log_index is None:
+            log_index = ContainerLogIndex().start()
+            time.sleep(0.5)
+            log_index.flush()
+        else:
+            log_index.refresh()
+        return log_index
+
+
+def search_container_logs(query: str = "",
+                        container: str = "*",
+                        since_minutes: Optional[float] = None,
+                        limit: int = 50) -> TaskOutput:
+    """
+    Searches the indexed logs of running containers and returns only the matching lines.
+    query: words that must all appear (AND/OR/NOT operators, `word*` for prefixes), empty for all lines
+    container: container name or glob, e.g. "api-*"
+    since_minutes: only lines from the last minutes
+    Indexing starts on the first call and follows new lines continuously.
+    """
+    try:
+        index = get_log_index()
+        started = time.perf_counter()
+        rows = index.search(query, container, since_minutes, limit + 1)
+        elapsed = (time.perf_counter() - started) * 1000
+    except sqlite3.OperationalError as e:
+        return TaskOutput(success=False, output="", error=f"invalid search: {e}")
+    except Exception as e:
+        return TaskOutput(success=False, output="", error=str(e))
+    more = len(rows) > limit
+    rows = rows[:limit]
+    header = f"{len(rows)}{'+' if more else ''} matching lines ({elapsed:.0f} ms)"
+    if more:
+        header += f", showing the newest {limit}"
+    lines = [
+        f"{time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(ts))} {name}: {line}"
+        for name, ts, line in reversed(rows)
+    ]
+    return TaskOutput(success=True, output="\n".join([header, *lines]))
@@ -1,16 +1,20 @@
 import io
+import os
 import uuid
 import time
 import queue
+import codecs
 import docker
 import signal
 import platform
 import subprocess
 import threading
 from enum import StrEnum
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Literal, Union
 from core.schemas import TaskOutput
+from core.settings import DOCKER_LIST_PAGE_SIZE
 from docker.errors import DockerException, NotFound
+from docker.utils.socket import frames_iter
 
 
 
@@ -44,27 +48,42 @@ class DockerTaskRunner:
                 self.sub_commands.extend(sb.split())
         
         if self.use_sdk:
-            if platform.system() == "Windows":
+            # honour DOCKER_HOST like docker.from_env() does for DockerManager
+            if os.environ.get("DOCKER_HOST"):
+                base_url = os.environ["DOCKER_HOST"]
+            elif platform.system() == "Windows":
                 base_url = "npipe:////./pipe/docker_engine"
             else:
                 base_url = "unix://var/run/docker.sock"
 
             self.client = docker.DockerClient(base_url=base_url)
             self.api_client = docker.APIClient(base_url=base_url)
+            # pids reported by the daemon are only ours to kill when it runs on this machine
+            self._local_daemon = base_url.startswith("unix://")
             
             self.exec_id = None
+            # attached connection of the exec, its terminal for interrupt
+            self._exec_socket = None
+            self._output: List[str] = []
         else:
             self.proc: Optional[subprocess.Popen] = None
 
     def stream_sdk_logs(self):
-        logs = self.api_client.exec_start(self.exec_id, stream=True, demux=True)
-        for stdout, stderr in logs:
-            if self._stop_flag:
-                break
-            if stdout:
-                yield stdout.decode()
-            if stderr:
-                yield stderr.decode()
+        # a tty exec sends one raw stream, characters may be split between reads
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        try:
+            # read to the end of the exec, interrupt goes through the same connection
+            for _, data in frames_iter(self._exec_socket, tty=True):
+                if text := decoder.decode(data):
+                    yield text
+        except OSError:
+            pass  # connection shut down by interrupt
+        if text := decoder.decode(b"", final=True):
+            yield text
+
+    def collect_sdk_logs(self):
+        for chunk in self.stream_sdk_logs():
+            self._output.append(chunk)
 
     def stream_subprocess_logs(self):
         """
@@ -99,14 +118,18 @@ class DockerTaskRunner:
         """Start the task and stream logs."""
         if self.use_sdk:
             container = self.client.containers.get(self.container_name)
+            # without stdin the daemon drops what interrupt types into the terminal
             self.exec_id = self.api_client.exec_create(
-                container.id, cmd=self.sub_commands, tty=True
+                container.id, cmd=self.sub_commands, stdin=True, tty=True
             )['Id']
-            self.thread = threading.Thread(target=self.stream_sdk_logs)
+            self._exec_socket = self.api_client.exec_start(self.exec_id, tty=True, socket=True)
+            self.thread = threading.Thread(target=self.collect_sdk_logs)
             self.thread.start()
             self.status = TaskStatus.PROCESSING
             self.thread.join()
-            self.status = TaskStatus.DONE
+            self._exec_socket.close()
+            exit_code = self.api_client.exec_inspect(self.exec_id).get('ExitCode')
+            self.status = TaskStatus.DONE if exit_code in (0, None) else TaskStatus.FAILED
         else:
             cmd = ["docker", "exec", "-it", self.container_name] + self.sub_commands
             self.proc = subprocess.Popen(
@@ -121,32 +144,29 @@ class DockerTaskRunner:
             self.status = TaskStatus.DONE if status_code ==0 else TaskStatus.FAILED
             
     def get_output(self):
-        streamer = self.stream_sdk_logs if self.use_sdk else self.stream_subprocess_logs
-        return "".join(list(streamer()))            
+        if self.use_sdk:
+            # output collected by the running exec, starting it again would rerun the command
+            return "".join(self._output)
+        return "".join(list(self.stream_subprocess_logs()))
 
 
     def interrupt(self, force_timeout: int = 3):
         """Interrupt the running task with graceful stop, then optional force kill."""
         self._stop_flag = True
         stopped = True
-        if self.use_sdk and self.exec_id:
+        if self.use_sdk and self._exec_socket is not None:
+            # the engine API has no endpoint to signal an exec: Ctrl+C typed into its tty
+            # makes the terminal send SIGINT to the foreground process
             print("⛔ Sending SIGINT to SDK exec...")
+            connection = getattr(self._exec_socket, "_sock", self._exec_socket)
             try:
-                # Graceful stop
-                self.api_client._post(f"/exec/{self.exec_id}/kill", data={"signal": "SIGINT"})
-                # Wait for process to exit
-                start = time.time()
-                while time.time() - start < force_timeout:
-                    # Check if exec is still running
-                    exec_inspect = self.api_client.exec_inspect(self.exec_id)
-                    if not exec_inspect['Running']:
-                        print("✅ Process exited after SIGINT")
-                        return stopped
-                    time.sleep(0.1)
-
-                # Force kill if still running
-                print("💀 SIGINT did not stop the process, sending SIGKILL...")
-                self.api_client._post(f"/exec/{self.exec_id}/kill", data={"signal": "SIGKILL"})
+                connection.sendall(b"\x03")
+                if self._wait_exec_exit(force_timeout):
+                    print("✅ Process exited after SIGINT")
+                    return stopped
+
+                print("💀 SIGINT did not stop the process, force killing...")
+                stopped = self._kill_exec() and self._wait_exec_exit(force_timeout)
             except Exception as e:
                 stopped = False
                 print("Error interrupting exec:", e)
@@ -167,6 +187,58 @@ class DockerTaskRunner:
                 print("Error interrupting subprocess:", e)
         return stopped
 
+    def _kill_exec(self) -> bool:
+        """
+        SIGKILL the exec's process through the pid from exec_inspect. That pid is in the
+        namespace of the daemon's host, so this only works with a daemon on this machine.
+        """
+        pid = self.api_client.exec_inspect(self.exec_id).get('Pid')
+        if not pid or not self._local_daemon:
+            print("Cannot kill exec: its process is not on this host")
+            return False
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass  # exited meanwhile
+        except PermissionError as e:
+            print("Cannot kill exec:", e)
+            return False
+        return True
+
+    def _wait_exec_exit(self, timeout: float) -> bool:
+        start = time.time()
+        while time.time() - start < timeout:
+            if not self.api_client.exec_inspect(self.exec_id)['Running']:
+                return True
+            time.sleep(0.1)
+        return False
+
+
+
+def docker_filters(**filters) -> dict:
+    """Filters for the engine API, the ones left as None (or empty) are not sent."""
+    return {key: value for key, value in filters.items() if value not in (None, "", [])}
+
+
+def format_table(columns: List[str], rows: List[list]) -> str:
+    lines = ["| " + " | ".join(columns) + " |", "|" + "---|" * len(columns)]
+    lines += ["| " + " | ".join(str(value).replace("|", "\\|") for value in row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+def format_ports(ports: List[dict]) -> str:
+    published = sorted({
+        f"{port['PublicPort']}->{port['PrivatePort']}/{port['Type']}" if port.get("PublicPort")
+        else f"{port['PrivatePort']}/{port['Type']}"
+        for port in ports or []
+    })
+    return ", ".join(published)
+
+
+def page_footer(rows: List[dict], more: bool, kind: str) -> str:
+    if not more:
+        return f"{len(rows)} {kind}"
+    return f"{len(rows)} {kind}, more with cursor=\"{rows[-1]['Id'].split(':')[-1][:12]}\""
 
 
 class DockerManager:
@@ -206,17 +278,40 @@ class DockerManager:
             return TaskOutput(success=False, output="", error=str(e))
 
     @staticmethod
-    def list_available_containers(all: bool = True) -> TaskOutput:
-        """List all containers."""
+    def list_available_containers(all: bool = True,
+                                name: Optional[str] = None,
+                                label: Optional[Union[str, List[str]]] = None,
+                                status: Optional[Literal["created", "restarting", "running", "removing", "paused", "exited", "dead"]] = None,
+                                ancestor: Optional[str] = None,
+                                limit: int = DOCKER_LIST_PAGE_SIZE,
+                                cursor: Optional[str] = None) -> TaskOutput:
+        """
+        Lists containers as a table, newest first, filtered by the engine.
+        name: part of the container name (regex), label: "key" or "key=value",
+        ancestor: image the containers run, cursor: value given under the previous page.
+        """
+        if not all and not status:
+            # `limit` and `before` make the engine include stopped containers
+            status = "running"
         try:
-            containers = DockerManager._get_docker_client().containers.list(all=all)
-            output = [
-                {"id": c.short_id, "name": c.name, "status": c.status, "image": c.image.tags}
-                for c in containers
-            ]
-            return TaskOutput(success=True, output=str(output))
+            containers = DockerManager._get_docker_client().api.containers(
+                all=True,
+                limit=limit + 1,
+                filters=docker_filters(name=name, label=label, status=status, ancestor=ancestor, before=cursor),
+            )
         except Exception as e:
             return TaskOutput(success=False, output="", error=str(e))
+        more, containers = len(containers) > limit, containers[:limit]
+        table = format_table(
+            ["name", "id", "image", "state", "status", "ports"],
+            [
+                [c["Names"][0].lstrip("/") if c.get("Names") else "", c["Id"][:12],
+                 c["Image"][7:19] if c["Image"].startswith("sha256:") else c["Image"],
+                 c["State"], c["Status"], format_ports(c.get("Ports"))]
+                for c in containers
+            ]
+        )
+        return TaskOutput(success=True, output=f"{table}\n{page_footer(containers, more, 'containers')}")
 
     @staticmethod
     def run_task(container_name: str, command: List[str], use_sdk: bool = True) -> str:
@@ -269,6 +364,21 @@ class DockerManager:
     def create_container(image, name, *args, **kwargs):
         return DockerManager._get_docker_client().containers.create(image=image, name=name, *args, **kwargs)
     
+    @staticmethod
+    def commit_container(container_name: str, repository: str, tag: Optional[str] = None, pause: bool = True) -> TaskOutput:
+        """
+        Save the filesystem of a container as a new image (docker commit).
+        Data kept in volumes is not part of the image.
+        """
+        try:
+            container = DockerManager._get_docker_client().containers.get(container_name)
+            image = container.commit(repository=repository, tag=tag, pause=pause)
+            return TaskOutput(success=True, output=f"✅ Container '{container_name}' saved as {image.tags or image.short_id}")
+        except NotFound:
+            return TaskOutput(success=False, output="", error=f"Container '{container_name}' not found")
+        except Exception as e:
+            return TaskOutput(success=False, output="", error=str(e))
+
     @staticmethod
     def docker_pull_image(image: str) -> str:
         """
@@ -287,16 +397,46 @@ class DockerManager:
             return f"❌ Failed to pull image '{image}': {str(e)}"
         
     @staticmethod
-    def get_list_of_images(repository_name:Optional[str]=None, all=True):
+    def get_list_of_images(repository_name: Optional[str] = None,
+                        all: bool = False,
+                        label: Optional[Union[str, List[str]]] = None,
+                        dangling: Optional[bool] = None,
+                        limit: int = DOCKER_LIST_PAGE_SIZE,
+                        cursor: Optional[str] = None):
         """
-        gets list of images. if repository_name is specified it is used as a filter
+        gets list of images as a table, newest first. if repository_name is specified it is used as a filter.
+        all: include intermediate layers, label: "key" or "key=value",
+        dangling: only (True) or no (False) untagged images, cursor: value given under the previous page
         """
         try:
-            images = DockerManager._get_docker_client().images.list(name=repository_name, all=all)
-            return f"✅ Successfully list of images: {[str(images)]}"
+            images = DockerManager._get_docker_client().api.images(
+                name=repository_name,
+                all=all,
+                filters=docker_filters(label=label, dangling=dangling),
+            )
         except Exception as e:
             return f"❌ Failed to fetch images lists': {str(e)}"
-        
+        # the engine has no limit for images (and its `before` filter skips images created in the
+        # same second), the page is cut from the summaries, which are small
+        images = sorted(images, key=lambda image: (image["Created"], image["Id"]), reverse=True)
+        if cursor:
+            position = next((i for i, image in enumerate(images) if image["Id"].split(":")[-1].startswith(cursor)), None)
+            if position is None:
+                return f"❌ Failed to fetch images lists': cursor {cursor} not found, the image was removed"
+            images = images[position + 1:]
+        more, images = len(images) > limit, images[:limit]
+        table = format_table(
+            ["tags", "id", "size", "created"],
+            [
+                [", ".join(image.get("RepoTags") or []) or "<none>",
+                 image["Id"].split(":")[-1][:12],
+                 f"{image['Size'] / 1e6:.1f} MB",
+                 time.strftime("%Y-%m-%d %H:%M", time.gmtime(image["Created"]))]
+                for image in images
+            ]
+        )
+        return f"✅ Images:\n{table}\n{page_footer(images, more, 'images')}"
+
     @staticmethod
     def start_container(container_name: str) -> TaskOutput:
         """
@@ -0,0 +1,185 @@
+import time
+import threading
+import contextvars
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from docker.utils import parse_repository_tag
+from core.schemas import TaskOutput
+from core.settings import DOCKER_PULL_MAX_PARALLEL, DOCKER_PULL_PROGRESS_INTERVAL
+from devops_agents.docker.utils.manager import DockerManager
+
+
+# per-request callback receiving the rendered progress of bulk pulls, set by the caller (UI)
+current_pull_progress: ContextVar[Optional[Callable[[str], None]]] = ContextVar("current_pull_progress", default=None)
+
+LAYER_STATUSES = {
+    "Pulling fs layer", "Waiting", "Downloading", "Verifying Checksum",
+    "Download complete", "Extracting", "Pull complete", "Already exists",
+}
+
+
+def normalize_image_ref(image: str) -> str:
+    """'nginx' and 'docker.io/library/nginx:latest' name the same image."""
+    repository, tag = parse_repository_tag(image.strip())
+    for prefix in ("docker.io/", "index.docker.io/", "registry-1.docker.io/"):
+        if repository.startswith(prefix):
+            repository = repository[len(prefix):]
+    if repository.startswith("library/"):
+        repository = repository[len("library/"):]
+    if tag is None:
+        return f"{repository}:latest"
+    return f"{repository}@{tag}" if tag.startswith("sha256:") else f"{repository}:{tag}"
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+
+
+class ImagePull:
+    """State of one image pull, folded from the engine's JSON progress messages."""
+    def __init__(self, image: str):
+        self.image = image
+        self.status = "waiting"
+        self.error: Optional[str] = None
+        self.layers: Dict[str, dict] = {}
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def update(self, message: dict):
+        if message.get("error"):
+            self.status = "failed"
+            self.error = message["error"]
+            return
+        status, layer_id = message.get("status", ""), message.get("id")
+        if not layer_id or status not in LAYER_STATUSES:
+            return
+        layer = self.layers.setdefault(layer_id, {"status": status, "current": 0, "total": 0, "reused": False})
+        layer["status"] = status
+        if status == "Downloading":
+            detail = message.get("progressDetail") or {}
+            layer["current"] = detail.get("current", layer["current"])
+            layer["total"] = detail.get("total", layer["total"])
+        elif status in ("Verifying Checksum", "Download complete"):
+            layer["current"] = layer["total"]
+        elif status == "Already exists":
+            layer["reused"] = True
+
+    @property
+    def duration(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def line(self) -> str:
+        downloaded = sum(layer["current"] for layer in self.layers.values())
+        total = sum(layer["total"] for layer in self.layers.values())
+        if self.status == "failed":
+            return f"❌ {self.image}: {self.error}"
+        if self.status == "done":
+            return f"✅ {self.image}: {len(self.layers)} layers, {format_bytes(downloaded)} in {self.duration:.1f}s"
+        if self.status == "waiting":
+            return f"⏳ {self.image}: queued"
+        if not self.layers:
+            return f"⬇️ {self.image}: resolving"
+        completed = sum(1 for layer in self.layers.values() if layer["status"] in ("Pull complete", "Already exists"))
+        size = f", {format_bytes(downloaded)}/{format_bytes(total)}" if total else ""
+        return f"⬇️ {self.image}: {completed}/{len(self.layers)} layers{size}"
+
+
+class PullProgress:
+    """
+    Renders the progress of every pull and hands it to `hook` at most every `interval` seconds.
+    The hook runs in the context of the caller of pull_images, not in the pool threads.
+    """
+    def __init__(self,
+                pulls: List[ImagePull],
+                hook: Optional[Callable[[str], None]],
+                interval: float = DOCKER_PULL_PROGRESS_INTERVAL):
+        self.pulls = pulls
+        self.hook = hook
+        self.interval = interval
+        self.context = contextvars.copy_context()
+        self.lock = threading.Lock()
+        self.last_report = 0.0
+
+    def render(self) -> str:
+        return "\n".join(pull.line() for pull in self.pulls)
+
+    def report(self, force: bool = False):
+        if not self.hook:
+            return
+        with self.lock:
+            now = time.monotonic()
+            if not force and now - self.last_report < self.interval:
+                return
+            self.last_report = now
+            try:
+                # serialized by the lock, a context can't be entered by two threads at once
+                self.context.run(self.hook, self.render())
+            except Exception as e:
+                print(f"pull progress hook failed: {e}")
+
+
+def summarize(pulls: List[ImagePull], duration: float) -> TaskOutput:
+    # a layer shared by several images is downloaded once by the daemon, count it once
+    layers: Dict[str, dict] = {}
+    for pull in pulls:
+        for layer_id, layer in pull.layers.items():
+            seen = layers.setdefault(layer_id, {"bytes": 0, "reused": True, "images": 0})
+            seen["bytes"] = max(seen["bytes"], layer["current"])
+            seen["reused"] = seen["reused"] and layer["reused"]
+            seen["images"] += 1
+    transferred = sum(layer["bytes"] for layer in layers.values() if not layer["reused"])
+    shared = sum(1 for layer in layers.values() if layer["images"] > 1)
+    present = sum(1 for layer in layers.values() if layer["reused"])
+    failed = [pull for pull in pulls if pull.status != "done"]
+    header = (
+        f"{'✅' if not failed else '⚠️'} Pulled {len(pulls) - len(failed)}/{len(pulls)} images in {duration:.1f}s, "
+        f"{format_bytes(transferred)} transferred ({len(layers)} layers: {shared} shared, {present} already present)"
+    )
+    output = header + "\n" + "\n".join(pull.line() for pull in pulls)
+    if failed:
+        return TaskOutput(
+            success=False,
+            output=output,
+            error="; ".join(f"{pull.image}: {pull.error}" for pull in failed)
+        )
+    return TaskOutput(success=True, output=output)
+
+
+def pull_images(images: List[str], max_parallel: int = DOCKER_PULL_MAX_PARALLEL) -> TaskOutput:
+    """
+    Pulls several Docker images concurrently, at most `max_parallel` at a time.
+    Duplicate references ('nginx' and 'nginx:latest') are pulled once.
+    Returns per image status and the total bytes transferred and duration.
+    """
+    pulls = [ImagePull(image) for image in dict.fromkeys(normalize_image_ref(image) for image in images)]
+    progress = PullProgress(pulls, current_pull_progress.get())
+    api = DockerManager._get_docker_client().api
+
+    def pull(image_pull: ImagePull):
+        image_pull.started = time.monotonic()
+        image_pull.status = "pulling"
+        progress.report(force=True)
+        try:
+            for message in api.pull(image_pull.image, stream=True, decode=True):
+                image_pull.update(message)
+                progress.report()
+            if image_pull.status != "failed":
+                image_pull.status = "done"
+        except Exception as e:
+            image_pull.status = "failed"
+            image_pull.error = getattr(e, "explanation", None) or str(e)
+        finally:
+            image_pull.finished = time.monotonic()
+            progress.report(force=True)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(pulls) or 1))) as executor:
+        list(executor.map(pull, pulls))
+    return summarize(pulls, time.monotonic() - started)
@@ -0,0 +1,266 @@
+import re
+import time
+import socket
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Literal, Optional, Tuple
+
+from docker.errors import NotFound
+from core.schemas import TaskOutput
+from core.settings import DOCKER_READINESS_TIMEOUT, DOCKER_READINESS_MAX_DELAY
+from devops_agents.docker.utils.manager import DockerManager
+from devops_agents.docker.utils.log_index import parse_log_line_ns
+
+
+# container events that can change the outcome of a probe, exec_* events of the probes
+# themselves are left out so they don't wake the waiter
+WAKE_EVENTS = ["start", "restart", "die", "stop", "kill", "oom", "health_status", "destroy", "unpause"]
+
+
+class ReadinessProbe(ABC):
+    """
+    One readiness check of a running container.
+    check() returns (ready, detail), detail explains why it is not ready yet.
+    """
+    name = "probe"
+
+    @abstractmethod
+    def check(self, container) -> Tuple[bool, str]:
+        pass
+
+
+class HealthProbe(ReadinessProbe):
+    """Ready when the image HEALTHCHECK reports healthy, or as soon as it runs when it has none."""
+    name = "health"
+
+    def check(self, container) -> Tuple[bool, str]:
+        health = container.attrs["State"].get("Health")
+        if not health:
+            return container.status == "running", f"status is {container.status}"
+        return health["Status"] == "healthy", f"health is {health['Status']}"
+
+
+class TcpProbe(ReadinessProbe):
+    """
+    Ready when a TCP connection to the published `port` succeeds.
+    docker-proxy accepts connections before the service listens, prefer an
+    application probe (SqlProbe) when there is one.
+    """
+    def __init__(self, port: int, connect_timeout: float = 1.0):
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.name = f"tcp {port}"
+
+    def address(self, container) -> Optional[Tuple[str, int]]:
+        network = container.attrs["NetworkSettings"]
+        for binding in (network.get("Ports") or {}).get(f"{self.port}/tcp") or []:
+            host = binding.get("HostIp") or "127.0.0.1"
+            return ("127.0.0.1" if host in ("0.0.0.0", "::") else host), int(binding["HostPort"])
+        # not published, the container address is reachable from the docker host itself
+        if network.get("IPAddress"):
+            return network["IPAddress"], self.port
+        return None
+
+    def check(self, container) -> Tuple[bool, str]:
+        address = self.address(container)
+        if not address:
+            return False, f"port {self.port} is not published"
+        try:
+            with socket.create_connection(address, timeout=self.connect_timeout):
+                return True, ""
+        except OSError as e:
+            return False, f"{address[0]}:{address[1]} {e}"
+
+
+class LogProbe(ReadinessProbe):
+    """
+    Ready once `pattern` appeared `occurrences` times in the lines of the container logs.
+    Every check only downloads the lines logged since the previous one.
+    """
+    def __init__(self, pattern: str, occurrences: int = 1):
+        self.pattern = re.compile(pattern)
+        self.occurrences = occurrences
+        self.name = f"log /{pattern}/"
+        self.found = 0
+        # timestamp (epoch nanoseconds) of the newest line counted, and how many counted lines have it
+        self.since: Optional[int] = None
+        self.lines_at_since = 0
+
+    def check(self, container) -> Tuple[bool, str]:
+        # the API takes seconds, floored to microseconds so the float never goes past `since`
+        since = self.since // 1000 / 10 ** 6 if self.since is not None else None
+        logs = container.logs(stdout=True, stderr=True, timestamps=True, since=since)
+        # `since` is inclusive, the lines already counted at that timestamp come again
+        # (and the lines of its microsecond logged before it, skipped below)
+        repeated = self.lines_at_since
+        for raw in logs.splitlines():
+            ts, line = parse_log_line_ns(raw)
+            if self.since is not None and ts < self.since:
+                continue
+            if ts == self.since:
+                if repeated:
+                    repeated -= 1
+                    continue
+                self.lines_at_since += 1
+            else:
+                self.since, self.lines_at_since = ts, 1
+            self.found += len(self.pattern.findall(line))
+        return self.found >= self.occurrences, f"matched {self.found}/{self.occurrences} times"
+
+
+class CommandProbe(ReadinessProbe):
+    """Ready when `command` run inside the container exits with 0."""
+    def __init__(self, command: List[str], name: Optional[str] = None):
+        self.command = command
+        self.name = name or " ".join(command)
+
+    def check(self, container) -> Tuple[bool, str]:
+        exit_code, output = container.exec_run(self.command)
+        lines = (output or b"").decode("utf-8", errors="replace").strip().splitlines()
+        detail = lines[-1][:200] if lines else ""
+        return exit_code == 0, f"exit code {exit_code} {detail}".strip()
+
+
+class SqlProbe(CommandProbe):
+    """
+    Pings the database server with the client tools of its image.
+    Goes through TCP on purpose: the temporary server the official images run
+    during initialisation only listens on the unix socket.
+    """
+    COMMANDS = {
+        "postgres": lambda user: ["pg_isready", "-q", "-h", "127.0.0.1", "-U", user],
+        "mysql": lambda user: ["mysqladmin", "ping", "-h", "127.0.0.1", "-u", user, "--silent"],
+    }
+
+    def __init__(self, database: Literal["postgres", "mysql"] = "postgres", user: Optional[str] = None):
+        user = user or {"postgres": "postgres", "mysql": "root"}[database]
+        super().__init__(self.COMMANDS[database](user), name=f"{database} ping")
+
+
+class ContainerEvents:
+    """
+    Listens to the engine events of one container in a background thread,
+    so waits end as soon as something happens to it instead of at the next poll.
+    """
+    def __init__(self, client, container_id: str):
+        self.changed = threading.Event()
+        self.stream = None
+        try:
+            self.stream = client.events(decode=True, filters={"container": container_id, "event": WAKE_EVENTS})
+        except Exception as e:
+            print(f"container events unavailable, polling only: {e}")
+            return
+        threading.Thread(target=self.listen, daemon=True).start()
+
+    def listen(self):
+        try:
+            for event in self.stream:
+                if event.get("Action", "").split(":")[0] in WAKE_EVENTS:
+                    self.changed.set()
+        except Exception:
+            pass  # closed by close()
+
+    def wait(self, timeout: float) -> bool:
+        """Waits for an event or `timeout` seconds, returns whether an event came."""
+        changed = self.changed.wait(timeout)
+        self.changed.clear()
+        return changed
+
+    def close(self):
+        if self.stream is not None:
+            try:
+                self.stream.close()
+            except Exception:
+                pass
+
+
+def wait_for_probes(container_name: str,
+                    probes: List[ReadinessProbe],
+                    timeout: float = DOCKER_READINESS_TIMEOUT,
+                    initial_delay: float = 0.1,
+                    max_delay: float = DOCKER_READINESS_MAX_DELAY,
+                    backoff: float = 2.0) -> TaskOutput:
+    """
+    Waits until every probe passes. Probes run in order and stop at the first failing one.
+    Between two rounds waits with exponential backoff (initial_delay up to max_delay),
+    cut short by container events. Fails fast when the container exits.
+
+    Example usage:
+        wait_for_probes("postgres_db", [HealthProbe(), SqlProbe("postgres")], timeout=30)
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    client = DockerManager._get_docker_client()
+    try:
+        container = client.containers.get(container_name)
+    except NotFound:
+        return TaskOutput(success=False, output="", error=f"Container '{container_name}' not found")
+
+    events = ContainerEvents(client, container.id)
+    delay = initial_delay
+    attempts = 0
+    try:
+        while True:
+            attempts += 1
+            pending = None
+            try:
+                container.reload()
+                if container.status in ("exited", "dead"):
+                    logs = container.logs(tail=20).decode("utf-8", errors="replace").strip()
+                    exit_code = container.attrs["State"].get("ExitCode")
+                    return TaskOutput(
+                        success=False,
+                        output=logs,
+                        error=f"Container '{container_name}' {container.status} with exit code {exit_code}"
+                    )
+                for probe in probes:
+                    ready, detail = probe.check(container)
+                    if not ready:
+                        pending = f"{probe.name}: {detail}"
+                        break
+            except NotFound:
+                return TaskOutput(success=False, output="", error=f"Container '{container_name}' was removed")
+            except Exception as e:
+                # e.g. exec into a container that is restarting
+                pending = f"{type(e).__name__}: {e}"
+
+            now = time.monotonic()
+            if pending is None:
+                return TaskOutput(
+                    success=True,
+                    output=f"✅ Container '{container_name}' ready after {now - started:.1f}s ({attempts} checks)"
+                )
+            if now >= deadline:
+                return TaskOutput(
+                    success=False,
+                    output="",
+                    error=f"Container '{container_name}' not ready after {timeout}s ({attempts} checks), {pending}"
+                )
+            if events.wait(min(delay, deadline - now)):
+                delay = initial_delay
+            else:
+                delay = min(delay * backoff, max_delay)
+    finally:
+        events.close()
+
+
+def wait_until_ready(container_name: str,
+                    timeout: float = DOCKER_READINESS_TIMEOUT,
+                    tcp_port: Optional[int] = None,
+                    log_pattern: Optional[str] = None,
+                    database: Optional[Literal["postgres", "mysql"]] = None) -> TaskOutput:
+    """
+    Waits until a container is ready to be used instead of sleeping for a guessed time.
+    Always waits for the container to run and, when it has a HEALTHCHECK, to be healthy.
+    tcp_port: also wait until this container port accepts connections
+    log_pattern: also wait until this regex appears in the container logs
+    database: also wait until the postgres or mysql server answers a ping
+    """
+    probes: List[ReadinessProbe] = [HealthProbe()]
+    if tcp_port:
+        probes.append(TcpProbe(tcp_port))
+    if log_pattern:
+        probes.append(LogProbe(log_pattern))
+    if database:
+        probes.append(SqlProbe(database))
+    return wait_for_probes(container_name, probes, timeout=timeout)
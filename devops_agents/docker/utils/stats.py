@@ -0,0 +1,392 @@
+import time
+import warnings
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Literal, Optional
+
+import numpy as np
+from core.schemas import TaskOutput
+from core.settings import DOCKER_STATS_MODE, DOCKER_STATS_INTERVAL, DOCKER_STATS_WINDOW, DOCKER_STATS_WARMUP
+from devops_agents.docker.utils.manager import DockerManager
+
+
+# counters kept per sample, cumulative ones are turned into rates when aggregating
+FIELDS = (
+    "time", "cpu_total", "system_cpu", "online_cpus", "mem_usage", "mem_limit",
+    "net_rx", "net_tx", "blk_read", "blk_write", "pids",
+)
+F = {name: i for i, name in enumerate(FIELDS)}
+SORT_KEYS = {
+    "cpu": "cpu_mean",
+    "memory": "mem_mean",
+    "net": "net_rate",
+    "io": "blk_rate",
+}
+
+
+def parse_stats(stats: dict, now: Optional[float] = None) -> np.ndarray:
+    """One row of FIELDS from a docker stats document (stream or one-shot)."""
+    cpu = stats.get("cpu_stats") or {}
+    memory = stats.get("memory_stats") or {}
+    memory_details = memory.get("stats") or {}
+    networks = (stats.get("networks") or {}).values()
+    blkio = (stats.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []
+    online_cpus = cpu.get("online_cpus") or len((cpu.get("cpu_usage") or {}).get("percpu_usage") or []) or 1
+    # like `docker stats`: page cache is not counted as used memory (inactive_file on cgroup v2)
+    cache = memory_details.get("inactive_file", memory_details.get("cache", 0))
+    return np.array([
+        now or time.time(),
+        (cpu.get("cpu_usage") or {}).get("total_usage", np.nan),
+        cpu.get("system_cpu_usage", np.nan),
+        online_cpus,
+        memory.get("usage", np.nan) - cache if "usage" in memory else np.nan,
+        memory.get("limit", np.nan),
+        sum(network.get("rx_bytes", 0) for network in networks),
+        sum(network.get("tx_bytes", 0) for network in networks),
+        sum(entry.get("value", 0) for entry in blkio if entry.get("op", "").lower() == "read"),
+        sum(entry.get("value", 0) for entry in blkio if entry.get("op", "").lower() == "write"),
+        (stats.get("pids_stats") or {}).get("current", np.nan),
+    ], dtype=np.float64)
+
+
+def nan_percentile(values: np.ndarray, q: float) -> np.ndarray:
+    """
+    Per row percentile ignoring NaN (linear interpolation, like np.nanpercentile).
+    One sort of the whole array instead of nanpercentile's per row loop.
+    """
+    ordered = np.sort(values, axis=1)  # NaN sort last
+    valid = np.sum(~np.isnan(values), axis=1)
+    position = np.maximum(valid - 1, 0) * q / 100
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, np.maximum(valid - 1, 0))
+    low = np.take_along_axis(ordered, lower[:, None], axis=1)[:, 0]
+    high = np.take_along_axis(ordered, upper[:, None], axis=1)[:, 0]
+    result = low + (high - low) * (position - lower)
+    return np.where(valid > 0, result, np.nan)
+
+
+class StatsRing:
+    """
+    Last `capacity` samples of every container in one float64 array of shape
+    (containers, capacity, len(FIELDS)), empty slots hold NaN.
+    Aggregates are computed for all containers at once with nan-aware numpy reductions.
+    Slots of released containers are reused before the array grows.
+    """
+    def __init__(self, capacity: int = DOCKER_STATS_WINDOW, initial_containers: int = 16):
+        self.capacity = capacity
+        self.data = np.full((initial_containers, capacity, len(FIELDS)), np.nan)
+        self.head = np.zeros(initial_containers, dtype=np.int64)
+        self.count = np.zeros(initial_containers, dtype=np.int64)
+        self.names: List[Optional[str]] = []  # None for a released slot
+        self.slots: Dict[str, int] = {}
+        self.free: List[int] = []
+        self.lock = threading.Lock()
+
+    def slot(self, name: str) -> int:
+        if name in self.slots:
+            return self.slots[name]
+        if self.free:
+            slot = self.free.pop()
+            self.names[slot] = name
+        else:
+            if len(self.names) == len(self.head):
+                grow = len(self.head)
+                self.data = np.concatenate([self.data, np.full((grow, self.capacity, len(FIELDS)), np.nan)])
+                self.head = np.concatenate([self.head, np.zeros(grow, dtype=np.int64)])
+                self.count = np.concatenate([self.count, np.zeros(grow, dtype=np.int64)])
+            slot = len(self.names)
+            self.names.append(name)
+        self.slots[name] = slot
+        return slot
+
+    def release(self, name: str):
+        """Empties the slot of a container that is gone, the next new container takes it."""
+        with self.lock:
+            slot = self.slots.pop(name, None)
+            if slot is None:
+                return
+            self.names[slot] = None
+            self.data[slot] = np.nan
+            self.head[slot] = 0
+            self.count[slot] = 0
+            self.free.append(slot)
+
+    def record(self, name: str, row: np.ndarray):
+        with self.lock:
+            slot = self.slot(name)
+            self.data[slot, self.head[slot]] = row
+            self.head[slot] = (self.head[slot] + 1) % self.capacity
+            self.count[slot] = min(self.count[slot] + 1, self.capacity)
+
+    def samples(self, name: str) -> int:
+        with self.lock:
+            return int(self.count[self.slots[name]]) if name in self.slots else 0
+
+    def chronological(self) -> tuple[List[str], np.ndarray]:
+        """Copy of the samples ordered oldest first, per container."""
+        with self.lock:
+            used = [slot for slot, name in enumerate(self.names) if name is not None]
+            # the oldest sample sits at head (the slot written next)
+            order = (self.head[used, None] + np.arange(self.capacity)[None, :]) % self.capacity
+            data = np.take_along_axis(self.data[used], order[:, :, None], axis=1)
+            return [self.names[slot] for slot in used], data
+
+    def aggregate(self, window_seconds: Optional[float] = None) -> tuple[List[str], Dict[str, np.ndarray]]:
+        names, data = self.chronological()
+        if window_seconds:
+            data[data[:, :, F["time"]] < time.time() - window_seconds] = np.nan
+        columns = {name: data[:, :, i] for name, i in F.items()}
+        # rates come from consecutive samples, a NaN on either side gives a NaN delta
+        elapsed = np.diff(columns["time"], axis=1)
+        cpu_percent = (
+            np.diff(columns["cpu_total"], axis=1) / np.diff(columns["system_cpu"], axis=1)
+            * columns["online_cpus"][:, 1:] * 100
+        )
+        net_rate = (np.diff(columns["net_rx"], axis=1) + np.diff(columns["net_tx"], axis=1)) / elapsed
+        blk_rate = (np.diff(columns["blk_read"], axis=1) + np.diff(columns["blk_write"], axis=1)) / elapsed
+        memory = columns["mem_usage"]
+        # containers without samples give NaN (and "Mean of empty slice" warnings)
+        with np.errstate(all="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            aggregates = {
+                "samples": np.sum(~np.isnan(columns["time"]), axis=1),
+                "cpu_mean": np.nanmean(cpu_percent, axis=1),
+                "cpu_p95": nan_percentile(cpu_percent, 95),
+                "cpu_max": np.nanmax(cpu_percent, axis=1),
+                "mem_mean": np.nanmean(memory, axis=1),
+                "mem_p95": nan_percentile(memory, 95),
+                "mem_max": np.nanmax(memory, axis=1),
+                # chronological order puts the newest sample last
+                "mem_percent": memory[:, -1] / columns["mem_limit"][:, -1] * 100,
+                "net_rate": np.nanmean(net_rate, axis=1),
+                "blk_rate": np.nanmean(blk_rate, axis=1),
+                "pids": columns["pids"][:, -1],
+            }
+        return names, aggregates
+
+
+def format_size(size: float) -> str:
+    if np.isnan(size):
+        return "-"
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(size) < 1024 or unit == "GiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_number(value: float, suffix: str = "") -> str:
+    return "-" if np.isnan(value) else f"{value:.1f}{suffix}"
+
+
+class ContainerStatsSampler:
+    """
+    Collects resource stats of running containers into a StatsRing.
+
+    mode "stream": one streaming stats connection per container (the engine sends a sample
+        about every second), new containers are attached on refresh()
+    mode "poll": one thread sampling every container with one-shot requests every `interval` seconds
+
+    A container is dropped (its ring slot freed) when its stream ends, on its die/destroy
+    event, or once it is missing from the running containers listed for over `interval` seconds.
+
+    Example usage:
+        sampler = ContainerStatsSampler(mode="poll", interval=2).start()
+        print(sampler.top(sort_by="memory", n=5))
+        sampler.stop()
+    """
+    def __init__(self,
+                mode: Literal["stream", "poll"] = DOCKER_STATS_MODE,
+                interval: float = DOCKER_STATS_INTERVAL,
+                capacity: int = DOCKER_STATS_WINDOW,
+                max_workers: int = 16):
+        self.mode = mode
+        self.interval = interval
+        self.max_workers = max_workers
+        self.ring = StatsRing(capacity)
+        self.streams: Dict[str, object] = {}
+        # when every container was last listed running, and the names of the last listing
+        self.last_seen: Dict[str, float] = {}
+        self.listed: Optional[set] = None
+        self.events = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.running = False
+
+    def start(self):
+        self.stopped.clear()
+        self.running = True
+        try:
+            self.events = DockerManager._get_docker_client().events(
+                decode=True, filters={"type": "container", "event": ["die", "destroy"]}
+            )
+            threading.Thread(target=self.watch_events, args=(self.events,), daemon=True).start()
+        except Exception as e:
+            print(f"container events unavailable, stopped containers are dropped on listing only: {e}")
+        if self.mode == "poll":
+            threading.Thread(target=self.poll_loop, daemon=True).start()
+        else:
+            self.refresh()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.running = False
+        with self.lock:
+            streams, self.streams = list(self.streams.values()), {}
+        for stream in streams + [self.events]:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def watch_events(self, events):
+        try:
+            for event in events:
+                self.forget(event["Actor"]["Attributes"]["name"])
+        except Exception:
+            pass  # closed by stop()
+
+    def forget(self, name: str):
+        """Drops a container that is gone: its stream, listing and ring slot."""
+        with self.lock:
+            stream = self.streams.pop(name, None)
+            self.last_seen.pop(name, None)
+            if self.listed is not None:
+                self.listed.discard(name)
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+        self.ring.release(name)
+
+    def mark_listed(self, names: List[str]):
+        """Records the running containers just listed, drops those missing for over `interval` seconds."""
+        now = time.monotonic()
+        with self.lock:
+            self.listed = set(names)
+            for name in names:
+                self.last_seen[name] = now
+            gone = [name for name, seen in self.last_seen.items() if now - seen > self.interval]
+        for name in gone:
+            self.forget(name)
+
+    def refresh(self):
+        """Attaches a stats stream to every running container that has none yet."""
+        if self.mode != "stream":
+            return
+        containers = DockerManager._get_docker_client().containers.list(sparse=True)
+        self.mark_listed([container.attrs["Names"][0].lstrip("/") for container in containers])
+        for container in containers:
+            name = container.attrs["Names"][0].lstrip("/")
+            with self.lock:
+                if name in self.streams:
+                    continue
+                self.streams[name] = None  # reserved, opened by the thread
+            threading.Thread(target=self.stream_container, args=(container, name), daemon=True).start()
+
+    def stream_container(self, container, name: str):
+        stream = None
+        try:
+            stream = container.stats(stream=True, decode=True)
+            with self.lock:
+                if self.stopped.is_set():
+                    return stream.close()
+                self.streams[name] = stream
+            for stats in stream:
+                if self.streams.get(name) is not stream:
+                    break  # forgotten meanwhile, don't take a slot again
+                self.ring.record(name, parse_stats(stats))
+        except Exception:
+            pass  # container stopped or stream closed
+        finally:
+            with self.lock:
+                # a refresh may have attached a new stream meanwhile
+                ended = self.streams.get(name) in (None, stream)
+                if ended:
+                    self.streams.pop(name, None)
+            if ended and not self.stopped.is_set():
+                self.ring.release(name)
+
+    def sample(self, container):
+        name = container.attrs["Names"][0].lstrip("/")
+        try:
+            self.ring.record(name, parse_stats(container.stats(stream=False, one_shot=True)))
+        except Exception:
+            pass  # container stopped between list and stats
+
+    def poll_loop(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while not self.stopped.is_set():
+                started = time.monotonic()
+                try:
+                    containers = DockerManager._get_docker_client().containers.list(sparse=True)
+                    self.mark_listed([container.attrs["Names"][0].lstrip("/") for container in containers])
+                    list(executor.map(self.sample, containers))
+                except Exception as e:
+                    print(f"stats sampling failed: {e}")
+                self.stopped.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def wait_for_samples(self, samples: int = 2, timeout: float = DOCKER_STATS_WARMUP):
+        """Waits until every watched container has `samples` samples (rates need two)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            names = list(self.streams) if self.mode == "stream" else [name for name in self.ring.names if name]
+            if names and all(self.ring.samples(name) >= samples for name in names):
+                return
+            time.sleep(0.05)
+
+    def top(self,
+            sort_by: Literal["cpu", "memory", "net", "io"] = "cpu",
+            n: int = 10,
+            window_seconds: Optional[float] = None) -> str:
+        names, aggregates = self.ring.aggregate(window_seconds)
+        if self.listed is not None:
+            # a sample in flight may have taken a slot again for a container that is gone
+            live = np.array([name in self.listed for name in names], dtype=bool)
+            names = [name for name, keep in zip(names, live) if keep]
+            aggregates = {key: values[live] for key, values in aggregates.items()}
+        if not names:
+            return "no container stats sampled yet"
+        key = aggregates[SORT_KEYS[sort_by]]
+        order = np.argsort(np.where(np.isnan(key), -np.inf, key))[::-1][:n]
+        lines = [
+            "| container | cpu % mean | cpu % p95 | cpu % max | mem mean | mem p95 | mem max | mem % | net/s | disk/s | pids | samples |",
+            "|---|---|---|---|---|---|---|---|---|---|---|---|",
+        ]
+        for i in order:
+            lines.append("| " + " | ".join([
+                names[i],
+                format_number(aggregates["cpu_mean"][i]),
+                format_number(aggregates["cpu_p95"][i]),
+                format_number(aggregates["cpu_max"][i]),
+                format_size(aggregates["mem_mean"][i]),
+                format_size(aggregates["mem_p95"][i]),
+                format_size(aggregates["mem_max"][i]),
+                format_number(aggregates["mem_percent"][i]),
+                format_size(aggregates["net_rate"][i]),
+                format_size(aggregates["blk_rate"][i]),
+                format_number(aggregates["pids"][i]).removesuffix(".0"),
+                str(int(aggregates["samples"][i])),
+            ]) + " |")
+        return f"top {len(order)} of {len(names)} containers by {sort_by}\n" + "\n".join(lines)
+
+
+stats_sampler = ContainerStatsSampler()
+
+
+def get_container_stats(sort_by: Literal["cpu", "memory", "net", "io"] = "cpu",
+                        n: int = 10,
+                        window_seconds: Optional[float] = 60) -> TaskOutput:
+    """
+    Shows the containers using the most cpu, memory, network or disk as a table
+    (mean, p95 and max over the last window_seconds). Sampling starts on the first call.
+    """
+    try:
+        if not stats_sampler.running:
+            stats_sampler.start()
+        stats_sampler.refresh()
+        stats_sampler.wait_for_samples()
+        return TaskOutput(success=True, output=stats_sampler.top(sort_by, n, window_seconds))
+    except Exception as e:
+        return TaskOutput(success=False, output="", error=str(e))
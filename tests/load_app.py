@@ -0,0 +1,231 @@
+"""
+Concurrent session load test for app.py, offline.
+
+Drives on_chat_start and on_message of N simulated Chainlit sessions in one process.
+The LLM is a ScriptedChatModel (one tool call then streamed tokens per turn) and the
+docker tools talk to the fake engine from devops_agents/docker/tests/fake_engine.py.
+Reports time to first streamed frame, end-to-end latency percentiles, event loop lag
+and RSS per session.
+
+Example usage:
+    python -m tests.load_app --sessions 1 10 100 --turns 3
+    python -m tests.load_app --sessions 200 --token-delay 0.01 --json load_app.json
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+# the search tools build their API wrappers at import time, none of them is called here
+for key in ("OPENAI_API_KEY", "TAVILY_API_KEY", "GOOGLE_API_KEY", "GOOGLE_SEARCH_ENGINE_ID"):
+    os.environ.setdefault(key, "load-test")
+os.environ.setdefault("TOOL_LOG_SAMPLE_RATE", "0")
+
+import psutil
+import chainlit as cl
+from chainlit.context import init_http_context
+from chainlit.emitter import BaseChainlitEmitter
+
+import app
+from core import settings
+from core.tests.fake_models import ScriptedChatModel
+from devops_agents.docker.agents.docker_agent import DockerAgent, DockerAgentFactory
+from devops_agents.docker.tests.fake_engine import FakeDockerEngine
+
+
+class FrameProbe:
+    """Times the frames of one streamed answer."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.started = time.perf_counter()
+        self.first_frame = None
+        self.frames = 0
+
+    def frame(self):
+        if self.first_frame is None:
+            self.first_frame = time.perf_counter()
+        self.frames += 1
+
+    @property
+    def time_to_first_frame(self):
+        return self.first_frame - self.started if self.first_frame else None
+
+
+class ProbeEmitter(BaseChainlitEmitter):
+    """No-op emitter that records when streamed frames would reach the UI."""
+    def __init__(self, session, probe: FrameProbe):
+        super().__init__(session)
+        self.probe = probe
+
+    async def stream_start(self, step_dict):
+        self.probe.frame()
+
+    async def send_token(self, id: str, token: str, is_sequence=False, is_input=False):
+        self.probe.frame()
+
+
+def use_scripted_model(**model_config):
+    class ScriptedDockerAgentFactory(DockerAgentFactory):
+        def create_agent(self, *args, **kwargs) -> DockerAgent:
+            return DockerAgent(*args, client=ScriptedChatModel, client_config=model_config, **kwargs)
+
+    app.DockerAgentFactory = ScriptedDockerAgentFactory
+    app._docker_graph = None
+
+
+def percentiles(values) -> dict:
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return {}
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": values[-1]}
+
+
+async def run_session(index: int, args, turns: list, errors: list):
+    context = init_http_context(thread_id=str(uuid.uuid4()))
+    probe = FrameProbe()
+    context.emitter = ProbeEmitter(context.session, probe)
+    try:
+        await app.on_chat_start()
+        for turn in range(args.turns):
+            probe.reset()
+            await app.on_message(cl.Message(content=args.prompt, author="User"))
+            turns.append({
+                "session": index,
+                "turn": turn,
+                "ttft": probe.time_to_first_frame,
+                "latency": time.perf_counter() - probe.started,
+                "frames": probe.frames,
+            })
+            await asyncio.sleep(args.think_time)
+    except Exception as e:
+        errors.append(f"session {index}: {e!r}")
+
+
+async def monitor(interval: float, lag: list, rss: list, stop: asyncio.Event):
+    process = psutil.Process()
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag.append(time.perf_counter() - start - interval)
+        rss.append(process.memory_info().rss)
+
+
+async def run_load(sessions: int, args) -> dict:
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    turns, errors, lag, rss = [], [], [], []
+    stop = asyncio.Event()
+    monitor_task = asyncio.create_task(monitor(args.lag_interval, lag, rss, stop))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(i, args, turns, errors) for i in range(sessions)))
+    duration = time.perf_counter() - start
+    stop.set()
+    await monitor_task
+
+    rss_peak = max(rss + [process.memory_info().rss])
+    return {
+        "sessions": sessions,
+        "turns": len(turns),
+        "errors": errors,
+        "duration": duration,
+        "messages_per_second": len(turns) / duration,
+        "ttft": percentiles(t["ttft"] for t in turns),
+        "latency": percentiles(t["latency"] for t in turns),
+        "turns_without_frames": sum(1 for t in turns if not t["frames"]),
+        "frames_per_turn": percentiles(t["frames"] for t in turns),
+        "loop_lag": percentiles(lag),
+        "rss_before": rss_before,
+        "rss_peak": rss_peak,
+        "rss_per_session": (rss_peak - rss_before) / sessions,
+    }
+
+
+def print_report(report: dict):
+    ms = lambda stats, key: f"{stats[key] * 1000:8.1f}" if key in stats else "       -"
+    print(
+        f"sessions={report['sessions']} turns={report['turns']} errors={len(report['errors'])} "
+        f"duration={report['duration']:.2f}s throughput={report['messages_per_second']:.1f} msg/s"
+    )
+    print("                    p50 ms   p95 ms   p99 ms   max ms")
+    for name in ("ttft", "latency", "loop_lag"):
+        stats = report[name]
+        print(f"  {name:<14} {ms(stats, 'p50')} {ms(stats, 'p95')} {ms(stats, 'p99')} {ms(stats, 'max')}")
+    if report["frames_per_turn"]:
+        # one frame per turn means the answer arrived in one piece instead of streaming
+        print(f"  frames per turn p50 {report['frames_per_turn']['p50']}, max {report['frames_per_turn']['max']}")
+    print(
+        f"  rss peak {report['rss_peak'] / 2**20:.1f} MiB, "
+        f"{report['rss_per_session'] / 2**10:.1f} KiB per session"
+    )
+    if report["turns_without_frames"]:
+        print(f"  {report['turns_without_frames']} turns streamed no frame to the UI")
+    for error in report["errors"][:5]:
+        print(f"  {error}")
+
+
+async def main(args):
+    if not args.verbose:
+        app.logger.setLevel(logging.WARNING)
+    use_scripted_model(
+        tool_name=args.tool,
+        answer_tokens=args.answer_tokens,
+        first_token_delay=args.first_token_delay,
+        token_delay=args.token_delay,
+    )
+    settings.DOCKER_AGENT_CHAT_DB = Path(args.workdir) / "load_app_chats.sqlite3"
+
+    # warm up: builds the shared graph and checkpoint store outside the measurements
+    warmup = argparse.Namespace(**{**vars(args), "turns": 1})
+    start = time.perf_counter()
+    await app.on_app_startup()
+    await run_session(-1, warmup, [], [])
+    print(f"warm-up (graph build + first turn): {time.perf_counter() - start:.2f}s")
+
+    reports = []
+    try:
+        for sessions in args.sessions:
+            report = await run_load(sessions, args)
+            print_report(report)
+            reports.append(report)
+    finally:
+        # the shared aiosqlite connection runs in a non-daemon thread
+        await app.get_checkpoint_store().close()
+    if args.json:
+        Path(args.json).write_text(json.dumps(reports, indent=2), encoding="utf-8")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--turns", type=int, default=3, help="messages per session")
+    parser.add_argument("--think-time", type=float, default=0.0, help="seconds between two messages of a session")
+    parser.add_argument("--prompt", default="list my docker containers")
+    parser.add_argument("--tool", default="list_available_containers", help="tool the model calls every turn")
+    parser.add_argument("--answer-tokens", type=int, default=100)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--containers", type=int, default=50, help="containers served by the fake engine")
+    parser.add_argument("--engine-latency", type=float, default=0.002)
+    parser.add_argument("--lag-interval", type=float, default=0.01)
+    parser.add_argument("--json", help="write the reports to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's per message logs")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with tempfile.TemporaryDirectory(prefix="load-app-") as workdir:
+        args.workdir = workdir
+        engine = FakeDockerEngine(os.path.join(workdir, "docker.sock"), containers=args.containers, latency=args.engine_latency)
+        with engine:
+            os.environ["DOCKER_HOST"] = engine.base_url
+            asyncio.run(main(args))